@@ -0,0 +1,309 @@
+"""
+Shared HTTP clients for the Coda and Notion APIs.
+
+Each API gets one keep-alive requests.Session, so calls reuse TCP/TLS
+connections instead of handshaking per request. The connection pool is
+sized to the number of worker threads, every request gets a default
+timeout, and latency is counted per endpoint (method plus URL path with
+ids collapsed) so slow or failing calls show up in the run summary.
+
+Notion allows about 3 requests per second per integration. All Notion
+clients in a process draw from one token bucket, and 429 responses (and
+5xx responses to GETs) are retried after the server's Retry-After (or a
+jittered exponential backoff), which also pauses the bucket for every
+other thread. A write that got a 5xx may still have been applied, so it
+is not resent.
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CODA_API_BASE = os.getenv('CODA_API_BASE', 'https://coda.io/apis/v1').rstrip('/')
+NOTION_API_BASE = os.getenv('NOTION_API_BASE', 'https://api.notion.com/v1').rstrip('/')
+NOTION_VERSION = '2022-06-28'
+
+DEFAULT_POOL_SIZE = 10  # Connections kept per host; resize to the worker count
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds when the caller passes none
+
+NOTION_RATE_LIMIT = float(os.getenv('NOTION_RATE_LIMIT', '3'))  # Requests per second, shared by all threads
+MAX_RETRIES = 5  # Retries of a 429/5xx response (or a failed GET connection) before giving up
+RETRY_BASE_DELAY = 1.0  # Backoff before the first retry when the server sends no Retry-After
+RETRY_MAX_DELAY = 30.0  # Cap on a single backoff
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+WRITE_RETRY_STATUSES = frozenset({429})  # Rejected before being applied, so safe to resend a POST/PATCH/DELETE
+
+# Path segments that identify one object (doc/page/block ids, export request ids)
+ID_SEGMENT = re.compile(r'^(?!v\d+$).*\d')
+
+def endpoint_key(method, url):
+    """'GET /v1/blocks/{id}/children' style key for latency counters"""
+    parts = urlsplit(url)
+    path = '/'.join('{id}' if ID_SEGMENT.match(segment) else segment for segment in parts.path.split('/'))
+    return f'{method.upper()} {path}'
+
+def retry_after_seconds(headers):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None"""
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_seconds(attempt):
+    """Exponential backoff with jitter: half fixed, half random"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def should_retry(method, status):
+    """True if a response with this status may be retried: anything in RETRY_STATUSES for a GET, only 429 for writes"""
+    return status in (RETRY_STATUSES if method.upper() == 'GET' else WRITE_RETRY_STATUSES)
+
+def retry_delay(headers, attempt):
+    """How long to wait before retrying a RETRY_STATUSES response"""
+    retry_after = retry_after_seconds(headers)
+    if retry_after is not None:
+        return retry_after + random.uniform(0, RETRY_BASE_DELAY / 2)
+    return backoff_seconds(attempt)
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def try_acquire(self):
+        """Take a token if one is available (returns 0), else return seconds until one may be.
+
+        Never blocks, so threads (acquire) and asyncio tasks (sleep, then
+        try again) can share one bucket; a pause() is seen by every waiter.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            # While paused _updated is in the future and nothing refills until then
+            return max(self._updated - now, 0) + (1 - self._tokens) / self.rate
+
+    def _waited(self, seconds):
+        if seconds > 0.001:
+            with self._lock:
+                self.waits += 1
+                self.waited_seconds += seconds
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns seconds waited"""
+        start = time.monotonic()
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                waited = time.monotonic() - start
+                self._waited(waited)
+                return waited
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """acquire() for asyncio tasks: awaits instead of blocking the event loop"""
+        start = time.monotonic()
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                waited = time.monotonic() - start
+                self._waited(waited)
+                return waited
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds` (the server asked us to back off), then refill from empty"""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = max(self._updated, time.monotonic() + seconds)
+
+# One bucket per process: every Notion client and thread shares the integration's limit
+notion_rate_limiter = TokenBucket(NOTION_RATE_LIMIT)
+
+class RequestStats:
+    """Per-endpoint latency counters plus throttling and retry totals, shared by sync and async clients"""
+
+    def __init__(self, name, rate_limiter=None):
+        self.name = name
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.throttled_seconds = 0.0  # Waiting on the token bucket
+        self.retries = 0
+        self.rate_limited = 0  # 429 responses
+        self.backoff_seconds = 0.0  # Sleeping before retries
+
+    def _throttled(self, seconds):
+        if seconds:
+            with self._lock:
+                self.throttled_seconds += seconds
+
+    def _retrying(self, status, delay):
+        """Count a retry; a 429 also pauses the shared bucket, since the limit is per integration"""
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += delay
+        if status == 429 and self.rate_limiter is not None:
+            self.rate_limiter.pause(delay)
+
+    def _record(self, key, seconds, status):
+        """Count one response (status None: the request failed without one)"""
+        with self._lock:
+            entry = self._stats.setdefault(key, {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            entry['count'] += 1
+            entry['errors'] += status is None or status >= 400
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            if status == 429:
+                # Every 429, including one the caller gets back because retries ran out or don't apply
+                self.rate_limited += 1
+
+    def stats(self):
+        """{endpoint: {count, errors, seconds, avg_seconds, max_seconds}}"""
+        with self._lock:
+            snapshot = {key: dict(entry) for key, entry in self._stats.items()}
+        for entry in snapshot.values():
+            entry['avg_seconds'] = entry['seconds'] / entry['count']
+        return snapshot
+
+    def totals(self):
+        """(requests sent including retries, 429 responses) so far"""
+        with self._lock:
+            return sum(entry['count'] for entry in self._stats.values()), self.rate_limited
+
+    def describe_connections(self):
+        return ''
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats:
+            return
+        total = sum(entry['count'] for entry in stats.values())
+        print(f"[TIMING] {self.name} API: {total} request(s){self.describe_connections()}")
+        if self.rate_limiter is not None or self.retries or self.rate_limited:
+            print(f"[TIMING]   throttled={self.throttled_seconds:.2f}s waiting for the rate limit (summed over callers), "
+                  f"{self.rate_limited}x 429, {self.retries} retr{'y' if self.retries == 1 else 'ies'} "
+                  f"({self.backoff_seconds:.2f}s backing off)")
+        for key, entry in sorted(stats.items(), key=lambda item: -item[1]['seconds']):
+            errors = f", {entry['errors']} failed" if entry['errors'] else ''
+            print(f"[TIMING]   {key}: {entry['count']}x avg={entry['avg_seconds'] * 1000:.0f}ms "
+                  f"max={entry['max_seconds'] * 1000:.0f}ms total={entry['seconds']:.2f}s{errors}")
+
+class ApiClient(RequestStats):
+    """A pooled keep-alive session for one API, with per-endpoint latency counters.
+
+    With a rate_limiter every request first takes a token from it.
+    Retryable responses (see should_retry) are retried up to max_retries
+    times, waiting for Retry-After when the server sends it and a jittered
+    exponential backoff otherwise; the last response is returned either way.
+    """
+
+    def __init__(self, name, base_url, headers, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 rate_limiter=None, max_retries=MAX_RETRIES):
+        super().__init__(name, rate_limiter)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.pool_size = None
+        self.resize_pool(pool_size)
+
+    def resize_pool(self, pool_size):
+        """Keep up to pool_size idle connections per host (one per worker thread)"""
+        pool_size = max(1, pool_size)
+        if pool_size == self.pool_size:
+            return
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.pool_size = pool_size
+
+    def url(self, path):
+        """Absolute URLs pass through; paths are joined to the API base"""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        url = self.url(path)
+        key = endpoint_key(method, url)
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self._throttled(self.rate_limiter.acquire())
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(key, time.perf_counter() - start, None)
+                # Only GETs are safe to resend when we can't tell whether the server acted
+                if method.upper() != 'GET' or attempt >= self.max_retries:
+                    raise
+                status, delay = None, backoff_seconds(attempt)
+            else:
+                self._record(key, time.perf_counter() - start, response.status_code)
+                if not should_retry(method, response.status_code) or attempt >= self.max_retries:
+                    return response
+                status, delay = response.status_code, retry_delay(response.headers, attempt)
+            self._retrying(status, delay)
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def download(self, url, **kwargs):
+        """GET a pre-signed URL through the pool, without the API credentials"""
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers['Authorization'] = None  # None drops the session header for this request
+        return self.request('GET', url, headers=headers, **kwargs)
+
+    def describe_connections(self):
+        return f' over {self.pool_size} pooled connection(s)'
+
+    def close(self):
+        self.session.close()
+
+def coda_client(token, base_url=CODA_API_BASE, pool_size=DEFAULT_POOL_SIZE):
+    return ApiClient('Coda', base_url, {'Authorization': f'Bearer {token}'}, pool_size=pool_size)
+
+def notion_client(token, base_url=NOTION_API_BASE, pool_size=DEFAULT_POOL_SIZE, rate_limiter=notion_rate_limiter):
+    return ApiClient('Notion', base_url, {
+        'Authorization': f'Bearer {token}',
+        'Notion-Version': NOTION_VERSION,
+        'Content-Type': 'application/json',
+    }, pool_size=pool_size, rate_limiter=rate_limiter)
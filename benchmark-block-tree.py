@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark hash-tree page comparisons on pages with thousands of nested list items.
+
+Uploads a synthetic page of nested bulleted/numbered lists to the fake
+Notion server (notion-stub-server.py, in-process), edits one deeply
+nested item, and counts the Notion reads each way of answering "did it
+change?" and "what changed?" needs:
+
+    full tree      list_block_tree of the whole page, then page_fingerprint / diff_blocks
+    level compare  compare_page, one nesting level at a time, stopping at the first difference
+    recorded root  the content_hash stored with the migration record (no reads)
+    lazy diff      diff_page without a recorded hash tree (skips deleted subtrees only)
+    merkle diff    diff_page with the hash tree recorded at upload (skips every matching subtree)
+
+The merkle diff is applied and the page is read back to check it now
+matches the edited blocks.
+
+Usage:
+    python3 benchmark-block-tree.py [--items 5000] [--depth 5] [--latency 0.02]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import importlib.util
+
+from api_clients import NOTION_RATE_LIMIT
+from notion_async import NotionUploader
+from notion_blocks import diff_blocks, hash_tree, page_fingerprint, tree_root, tree_size
+
+# Import the fake Notion server
+spec = importlib.util.spec_from_file_location("notion_stub_server", "notion-stub-server.py")
+notion_stub_server = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(notion_stub_server)
+
+PARENT_PAGE_ID = 'benchmark-parent'
+
+def list_item(text, numbered=False):
+    block_type = 'numbered_list_item' if numbered else 'bulleted_list_item'
+    return {"object": "block", "type": block_type,
+            block_type: {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+
+def nested_lists(item_count, depth, seed=0):
+    """item_count list items; each goes one level deeper, stays, or climbs back (like kr-line levels)"""
+    rng = random.Random(seed)
+    blocks = []
+    path = []  # Last item seen at each level
+    for i in range(item_count):
+        level = min(len(path), max(0, rng.choice([len(path), len(path) - 1, len(path) - 2])), depth - 1)
+        block = list_item(f"Item {i}: {'lorem ipsum ' * rng.randint(1, 4)}", rng.random() < 0.3)
+        if level == 0:
+            blocks.append(block)
+        else:
+            parent = path[level - 1]
+            parent[parent['type']].setdefault('children', []).append(block)
+        path = path[:level] + [block]
+    return blocks
+
+def deepest_items(blocks, level=0):
+    """(level, block) for every block, deepest first"""
+    found = []
+    for block in blocks:
+        found.append((level, block))
+        found.extend(deepest_items(block[block['type']].get('children', []), level + 1))
+    return sorted(found, key=lambda item: -item[0])
+
+def report(label, requests_made, seconds, result):
+    print(f"{label:<32} {requests_made:>9} {requests_made / NOTION_RATE_LIMIT:>11.1f} {seconds:>8.2f}  {result}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark hash-tree comparisons of deeply nested Notion pages')
+    parser.add_argument('--items', type=int, default=5000, help='List items on the page (default: 5000)')
+    parser.add_argument('--depth', type=int, default=5, help='Maximum nesting depth (default: 5)')
+    parser.add_argument('--latency', type=float, default=0.02, help='Fake server seconds per request (default: 0.02)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the page shape (default: 0)')
+    args = parser.parse_args()
+
+    server, stub, base_url = notion_stub_server.start_server(latency=args.latency)
+    uploader = NotionUploader('benchmark', base_url=base_url, rate_limiter=None)
+
+    blocks = nested_lists(args.items, args.depth, args.seed)
+    start = time.perf_counter()
+    recorded = hash_tree(blocks)
+    hash_seconds = time.perf_counter() - start
+    recorded_json = json.dumps(recorded, separators=(',', ':'))
+
+    # Edit one of the most deeply nested items
+    edited = json.loads(json.dumps(blocks))
+    candidates = deepest_items(edited)
+    deepest = [entry for entry in candidates if entry[0] == candidates[0][0]]
+    level, item = deepest[len(deepest) // 2]
+    item[item['type']]['rich_text'][0]['text']['content'] += ' (edited)'
+    new_nodes = hash_tree(edited)
+
+    print("=" * 60)
+    print("BLOCK HASH TREE BENCHMARK")
+    print("=" * 60)
+    print(f"{tree_size(recorded)} blocks ({len(blocks)} top-level, {args.depth} levels), "
+          f"one item edited at level {level}")
+    print(f"hash_tree: {hash_seconds * 1000:.0f} ms, {len(recorded_json) / 1024:.0f} KB recorded as JSON")
+    print(f"Request counts are what Notion would see; 'at limit' is seconds at {NOTION_RATE_LIMIT:g} req/s")
+    print()
+
+    ok = True
+    try:
+        page_id = uploader.create_page(PARENT_PAGE_ID, 'Nested lists', blocks)
+        print(f"{'':<32} {'requests':>9} {'at limit':>11} {'seconds':>8}  result")
+
+        print("Unchanged page:")
+        start = time.perf_counter()
+        tree, reads = uploader.list_block_tree(page_id)
+        same = page_fingerprint(tree) == tree_root(recorded)
+        report('  full tree', reads, time.perf_counter() - start, 'same' if same else 'DIFFERENT')
+        ok = ok and same
+        start = time.perf_counter()
+        same, reads = uploader.compare_page(page_id, recorded)
+        report('  level compare', reads, time.perf_counter() - start, 'same' if same else 'DIFFERENT')
+        ok = ok and same
+        report('  recorded root', 0, 0.0, 'same')
+
+        print(f"Edited page (level {level} item):")
+        start = time.perf_counter()
+        same, reads = uploader.compare_page(page_id, new_nodes)
+        report('  level compare', reads, time.perf_counter() - start, 'same' if same else 'changed')
+        ok = ok and not same
+        report('  recorded root', 0, 0.0,
+               'same' if tree_root(recorded) == tree_root(new_nodes) else 'changed')
+
+        start = time.perf_counter()
+        tree, reads = uploader.list_block_tree(page_id)
+        full_diff = diff_blocks(page_id, tree, edited)
+        report('  full tree + diff_blocks', reads, time.perf_counter() - start, full_diff.summary())
+        start = time.perf_counter()
+        diff, reads = uploader.diff_page(page_id, edited, nodes=new_nodes)
+        report('  lazy diff', reads, time.perf_counter() - start, diff.summary())
+        start = time.perf_counter()
+        diff, reads = uploader.diff_page(page_id, edited, recorded, new_nodes)
+        report('  merkle diff', reads, time.perf_counter() - start, diff.summary())
+
+        uploader.apply_diff(diff)
+        tree, _ = uploader.list_block_tree(page_id)
+        applied = page_fingerprint(tree) == tree_root(new_nodes)
+        ok = ok and applied and diff.write_requests() == full_diff.write_requests()
+    finally:
+        uploader.close()
+        server.shutdown()
+
+    print()
+    if not ok:
+        print("❌ A comparison gave the wrong answer or the merkle diff did not reproduce the edit")
+        return 1
+    print("✅ All comparisons agree and the merkle diff reproduced the edited page")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTML -> Notion block conversion in threads vs worker processes.
+
+Converts saved raw canvas HTML files (written by `coda-download.py
+--save-raw`) the way the migration's convert stage does: cleanup, list
+restructuring, call date banner, block conversion and hash tree. Runs
+once in a thread pool, where the GIL serialises the work, then in a
+ConversionPool of 1 to N processes. Reports pages per second, speedup
+over one thread, parallel efficiency, and whether every run produced
+the same content hashes.
+
+Usage:
+    python3 benchmark-conversion-pool.py [--repeat 4] [--processes 1,2,4] [output/Page_raw.html ...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+
+# Conversion benchmarks never call the Coda or Notion APIs
+os.environ.setdefault('CODA_API_TOKEN', 'benchmark')
+os.environ.setdefault('NOTION_API_TOKEN', 'benchmark')
+
+# Import from coda-download; registered so conversion workers reuse it
+spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py")
+coda_download = importlib.util.module_from_spec(spec)
+sys.modules['coda_download'] = coda_download
+spec.loader.exec_module(coda_download)
+
+import conversion_pool
+from conversion_pool import ConversionPool, available_cores
+
+def default_process_counts(cores):
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+def run_threads(pages, threads):
+    """Convert every page in a thread pool; returns (seconds, content hashes)"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda page: conversion_pool.convert_html(*page), pages))
+    return time.perf_counter() - start, [result['content_hash'] for result in results]
+
+def run_processes(pages, processes):
+    """Convert every page in a ConversionPool; worker start-up is excluded"""
+    pool = ConversionPool(processes)
+    try:
+        # One job per process makes the executor start them all before timing
+        for future in [pool.submit('<p>warm-up</p>') for _ in range(processes)]:
+            future.result()
+        start = time.perf_counter()
+        futures = [pool.submit(html, call_date) for html, call_date in pages]
+        hashes = [future.result()['content_hash'] for future in futures]
+        return time.perf_counter() - start, hashes
+    finally:
+        pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark threaded vs multi-process HTML conversion on saved pages')
+    parser.add_argument('files', nargs='*', help='Raw canvas HTML files (default: output/*_raw.html)')
+    parser.add_argument('--repeat', type=int, default=4, help='Convert each file this many times (default: 4)')
+    parser.add_argument('--processes', default=None,
+                        help='Comma-separated pool sizes (default: 1, 2, 4, ... up to the available cores)')
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob('output/*_raw.html'))
+    if not files:
+        print("❌ No saved pages found. Run coda-download.py with --save-raw first.")
+        return 1
+    pages = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        name = os.path.basename(path)[:-len('_raw.html')] if path.endswith('_raw.html') else os.path.basename(path)
+        _, call_date = coda_download.extract_title_and_date(name)
+        pages.append((html, call_date))
+    pages = pages * args.repeat
+    cores = available_cores()
+    counts = [int(n) for n in args.processes.split(',')] if args.processes else default_process_counts(cores)
+
+    # The in-process converter the thread runs use
+    conversion_pool._init_worker(None)
+
+    print("=" * 60)
+    print("CONVERSION POOL BENCHMARK")
+    print("=" * 60)
+    print(f"{len(files)} file(s) x {args.repeat} = {len(pages)} page conversions, {cores} core(s) available")
+    print()
+    print(f"{'engine':<14} {'seconds':>8} {'pages/s':>9} {'speedup':>8} {'efficiency':>11}")
+
+    baseline, expected = run_threads(pages, 1)
+    print(f"{'threads=1':<14} {baseline:>8.2f} {len(pages) / baseline:>9.1f} {1.0:>7.2f}x {'':>11}")
+    ok = True
+    seconds, hashes = run_threads(pages, max(counts))
+    ok = ok and hashes == expected
+    print(f"{f'threads={max(counts)}':<14} {seconds:>8.2f} {len(pages) / seconds:>9.1f} {baseline / seconds:>7.2f}x "
+          f"{baseline / seconds / max(counts) * 100:>10.0f}%")
+    for processes in counts:
+        seconds, hashes = run_processes(pages, processes)
+        ok = ok and hashes == expected
+        print(f"{f'processes={processes}':<14} {seconds:>8.2f} {len(pages) / seconds:>9.1f} "
+              f"{baseline / seconds:>7.2f}x {baseline / seconds / processes * 100:>10.0f}%")
+
+    print()
+    if max(counts) > cores:
+        print(f"⚠️  More processes than the {cores} available core(s); they can only share them")
+    if not ok:
+        print("❌ Some runs produced different content hashes")
+        return 1
+    print("✅ Every run produced identical blocks and content hashes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
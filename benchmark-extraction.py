@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark the 'js' and 'cdp' formatting extraction engines on saved pages.
+
+Each saved raw canvas HTML file (written by `coda-download.py --save-raw`)
+is loaded into headless Chrome inside a canvas element, then both engines
+extract it several times. Reports extraction time per engine and whether
+both engines produce the same processed HTML.
+
+Usage:
+    python3 benchmark-extraction.py [--runs 5] [output/Page_raw.html ...]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import tempfile
+import time
+import importlib.util
+
+# Extraction benchmarks never call the Coda or Notion APIs
+os.environ.setdefault('CODA_API_TOKEN', 'benchmark')
+os.environ.setdefault('NOTION_API_TOKEN', 'benchmark')
+
+# Import from coda-download
+spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py")
+coda_download = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(coda_download)
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head>
+<body><div data-coda-ui-id="canvas">{content}</div></body></html>
+'''
+
+def load_saved_page(driver, raw_html):
+    """Open a saved canvas in Chrome via a temporary file:// page"""
+    with tempfile.NamedTemporaryFile('w', suffix='.html', delete=False, encoding='utf-8') as f:
+        f.write(PAGE_TEMPLATE.format(content=raw_html))
+        path = f.name
+    driver.get(f'file://{path}')
+    return path
+
+def time_engine(extract, driver, runs):
+    durations = []
+    html = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        html = extract(driver)
+        durations.append(time.perf_counter() - start)
+    return durations, html
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark js vs cdp extraction engines on saved pages')
+    parser.add_argument('pages', nargs='*', help='Saved raw canvas HTML files (default: output/*_raw.html)')
+    parser.add_argument('--runs', type=int, default=5, help='Extractions per engine per page (default: 5)')
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob.glob('output/*_raw.html'))
+    if not pages:
+        print("⚠️  No saved pages found. Run: python3 coda-download.py --save-raw")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("EXTRACTION ENGINE BENCHMARK")
+    print("=" * 60)
+    print()
+
+    driver = coda_download.setup_driver()
+    totals = {'js': 0.0, 'cdp': 0.0}
+    mismatches = []
+    try:
+        for page in pages:
+            with open(page, 'r', encoding='utf-8') as f:
+                raw_html = f.read()
+            temp_path = load_saved_page(driver, raw_html)
+            try:
+                js_times, js_html = time_engine(coda_download.extract_canvas_html_js, driver, args.runs)
+                cdp_times, cdp_html = time_engine(coda_download.extract_canvas_html_cdp, driver, args.runs)
+            finally:
+                os.remove(temp_path)
+
+            js_median = statistics.median(js_times)
+            cdp_median = statistics.median(cdp_times)
+            totals['js'] += js_median
+            totals['cdp'] += cdp_median
+            same = (coda_download.postprocess_coda_lists(js_html or '') ==
+                    coda_download.postprocess_coda_lists(cdp_html or ''))
+            if not same:
+                mismatches.append(page)
+            print(f"📄 {os.path.basename(page)} ({len(raw_html):,} chars)")
+            print(f"   js:  {js_median * 1000:8.1f} ms (median of {args.runs})")
+            print(f"   cdp: {cdp_median * 1000:8.1f} ms (median of {args.runs})")
+            print(f"   {'✅ identical output' if same else '❌ output differs'}")
+            print()
+    finally:
+        coda_download.teardown_driver(driver)
+
+    print("=" * 60)
+    print("SUMMARY")
+    print("=" * 60)
+    print(f"Pages: {len(pages)}")
+    print(f"js total:  {totals['js'] * 1000:.1f} ms")
+    print(f"cdp total: {totals['cdp'] * 1000:.1f} ms")
+    if totals['cdp'] > 0:
+        print(f"Speedup (js / cdp): {totals['js'] / totals['cdp']:.2f}x")
+    if mismatches:
+        print(f"❌ {len(mismatches)} page(s) differ between engines:")
+        for page in mismatches:
+            print(f"   - {page}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark kr-line list restructuring on synthetic Coda canvases.
+
+Generates canvases from 1k to 100k kr-lines (mixed paragraphs, nested
+bulleted/numbered items, formatting, links and kr-object-e chips), times
+restructure_coda_lists on each and fits the growth exponent on a log-log
+scale. An exponent near 1.0 means the cost per line stays flat as pages
+grow; the run fails if it exceeds --max-exponent.
+
+Usage:
+    python3 benchmark-list-restructure.py [--sizes 1000,10000,100000] [--runs 3]
+"""
+import argparse
+import gc
+import math
+import os
+import random
+import sys
+import time
+import importlib.util
+
+# Extraction benchmarks never call the Coda or Notion APIs
+os.environ.setdefault('CODA_API_TOKEN', 'benchmark')
+os.environ.setdefault('NOTION_API_TOKEN', 'benchmark')
+
+# Import from coda-download
+spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py")
+coda_download = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(coda_download)
+
+DEFAULT_SIZES = [1000, 2000, 5000, 10000, 20000, 50000, 100000]
+
+LINE_CLASSES = [
+    'kr-line block-level-0',
+    'kr-line kr-ulist kr-listitem block-level-0',
+    'kr-line kr-ulist kr-listitem block-level-1',
+    'kr-line kr-ulist kr-listitem block-level-2',
+    'kr-line kr-olist kr-listitem block-level-0',
+    'kr-line kr-olist kr-listitem block-level-1',
+]
+
+INLINE_FRAGMENTS = [
+    '<span>Plain text {i} </span>',
+    '<strong>bold {i}</strong> ',
+    '<span><em>italic</em> and <u>underline</u> </span>',
+    '<s>struck</s> ',
+    '<a href="https://example.com/{i}">link {i}</a> ',
+    '<span class="kr-object-e"><span><a href="https://example.com/chip/{i}">chip</a></span></span>',
+    '<code>code()</code>',
+]
+
+def synthetic_canvas(line_count, seed=0):
+    """Canvas HTML shaped like extract_canvas_html_js output"""
+    rng = random.Random(seed)
+    parts = ['<div class="kr-canvas-header"><h1>Synthetic page</h1></div><div class="kr-canvas">']
+    for i in range(line_count):
+        fragments = ''.join(rng.choice(INLINE_FRAGMENTS).format(i=i) for _ in range(rng.randint(1, 4)))
+        parts.append(f'<div class="{rng.choice(LINE_CLASSES)}">{fragments}</div>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+def time_restructure(html, runs):
+    """Best-of-runs seconds for restructure_coda_lists; parsing is not timed"""
+    best = None
+    for _ in range(runs):
+        soup = coda_download.make_soup(html)
+        gc.collect()
+        start = time.perf_counter()
+        coda_download.restructure_coda_lists(soup)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del soup
+    return best
+
+def growth_exponent(sizes, seconds):
+    """Least-squares slope of log(time) against log(size)"""
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(t) for t in seconds]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return (sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) /
+            sum((x - mean_x) ** 2 for x in xs))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark kr-line list restructuring from 1k to 100k lines')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='Comma-separated kr-line counts (default: 1k to 100k)')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per size, best is kept (default: 3)')
+    parser.add_argument('--max-exponent', type=float, default=1.15,
+                        help='Fail if the fitted growth exponent exceeds this (default: 1.15)')
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.sizes.split(',') if n.strip()]
+    if len(sizes) < 2:
+        print("⚠️  Need at least two sizes to fit a growth exponent")
+        return 1
+
+    print("=" * 60)
+    print("LIST RESTRUCTURING BENCHMARK")
+    print("=" * 60)
+    print(f"{'lines':>10} {'total ms':>12} {'µs/line':>10}")
+
+    seconds = []
+    for size in sizes:
+        elapsed = time_restructure(synthetic_canvas(size), args.runs)
+        seconds.append(elapsed)
+        print(f"{size:>10,} {elapsed * 1000:>12.1f} {elapsed / size * 1e6:>10.2f}")
+
+    exponent = growth_exponent(sizes, seconds)
+    print()
+    print(f"Fitted growth: time ∝ lines^{exponent:.2f}")
+    if exponent > args.max_exponent:
+        print(f"❌ Exponent above {args.max_exponent} - restructuring is not scaling linearly")
+        return 1
+    print(f"✅ Linear scaling (exponent ≤ {args.max_exponent})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
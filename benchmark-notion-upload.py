@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark Notion upload throughput against a local fake Notion server.
+
+Starts notion-stub-server.py in-process with a fixed per-request latency,
+then uploads the same synthetic pages twice: once the threaded way (one
+blocking create + chunk appends per worker thread, as before the async
+engine) and once through AsyncNotionClient with many pages in flight.
+Every uploaded page is checked for its full block count.
+
+Usage:
+    python3 benchmark-notion-upload.py [--pages 60] [--blocks 250] [--latency 0.2]
+                                       [--workers 5] [--in-flight 50] [--rate 0]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+
+from api_clients import TokenBucket, notion_client
+from notion_async import AsyncNotionClient
+
+# Import the fake Notion server
+spec = importlib.util.spec_from_file_location("notion_stub_server", "notion-stub-server.py")
+notion_stub_server = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(notion_stub_server)
+
+PARENT_PAGE_ID = 'benchmark-parent'
+
+def synthetic_blocks(count):
+    return [{
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {"rich_text": [{"type": "text", "text": {"content": f"Paragraph {i}"}}]}
+    } for i in range(count)]
+
+def rate_limiter(rate):
+    return TokenBucket(rate) if rate > 0 else None
+
+def upload_threaded(base_url, pages, workers, rate):
+    """Blocking create + appends per page, one page per worker thread at a time"""
+    client = notion_client('benchmark', base_url=base_url, pool_size=workers, rate_limiter=rate_limiter(rate))
+
+    def upload(page):
+        title, blocks = page
+        r = client.post('/pages', json={
+            "parent": {"page_id": PARENT_PAGE_ID},
+            "properties": {"title": {"title": [{"type": "text", "text": {"content": title}}]}},
+            "children": blocks[:100]})
+        r.raise_for_status()
+        page_id = r.json()['id']
+        for start in range(100, len(blocks), 100):
+            client.patch(f'/blocks/{page_id}/children', json={"children": blocks[start:start + 100]}).raise_for_status()
+        return page_id
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        page_ids = list(executor.map(upload, pages))
+    client.close()
+    return page_ids, client
+
+async def upload_async(base_url, pages, in_flight, rate):
+    """All pages scheduled at once; the connection limit and bucket pace them"""
+    async with AsyncNotionClient('benchmark', base_url=base_url, max_in_flight=in_flight,
+                                 rate_limiter=rate_limiter(rate)) as notion:
+        page_ids = await asyncio.gather(*(notion.create_page(PARENT_PAGE_ID, title, blocks)
+                                          for title, blocks in pages))
+    return page_ids, notion
+
+def report(label, seconds, pages, client, stub, page_ids, blocks_per_page):
+    requests_made = sum(entry['count'] for entry in client.stats().values())
+    complete = sum(1 for page_id in page_ids if stub.block_count(page_id) == blocks_per_page)
+    print(f"{label:<10} {seconds:>8.2f} {len(pages) / seconds:>9.2f} {requests_made / seconds:>8.1f} "
+          f"{client.retries:>8} {complete:>5}/{len(pages)}")
+    return complete == len(pages)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark threaded vs async Notion uploads on a fake Notion server')
+    parser.add_argument('--pages', type=int, default=60, help='Pages to upload per engine (default: 60)')
+    parser.add_argument('--blocks', type=int, default=250, help='Blocks per page (default: 250, i.e. 3 requests)')
+    parser.add_argument('--latency', type=float, default=0.2, help='Fake server seconds per request (default: 0.2)')
+    parser.add_argument('--workers', type=int, default=5, help='Threads for the threaded engine (default: 5)')
+    parser.add_argument('--in-flight', type=int, default=50, help='Concurrent requests for the async engine (default: 50)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Client-side requests/second limit for both engines, 0 for none (default: 0)')
+    parser.add_argument('--server-rate-limit', type=float, default=None,
+                        help='Have the fake server answer 429 above this many requests/second')
+    args = parser.parse_args()
+
+    server, stub, base_url = notion_stub_server.start_server(
+        latency=args.latency, rate_limit=args.server_rate_limit)
+    pages = [(f'Benchmark page {i}', synthetic_blocks(args.blocks)) for i in range(args.pages)]
+
+    print("=" * 60)
+    print("NOTION UPLOAD BENCHMARK")
+    print("=" * 60)
+    print(f"{args.pages} pages x {args.blocks} blocks, {args.latency * 1000:.0f} ms per request, "
+          f"rate limit {args.rate or 'none'}/s")
+    print()
+    print(f"{'engine':<10} {'seconds':>8} {'pages/s':>9} {'req/s':>8} {'retries':>8} {'complete':>11}")
+
+    try:
+        start = time.perf_counter()
+        page_ids, client = upload_threaded(base_url, pages, args.workers, args.rate)
+        threaded_seconds = time.perf_counter() - start
+        ok = report(f'threads={args.workers}', threaded_seconds, pages, client, stub, page_ids, args.blocks)
+
+        start = time.perf_counter()
+        page_ids, notion = asyncio.run(upload_async(base_url, pages, args.in_flight, args.rate))
+        async_seconds = time.perf_counter() - start
+        ok = report(f'async={args.in_flight}', async_seconds, pages, notion, stub, page_ids, args.blocks) and ok
+    finally:
+        server.shutdown()
+
+    print()
+    print(f"Async speedup: {threaded_seconds / async_seconds:.2f}x")
+    if not ok:
+        print("❌ Some pages are missing blocks")
+        return 1
+    print("✅ All pages uploaded with every block")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the conversion code, on recorded Coda pages.
+
+Runs every page of a corpus through each benchmark:
+
+    postprocess_coda_lists  raw canvas HTML -> nested-list HTML (parse, restructure, serialize)
+    html_to_notion_blocks   nested-list HTML -> Notion blocks
+    content_hash            Notion blocks -> hash tree and page fingerprint (tree_root(hash_tree()))
+    convert                 the migration's convert stage: conversion_pool.convert_html with the call date banner
+
+The corpus is the raw canvas HTML recorded by `coda-download.py --save-raw`
+(output/*_raw.html), or the files given. With no recorded pages, or with
+--synthetic, synthetic canvases of the given kr-line counts are added
+(the generator from benchmark-list-restructure.py).
+
+Reports pages/s and blocks/s (best of --repeat passes over the corpus) and
+peak Python memory per page (tracemalloc, in a separate untimed pass),
+and checks that every pass produces the same content hashes. Results are
+written to benchmark-results/<label>.json (label: the git commit by
+default); --compare prints the changes against an earlier result and
+flags pages whose blocks changed.
+
+Usage:
+    python3 benchmark-suite.py [--repeat 3] [--synthetic 100,1000,5000] [--label NAME]
+                               [--compare benchmark-results/OLD.json] [--max-slowdown 10] [output/Page_raw.html ...]
+"""
+import argparse
+import contextlib
+import gc
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import importlib.util
+from datetime import datetime
+
+# Conversion benchmarks never call the Coda or Notion APIs
+os.environ.setdefault('CODA_API_TOKEN', 'benchmark')
+os.environ.setdefault('NOTION_API_TOKEN', 'benchmark')
+
+# Import from coda-download; registered so conversion_pool reuses it
+spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py")
+coda_download = importlib.util.module_from_spec(spec)
+sys.modules['coda_download'] = coda_download
+spec.loader.exec_module(coda_download)
+
+spec = importlib.util.spec_from_file_location("benchmark_list_restructure", "benchmark-list-restructure.py")
+benchmark_list_restructure = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(benchmark_list_restructure)
+
+import conversion_pool
+from notion_blocks import hash_tree, tree_root, tree_size
+
+RESULTS_DIR = 'benchmark-results'
+DEFAULT_SYNTHETIC_SIZES = [100, 1000, 5000]  # kr-lines, when there are no recorded pages
+BENCHMARKS = ['postprocess_coda_lists', 'html_to_notion_blocks', 'content_hash', 'convert']
+
+class Page:
+    """One corpus page and the inputs each benchmark starts from (prepared untimed)"""
+
+    def __init__(self, name, html, call_date=None, source='recorded'):
+        self.name = name
+        self.html = html
+        self.call_date = call_date
+        self.source = source
+        self.digest = hashlib.sha256(html.encode('utf-8')).hexdigest()[:16]
+        self.list_html = coda_download.postprocess_coda_lists(html)
+        converted = conversion_pool.convert_html(html, call_date)
+        self.blocks = converted['blocks'] or []
+        self.block_count = tree_size(converted['block_hashes'] or [])
+        self.content_hash = converted['content_hash']
+
+def run_benchmark(name, page):
+    """Run one benchmark on one page; returns the content hash it produced, if it produces one"""
+    if name == 'postprocess_coda_lists':
+        coda_download.postprocess_coda_lists(page.html)
+    elif name == 'html_to_notion_blocks':
+        coda_download.html_to_notion_blocks(page.list_html)
+    elif name == 'content_hash':
+        return tree_root(hash_tree(page.blocks))
+    elif name == 'convert':
+        return conversion_pool.convert_html(page.html, page.call_date)['content_hash']
+    return None
+
+def load_corpus(paths, synthetic_sizes):
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        name = os.path.basename(path)
+        name = name[:-len('_raw.html')] if name.endswith('_raw.html') else name
+        pages.append(Page(name, html, coda_download.extract_title_and_date(name)[1]))
+    for size in synthetic_sizes:
+        html = benchmark_list_restructure.synthetic_canvas(size)
+        pages.append(Page(f'synthetic-{size}', html, source='synthetic'))
+    return pages
+
+def time_benchmark(name, pages, repeat):
+    """Best-of-repeat seconds over the corpus and per page; False if a pass changed any content hash"""
+    best_total, best_page, consistent, expected = None, [None] * len(pages), True, None
+    for _ in range(repeat):
+        gc.collect()
+        hashes = []
+        total = 0.0
+        for index, page in enumerate(pages):
+            start = time.perf_counter()
+            hashes.append(run_benchmark(name, page))
+            elapsed = time.perf_counter() - start
+            total += elapsed
+            best_page[index] = elapsed if best_page[index] is None else min(best_page[index], elapsed)
+        best_total = total if best_total is None else min(best_total, total)
+        consistent = consistent and (expected is None or hashes == expected)
+        expected = hashes
+    return best_total, best_page, consistent
+
+def peak_memory(name, pages):
+    """Largest tracemalloc peak (bytes above the starting point) of one page of the benchmark"""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for page in pages:
+            gc.collect()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            run_benchmark(name, page)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def git_revision():
+    """Short commit hash, with -dirty for uncommitted changes; None outside a git checkout"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty else '')
+
+def corpus_digest(pages):
+    return hashlib.sha256(''.join(page.digest for page in pages).encode()).hexdigest()[:16]
+
+def compare(result, baseline, max_slowdown):
+    """Print the changes against an earlier result; returns False if a benchmark slowed down more than max_slowdown %"""
+    print()
+    print("=" * 60)
+    print(f"COMPARED WITH {baseline['label']} ({baseline['created']})")
+    print("=" * 60)
+    if baseline['corpus_digest'] != result['corpus_digest']:
+        print("⚠️  Different corpus than the baseline; only benchmarks over the same pages are comparable")
+    if baseline['parser'] != result['parser']:
+        print(f"⚠️  Baseline used the {baseline['parser']} parser, this run {result['parser']}")
+    print(f"{'benchmark':<24} {'pages/s':>18} {'change':>8} {'peak MiB':>16}")
+    ok = True
+    for name, now in result['benchmarks'].items():
+        before = baseline['benchmarks'].get(name)
+        if before is None:
+            print(f"{name:<24} {'(new)':>18}")
+            continue
+        change = (now['pages_per_second'] / before['pages_per_second'] - 1) * 100
+        print(f"{name:<24} {before['pages_per_second']:>8.1f} -> {now['pages_per_second']:>6.1f} {change:>+7.1f}% "
+              f"{before['peak_memory_mib']:>7.2f} -> {now['peak_memory_mib']:>5.2f}")
+        if max_slowdown is not None and change < -max_slowdown:
+            ok = False
+    old_hashes = {page['digest']: page['content_hash'] for page in baseline['pages']}
+    changed = [page['name'] for page in result['pages']
+               if page['digest'] in old_hashes and old_hashes[page['digest']] != page['content_hash']]
+    if changed:
+        print(f"⚠️  {len(changed)} page(s) convert to different blocks than in {baseline['label']}: "
+              + ', '.join(changed))
+    if not ok:
+        print(f"❌ A benchmark slowed down by more than {max_slowdown:g}%")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark list restructuring, block conversion, hashing and the '
+                                                 'convert stage on recorded Coda pages')
+    parser.add_argument('files', nargs='*', help='Raw canvas HTML files (default: output/*_raw.html)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the corpus, best is kept (default: 3)')
+    parser.add_argument('--synthetic', default=None,
+                        help='Comma-separated kr-line counts of synthetic canvases to add to the corpus '
+                             f'(default: {",".join(str(n) for n in DEFAULT_SYNTHETIC_SIZES)} when no pages are recorded)')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help=f'Comma-separated benchmarks to run (default: all of {", ".join(BENCHMARKS)})')
+    parser.add_argument('--parser', default='auto', choices=['auto'] + list(coda_download.HTML_PARSER_PREFERENCE),
+                        help="BeautifulSoup parser backend (default: auto)")
+    parser.add_argument('--label', default=None, help='Name of this result (default: the git commit, or a timestamp)')
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help=f'Where results are stored (default: {RESULTS_DIR})')
+    parser.add_argument('--no-save', action='store_true', help='Do not write the result file')
+    parser.add_argument('--compare', default=None, metavar='RESULT', help='Earlier result file to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=None, metavar='PERCENT',
+                        help='With --compare, fail if any benchmark\'s pages/s dropped by more than this')
+    args = parser.parse_args()
+
+    benchmarks = [name for name in args.benchmarks.split(',') if name]
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    html_parser = coda_download.set_html_parser(args.parser)
+    conversion_pool._init_worker(html_parser)
+    files = args.files or sorted(glob.glob('output/*_raw.html'))
+    if args.synthetic is not None:
+        synthetic_sizes = [int(n) for n in args.synthetic.split(',') if n.strip()]
+    else:
+        synthetic_sizes = [] if files else DEFAULT_SYNTHETIC_SIZES
+    if not files:
+        print("⚠️  No recorded pages found (run coda-download.py with --save-raw); using synthetic canvases")
+
+    # Conversion debug output would drown the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        pages = load_corpus(files, synthetic_sizes)
+    if not pages:
+        print("❌ Empty corpus")
+        return 1
+    page_blocks = sum(page.block_count for page in pages)
+
+    print("=" * 60)
+    print("CONVERSION BENCHMARK SUITE")
+    print("=" * 60)
+    print(f"{len(pages)} page(s), {sum(len(page.html) for page in pages) / 1e6:.2f}M chars of HTML, "
+          f"{page_blocks} block(s); parser {html_parser}, best of {args.repeat}")
+    print()
+    print(f"{'page':<28} {'chars':>10} {'blocks':>7}")
+    for page in pages:
+        print(f"{page.name[:28]:<28} {len(page.html):>10,} {page.block_count:>7}")
+    print()
+    print(f"{'benchmark':<24} {'seconds':>8} {'pages/s':>9} {'blocks/s':>10} {'peak MiB':>9}")
+
+    results = {}
+    per_page = {page.name: {} for page in pages}
+    ok = True
+    for name in benchmarks:
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, page_seconds, consistent = time_benchmark(name, pages, args.repeat)
+            peak = peak_memory(name, pages)
+        ok = ok and consistent
+        results[name] = {'seconds': round(seconds, 6), 'pages_per_second': round(len(pages) / seconds, 3),
+                         'blocks_per_second': round(page_blocks / seconds, 1),
+                         'peak_memory_mib': round(peak / 2 ** 20, 3)}
+        for page, elapsed in zip(pages, page_seconds):
+            per_page[page.name][name] = round(elapsed * 1000, 3)
+        print(f"{name:<24} {seconds:>8.3f} {len(pages) / seconds:>9.1f} {page_blocks / seconds:>10.0f} "
+              f"{peak / 2 ** 20:>9.2f}" + ('' if consistent else '  ❌ hashes changed between passes'))
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(f"Process peak RSS: {max_rss:.0f} MiB")
+
+    result = {
+        'label': args.label or git_revision() or datetime.now().strftime('%Y%m%d-%H%M%S'),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parser': html_parser,
+        'repeat': args.repeat,
+        'corpus_digest': corpus_digest(pages),
+        'pages': [{'name': page.name, 'source': page.source, 'digest': page.digest, 'chars': len(page.html),
+                   'blocks': page.block_count, 'content_hash': page.content_hash, 'ms': per_page[page.name]}
+                  for page in pages],
+        'benchmarks': results,
+        'max_rss_mib': round(max_rss, 1),
+    }
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        path = os.path.join(args.results_dir, f"{result['label']}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Result saved to {path}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        ok = compare(result, baseline, args.max_slowdown) and ok
+
+    print()
+    if not ok:
+        print("❌ Benchmark suite failed")
+        return 1
+    print("✅ Every pass produced identical content hashes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
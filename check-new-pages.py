@@ -2,7 +2,6 @@
 """Check for new pages in Coda that need to be migrated"""
 import os
 import sys
-import requests
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,21 +12,19 @@ import importlib.util
 spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py")
 coda_download = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(coda_download)
+from migration_state import MigrationState, DEFAULT_STATE_PATH
 
-NOTION_API_TOKEN = os.getenv('NOTION_API_TOKEN')
 NOTION_PARENT_PAGE_ID = '2c3636dd-0ba5-807e-b374-c07a0134e636'
 
-notion_headers = {
-    'Authorization': f'Bearer {NOTION_API_TOKEN}',
-    'Notion-Version': '2022-06-28',
-}
+# Reuse coda-download's pooled Notion session
+notion_api = coda_download.notion_api
 
 def get_notion_pages():
     """Get all pages from Notion"""
     notion_pages = []
-    url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children'
+    url = f'/blocks/{NOTION_PARENT_PAGE_ID}/children'
     while url:
-        response = requests.get(url, headers=notion_headers)
+        response = notion_api.get(url)
         if not response.ok:
             break
         data = response.json()
@@ -37,7 +34,7 @@ def get_notion_pages():
         if data.get('has_more'):
             next_cursor = data.get('next_cursor')
             if next_cursor:
-                url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children?start_cursor={next_cursor}'
+                url = f'/blocks/{NOTION_PARENT_PAGE_ID}/children?start_cursor={next_cursor}'
             else:
                 url = None
         else:
@@ -72,17 +69,30 @@ def main():
         print(f"Total Coda pages: {len(coda_pages)}")
         print(f"Pages before '{start_from}': {start_index}\n")
     
+    # Pages recorded in the migration state are already migrated; only the rest need Notion
+    state = MigrationState(DEFAULT_STATE_PATH)
+    tracked = state.all()
+    state.close()
+    untracked_pages = [page for page in pages_to_migrate
+                       if not (tracked.get(page.get('id')) or {}).get('notion_page_id')]
+    print(f"Recorded in migration state: {len(pages_to_migrate) - len(untracked_pages)}\n")
+    
     # Get pages from Notion
-    print("Fetching pages from Notion...")
-    notion_pages = get_notion_pages()
-    print(f"Found {len(notion_pages)} pages in Notion\n")
+    notion_pages = []
+    if untracked_pages:
+        print("Fetching pages from Notion...")
+        notion_pages = get_notion_pages()
+        print(f"Found {len(notion_pages)} pages in Notion\n")
     
     # Create normalized title maps
     coda_titles = {}
+    untracked_titles = set()
     for page in pages_to_migrate:
         name = page.get('name', 'unnamed')
         notion_title, _ = coda_download.extract_title_and_date(name)
         coda_titles[coda_download.normalize(notion_title)] = (name, notion_title)
+        if not (tracked.get(page.get('id')) or {}).get('notion_page_id'):
+            untracked_titles.add(coda_download.normalize(notion_title))
     
     notion_titles = {}
     for page in notion_pages:
@@ -92,7 +102,7 @@ def main():
     # Find missing pages
     missing_pages = []
     for norm_title, (original_name, notion_title) in coda_titles.items():
-        if norm_title not in notion_titles:
+        if norm_title in untracked_titles and norm_title not in notion_titles:
             missing_pages.append((original_name, notion_title))
     
     print("=" * 60)
@@ -2,17 +2,13 @@
 """Check if a specific Coda page has been modified and needs re-migration"""
 import os
 import sys
-import requests
 from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import hashlib
-import time
+from migration_state import MigrationState, DEFAULT_STATE_PATH
+from notion_blocks import tree_root
 
 load_dotenv()
 
@@ -23,69 +19,29 @@ spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py
 coda_download = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(coda_download)
 
-NOTION_API_TOKEN = os.getenv('NOTION_API_TOKEN')
 NOTION_PARENT_PAGE_ID = '2c3636dd-0ba5-807e-b374-c07a0134e636'
 
-notion_headers = {
-    'Authorization': f'Bearer {NOTION_API_TOKEN}',
-    'Notion-Version': '2022-06-28',
-}
+# Reuse coda-download's pooled Notion session
+notion_api = coda_download.notion_api
 
-def get_page_content_hash(driver, url):
-    """Extract content from Coda page and return hash"""
-    try:
-        driver.get(url)
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, '[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]'))
-        )
-        time.sleep(2)
-        
-        # Get HTML content
-        html_content = driver.execute_script('''
-        let contentElements = document.querySelectorAll('[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]');
-        for (let element of contentElements) {
-            if (element.offsetWidth > 0 && element.offsetHeight > 0) {
-                return element.innerText;
-            }
-        }
-        return null;
-        ''')
-        
-        if html_content:
-            # Create hash of content
-            content_hash = hashlib.md5(html_content.encode('utf-8')).hexdigest()
-            return content_hash, html_content[:200]  # Return hash and preview
-        return None, None
-    except Exception as e:
-        print(f"Error extracting content: {e}")
+def get_page_block_hashes(driver, page):
+    """Extract a Coda page the way the migration does; returns (block hash tree, text preview)"""
+    pipeline = coda_download.extract_pipeline(driver, page.get('browserLink', ''))
+    if pipeline is None or not pipeline.text:
         return None, None
+    _, call_date = coda_download.extract_title_and_date(page.get('name', ''))
+    pipeline.add_call_date(call_date)
+    return pipeline.block_hashes(), pipeline.text[:200]
 
-def get_notion_content_hash(page_id):
-    """Get content from Notion page and return hash"""
+def notion_page_matches(page_id, block_hashes):
+    """Compare the Notion page to the hash tree level by level, stopping at the first difference"""
     try:
-        url = f'https://api.notion.com/v1/blocks/{page_id}/children'
-        response = requests.get(url, headers=notion_headers)
-        if not response.ok:
-            return None, None
-        
-        blocks = response.json().get('results', [])
-        # Extract text content from blocks
-        text_content = []
-        for block in blocks[:50]:  # Check first 50 blocks
-            block_type = block.get('type')
-            if block_type in ['paragraph', 'heading_1', 'heading_2', 'heading_3', 'bulleted_list_item', 'numbered_list_item']:
-                rich_text = block.get(block_type, {}).get('rich_text', [])
-                for text in rich_text:
-                    text_content.append(text.get('plain_text', ''))
-        
-        content = '\n'.join(text_content)
-        if content:
-            content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-            return content_hash, content[:200]  # Return hash and preview
-        return None, None
-    except Exception as e:
+        same, reads = coda_download.get_notion_uploader().compare_page(page_id, block_hashes)
+        print(f"   Read {reads} listing(s) from Notion")
+        return same
+    except coda_download.NotionApiError as e:
         print(f"Error getting Notion content: {e}")
-        return None, None
+        return None
 
 def main():
     page_name = "FalconX"
@@ -116,9 +72,9 @@ def main():
     # Find page in Notion
     print(f"\nSearching for '{page_name}' in Notion...")
     notion_pages = []
-    url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children'
+    url = f'/blocks/{NOTION_PARENT_PAGE_ID}/children'
     while url:
-        response = requests.get(url, headers=notion_headers)
+        response = notion_api.get(url)
         if not response.ok:
             break
         data = response.json()
@@ -128,7 +84,7 @@ def main():
         if data.get('has_more'):
             next_cursor = data.get('next_cursor')
             if next_cursor:
-                url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children?start_cursor={next_cursor}'
+                url = f'/blocks/{NOTION_PARENT_PAGE_ID}/children?start_cursor={next_cursor}'
             else:
                 url = None
         else:
@@ -178,9 +134,9 @@ def main():
     driver = webdriver.Chrome(service=service, options=options)
     
     try:
-        coda_hash, coda_preview = get_page_content_hash(driver, coda_page.get('browserLink', ''))
-        if coda_hash:
-            print(f"✅ Coda content hash: {coda_hash[:16]}...")
+        block_hashes, coda_preview = get_page_block_hashes(driver, coda_page)
+        if block_hashes is not None:
+            print(f"✅ Coda content hash: {tree_root(block_hashes)[:16]}...")
             print(f"   Preview: {coda_preview[:100]}...")
         else:
             print("❌ Could not extract Coda content")
@@ -188,20 +144,25 @@ def main():
     finally:
         driver.quit()
     
-    print("\nExtracting content from Notion...")
-    notion_hash, notion_preview = get_notion_content_hash(notion_page.get('id'))
-    if notion_hash:
-        print(f"✅ Notion content hash: {notion_hash[:16]}...")
-        print(f"   Preview: {notion_preview[:100]}...")
+    # The recorded fingerprint of the last upload answers without reading Notion
+    state = MigrationState(DEFAULT_STATE_PATH)
+    record = state.get(coda_page.get('id'))
+    state.close()
+    if record and record.get('notion_page_id') == notion_page.get('id') and record.get('content_hash'):
+        print(f"\nRecorded hash of the last upload: {record['content_hash'][:16]}...")
+        matches = record['content_hash'] == tree_root(block_hashes)
     else:
-        print("❌ Could not extract Notion content")
-        return
+        print("\nComparing with the Notion page...")
+        matches = notion_page_matches(notion_page.get('id'), block_hashes)
+        if matches is None:
+            print("❌ Could not extract Notion content")
+            return
     
     print("\n" + "=" * 60)
     print("RESULT")
     print("=" * 60)
     
-    if coda_hash == notion_hash:
+    if matches:
         print("✅ Content matches - page is up to date!")
         print("   No changes detected in Coda")
     else:
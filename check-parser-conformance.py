@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Check that every installed HTML parser backend produces the same Notion
+blocks on saved Coda pages, and compare their throughput.
+
+Each saved page (raw canvas HTML from `coda-download.py --save-raw`, or the
+processed output/<page>.html files) goes through the full HtmlPipeline once
+per backend: parse, cleanup, list restructuring, date banner, hash and block
+conversion. html.parser is the reference; any backend whose blocks or
+content hash differ on any page fails the check.
+
+Usage:
+    python3 check-parser-conformance.py [--runs 3] [output/Page_raw.html ...]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+import importlib.util
+
+# Parser checks never call the Coda or Notion APIs
+os.environ.setdefault('CODA_API_TOKEN', 'benchmark')
+os.environ.setdefault('NOTION_API_TOKEN', 'benchmark')
+
+# Import from coda-download
+spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py")
+coda_download = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(coda_download)
+
+REFERENCE_PARSER = 'html.parser'
+
+def installed_parsers():
+    from bs4.builder import builder_registry
+    return [name for name in coda_download.HTML_PARSER_PREFERENCE if builder_registry.lookup(name)]
+
+def page_call_date(path):
+    """Call date from a saved page's file name, as process_page would derive it"""
+    name = os.path.basename(path)
+    for suffix in ('_raw.html', '.html'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return coda_download.extract_title_and_date(name)[1]
+
+def convert(raw_html, call_date, parser):
+    """Run the full single-parse pipeline; returns (blocks, content_hash)"""
+    pipeline = coda_download.HtmlPipeline(raw_html, parser=parser).cleanup().restructure_lists()
+    pipeline.add_call_date(call_date)
+    content_hash = pipeline.content_hash()
+    return pipeline.to_blocks(), content_hash
+
+def time_parser(pages, parser, runs):
+    """Best-of-runs seconds to parse only, and to run the whole pipeline, over all pages"""
+    best_parse = best_total = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        for raw_html, _ in pages:
+            coda_download.make_soup(raw_html, parser)
+        parse_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for raw_html, call_date in pages:
+            convert(raw_html, call_date, parser)
+        total_seconds = time.perf_counter() - start
+        best_parse = parse_seconds if best_parse is None else min(best_parse, parse_seconds)
+        best_total = total_seconds if best_total is None else min(best_total, total_seconds)
+    return best_parse, best_total
+
+def main():
+    parser = argparse.ArgumentParser(description='Check Notion block output is identical across HTML parser backends')
+    parser.add_argument('pages', nargs='*',
+                        help='Saved page HTML files (default: output/*_raw.html, else output/*.html)')
+    parser.add_argument('--runs', type=int, default=3, help='Timed passes per backend, best is kept (default: 3)')
+    args = parser.parse_args()
+
+    paths = args.pages or sorted(glob.glob('output/*_raw.html')) or sorted(glob.glob('output/*.html'))
+    if not paths:
+        print("⚠️  No saved pages found. Run: python3 coda-download.py --save-raw")
+        return 1
+
+    parsers = installed_parsers()
+    print("=" * 60)
+    print("HTML PARSER CONFORMANCE")
+    print("=" * 60)
+    print(f"Backends: {', '.join(parsers)} (reference: {REFERENCE_PARSER})")
+    print(f"Pages: {len(paths)}")
+    print()
+
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append((f.read(), page_call_date(path)))
+
+    mismatches = []
+    # Pipeline debug output would drown the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path, (raw_html, call_date) in zip(paths, pages):
+            reference = convert(raw_html, call_date, REFERENCE_PARSER)
+            for name in parsers:
+                if name != REFERENCE_PARSER and convert(raw_html, call_date, name) != reference:
+                    mismatches.append((path, name))
+
+    for path, name in mismatches:
+        print(f"❌ {os.path.basename(path)}: {name} output differs from {REFERENCE_PARSER}")
+    if not mismatches:
+        print(f"✅ Identical Notion blocks and content hashes from all {len(parsers)} backend(s)")
+    print()
+
+    total_mb = sum(len(raw_html.encode('utf-8')) for raw_html, _ in pages) / 1e6
+    print("=" * 60)
+    print("THROUGHPUT")
+    print("=" * 60)
+    print(f"{'backend':<12} {'parse MB/s':>11} {'pipeline MB/s':>14} {'pages/s':>9}")
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in parsers:
+            results[name] = time_parser(pages, name, args.runs)
+    for name in parsers:
+        parse_seconds, total_seconds = results[name]
+        print(f"{name:<12} {total_mb / parse_seconds:>11.2f} {total_mb / total_seconds:>14.2f} "
+              f"{len(pages) / total_seconds:>9.1f}")
+    reference_total = results[REFERENCE_PARSER][1]
+    for name in parsers:
+        if name != REFERENCE_PARSER:
+            print(f"{name} pipeline speedup vs {REFERENCE_PARSER}: {reference_total / results[name][1]:.2f}x")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Per-page checkpoint journal for resuming an interrupted migration.
+
+Every step a page completes is appended to a JSON-lines journal and
+flushed to disk before the page moves on:
+
+    extracted   canvas/export HTML (or kr-lines) saved as an artifact
+    converted   Notion blocks and their hash tree saved as an artifact
+    created     Notion page created with the first chunk of n
+    appended    chunk k of n appended to it
+    done        the page was created, updated or skipped; artifacts deleted
+
+A run started with --resume replays the journal: done pages are not
+touched again, converted and extracted pages pick up from their saved
+artifacts without a browser, and a page whose upload stopped part way
+gets its remaining chunks appended to the same Notion page. A run
+without --resume starts a fresh journal. A disabled journal (dry runs)
+records nothing and leaves the files of the last real run alone.
+
+A crash can cut the last line short; replay ignores it, so at worst the
+step it recorded is done again.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+DEFAULT_JOURNAL_PATH = os.getenv('MIGRATION_JOURNAL', 'migration_journal.jsonl')
+
+STEPS = ('extracted', 'converted', 'created', 'appended', 'done')
+
+class CheckpointJournal:
+    """Append-only journal of page steps plus a directory of per-page artifacts"""
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, resume=False, enabled=True):
+        self.path = path
+        self.artifact_dir = os.path.splitext(path)[0] + '_artifacts'
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.pages = {}  # coda page id -> latest step with the fields recorded along the way
+        self._file = None
+        if not enabled:
+            return
+        if resume:
+            self._replay()
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+            shutil.rmtree(self.artifact_dir, ignore_errors=True)
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write from the crash
+                self.pages.setdefault(entry.pop('page'), {}).update(entry)
+
+    def record(self, page_id, step, **fields):
+        """Append one step for a page and force it to disk"""
+        if not self.enabled:
+            return
+        entry = dict(fields, page=page_id, step=step, at=time.time())
+        line = json.dumps(entry, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.pages.setdefault(page_id, {}).update(fields, step=step, at=entry['at'])
+
+    def step(self, page_id):
+        """Last step recorded for a page, or None"""
+        with self._lock:
+            return self.pages.get(page_id, {}).get('step')
+
+    def entry(self, page_id):
+        """Everything recorded for a page so far (step, notion_page_id, chunk, chunks, ...)"""
+        with self._lock:
+            return dict(self.pages.get(page_id, {}))
+
+    def _artifact_path(self, page_id, step):
+        return os.path.join(self.artifact_dir, f"{page_id}.{step}.json")
+
+    def _save(self, page_id, step, data):
+        if not self.enabled:
+            return
+        path = self._artifact_path(page_id, step)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)  # The journal never points at a half-written artifact
+
+    def _remove(self, page_id, step):
+        try:
+            os.remove(self._artifact_path(page_id, step))
+        except OSError:
+            pass
+
+    def artifact(self, page_id, step):
+        """What extracted()/converted() saved for a page, or None"""
+        try:
+            with open(self._artifact_path(page_id, step), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def extracted(self, page_id, html=None, lines=None, text=None, timings=None):
+        self._save(page_id, 'extracted', {'html': html, 'lines': lines, 'text': text, 'timings': timings})
+        self.record(page_id, 'extracted')
+
+    def converted(self, page_id, blocks, block_hashes, timings=None):
+        self._save(page_id, 'converted', {'blocks': blocks, 'block_hashes': block_hashes, 'timings': timings})
+        self.record(page_id, 'converted')
+        self._remove(page_id, 'extracted')
+
+    def upload_progress(self, page_id):
+        """progress callback for AsyncNotionClient.create_page/resume_page"""
+        def progress(notion_page_id, chunk, chunks, seconds=None):
+            self.record(page_id, 'created' if chunk == 1 else 'appended',
+                        notion_page_id=notion_page_id, chunk=chunk, chunks=chunks)
+        return progress
+
+    def done(self, page_id):
+        self.record(page_id, 'done')
+        self._remove(page_id, 'extracted')
+        self._remove(page_id, 'converted')
+
+    def summary(self):
+        """{step: pages} over everything in the journal"""
+        with self._lock:
+            steps = [entry.get('step') for entry in self.pages.values()]
+        return {step: steps.count(step) for step in STEPS if step in steps}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
@@ -1,4 +1,3 @@
-import requests
 import json
 import unicodedata
 from bs4 import BeautifulSoup
@@ -15,11 +14,23 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service as ChromeService
 from webdriver_manager.chrome import ChromeDriverManager
 import re
-import hashlib
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 import threading
-from queue import Queue
+from queue import Queue, Empty
+from contextlib import contextmanager
+from datetime import datetime
+import random
+from migration_state import MigrationState, DEFAULT_STATE_PATH
+from api_clients import CODA_API_BASE, coda_client, notion_client
+from notion_async import NotionUploader, NotionApiError
+from notion_blocks import hash_tree, tree_root
+from staged_pipeline import Stage, StagedPipeline
+from conversion_pool import ConversionPool, available_cores
+from checkpoint_journal import CheckpointJournal, DEFAULT_JOURNAL_PATH
+from work_queue import WorkQueue, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+from concurrency_controller import ConcurrencyController, DEFAULT_INTERVAL, MIN_FREE_MEMORY
+import tracing
 
 # Load environment variables from .env if present
 load_dotenv()
@@ -41,20 +52,38 @@ if not NOTION_API_TOKEN:
     print('[ERROR] NOTION_API_TOKEN not set in environment or .env file.')
     sys.exit(1)
 
-# Headers
-coda_headers = {'Authorization': f'Bearer {CODA_API_TOKEN}'}
-notion_headers = {
-    'Authorization': f'Bearer {NOTION_API_TOKEN}',
-    'Notion-Version': '2022-06-28',
-    'Content-Type': 'application/json'
-}
+# Page readiness: wait for the canvas element, then for its DOM to stop changing
+CANVAS_SELECTOR = '[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]'
+PAGE_LOAD_TIMEOUT = 15  # Seconds to wait for the canvas element to appear
+CANVAS_QUIET_MS = 300  # Canvas counts as rendered after this long without mutations
+CANVAS_SETTLE_TIMEOUT = 10  # Upper bound (seconds) on waiting for the canvas to go quiet
+
+# Coda page export API ('export' engine): exports run server-side, we poll with backoff
+EXPORT_CONCURRENCY = 10  # Exports started and polled at the same time
+EXPORT_POLL_INITIAL = 1.0  # Seconds before the first status poll
+EXPORT_POLL_MAX = 10.0  # Cap on the (doubling, jittered) poll interval
+EXPORT_TIMEOUT = 180  # Give up on one export after this many seconds
+
+# Migration pipeline: browsers render, converters parse, uploaders talk to Notion
+EXTRACT_WORKERS = 5  # Chrome instances (pages rendered at once)
+CONVERT_WORKERS = 2  # HTML -> Notion block conversion threads
+UPLOAD_WORKERS = 4  # Pages handed to the Notion uploader at once; the rate limit still applies
+MAX_EXTRACT_WORKERS = 10  # Upper bound for --adaptive; each extract worker may run a Chrome instance
+MAX_UPLOAD_WORKERS = 8  # Upper bound for --adaptive
+
+# BeautifulSoup tree builders, fastest first; html.parser ships with Python
+HTML_PARSER_PREFERENCE = ('lxml', 'html.parser')
+
+# Shared keep-alive API sessions; main() sizes their pools to the worker count
+coda_api = coda_client(CODA_API_TOKEN)
+notion_api = notion_client(NOTION_API_TOKEN)
 
 def normalize(text):
     return unicodedata.normalize("NFKC", text.strip().lower())
 
 def fetch_all_pages_flat():
     print("[INFO] Fetching all Coda pages (flat list)...")
-    base_url = f'https://coda.io/apis/v1/docs/{CODA_DOC_ID}/pages'
+    base_url = f'/docs/{CODA_DOC_ID}/pages'
     all_pages = []
     next_token = None
 
@@ -65,7 +94,7 @@ def fetch_all_pages_flat():
 
         try:
             print(f"[DEBUG] Fetching pages with params: {params}")
-            resp = requests.get(base_url, headers=coda_headers, params=params)
+            resp = coda_api.get(base_url, params=params)
             
             if resp.status_code != 200:
                 print(f"[ERROR] Failed to fetch pages. Status: {resp.status_code}")
@@ -95,6 +124,18 @@ def fetch_all_pages_flat():
     print(f"[INFO] Total pages fetched: {len(all_pages)}")
     return all_pages
 
+# ChromeDriver binary path, resolved once per process by webdriver-manager
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+def get_chromedriver_path():
+    """Resolve the ChromeDriver binary once and reuse it for every driver"""
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager().install()
+        return _chromedriver_path
+
 def setup_driver(max_retries=5):
     """Setup Chrome driver with appropriate options and retry logic"""
     import tempfile
@@ -120,9 +161,7 @@ def setup_driver(max_retries=5):
             
             # Use webdriver-manager to automatically handle ChromeDriver version
             try:
-                from selenium.webdriver.chrome.service import Service
-                from webdriver_manager.chrome import ChromeDriverManager
-                service = Service(ChromeDriverManager().install())
+                service = Service(get_chromedriver_path())
                 driver = webdriver.Chrome(service=service, options=options)
             except ImportError:
                 # Fallback if webdriver-manager not available
@@ -154,22 +193,287 @@ def setup_driver(max_retries=5):
     
     raise Exception("Failed to setup driver after all retries")
 
+def teardown_driver(driver):
+    """Quit a Chrome driver and remove its temporary profile directory"""
+    import shutil
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"[WARNING] Error quitting driver: {e}")
+    # Clean up temporary profile directory if it exists
+    if hasattr(driver, '_temp_profile'):
+        shutil.rmtree(driver._temp_profile, ignore_errors=True)
+
+class DriverPool:
+    """Bounded, thread-safe pool of Chrome drivers shared by the page workers.
+
+    Workers check a driver out, use it for one page and check it back in.
+    Idle drivers are health-checked on check-out and reset on check-in, so a
+    browser is only started when the pool has no healthy idle driver and is
+    still below max_size. Drivers are recycled after max_uses pages to keep
+    Chrome's memory growth bounded.
+    """
+
+    def __init__(self, max_size=5, max_uses=200, checkout_timeout=300):
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.checkout_timeout = checkout_timeout
+        self._idle = Queue()
+        self._lock = threading.Lock()
+        self._live = 0  # Drivers currently alive (idle + checked out)
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.startups = 0
+        self.startup_seconds = 0.0
+        self.discarded = 0
+
+    def _start_driver(self):
+        start = time.time()
+        driver = setup_driver()
+        elapsed = time.time() - start
+        driver._pool_uses = 0
+        with self._lock:
+            self.startups += 1
+            self.startup_seconds += elapsed
+        print(f"[INFO] Started Chrome driver in {elapsed:.1f}s")
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._live -= 1
+            self.discarded += 1
+        teardown_driver(driver)
+
+    def _is_healthy(self, driver):
+        try:
+            return driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    def _reset(self, driver):
+        """Clear per-page browser state so the next page starts clean.
+
+        Runs while the last page is still loaded: WebDriver only deletes
+        the current document's cookies and scripts only reach its origin's
+        storage, and about:blank has neither. Chrome's DevTools commands
+        also clear cookies of every other origin the page touched.
+        """
+        try:
+            origin = driver.execute_script('return window.location.origin')
+            driver.delete_all_cookies()
+            driver.execute_script('try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}')
+            if hasattr(driver, 'execute_cdp_cmd'):
+                driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+                if origin and origin != 'null':
+                    driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            print(f"[WARNING] Failed to reset driver, discarding it: {str(e)[:100]}")
+            return False
+
+    def checkout(self):
+        """Borrow a driver, reusing a healthy idle one when available"""
+        deadline = time.time() + self.checkout_timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                can_start = self._idle.empty() and self._live < self.max_size
+                if can_start:
+                    self._live += 1
+                    self.misses += 1
+            if can_start:
+                try:
+                    return self._start_driver()
+                except Exception:
+                    with self._lock:
+                        self._live -= 1
+                    raise
+            # Reuse an idle driver, or wait for another worker to check one in
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"No Chrome driver available after {self.checkout_timeout}s")
+            try:
+                driver = self._idle.get(timeout=min(remaining, 1))
+            except Empty:
+                continue
+            if self._is_healthy(driver):
+                with self._lock:
+                    self.hits += 1
+                return driver
+            print("[WARNING] Pooled driver failed health check, replacing it")
+            self._discard(driver)
+
+    def checkin(self, driver):
+        """Return a driver to the pool, resetting or recycling it"""
+        driver._pool_uses = getattr(driver, '_pool_uses', 0) + 1
+        with self._lock:
+            surplus = self._live > self.max_size  # The pool was shrunk while this driver was out
+        if self._closed or surplus or driver._pool_uses >= self.max_uses or not self._reset(driver):
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def borrow(self):
+        """Context manager wrapper around checkout()/checkin()"""
+        with tracing.span('driver.acquire'):
+            driver = self.checkout()
+        try:
+            yield driver
+        finally:
+            self.checkin(driver)
+
+    def resize(self, max_size):
+        """Change max_size; idle drivers above it are quit now, checked-out ones on check-in"""
+        with self._lock:
+            self.max_size = max_size
+        while True:
+            with self._lock:
+                if self._live <= self.max_size:
+                    return
+            try:
+                driver = self._idle.get_nowait()
+            except Empty:
+                return
+            self._discard(driver)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'startups': self.startups,
+                'startup_seconds': round(self.startup_seconds, 2),
+                'avg_startup_seconds': round(self.startup_seconds / self.startups, 2) if self.startups else 0.0,
+                'discarded': self.discarded,
+                'live': self._live,
+            }
+
+    def close(self):
+        """Quit every idle driver; drivers checked in later are quit immediately"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(driver)
+
+def resolve_html_parser(name=None):
+    """Return the BeautifulSoup parser to use: name if it is installed, otherwise
+    the first available one from HTML_PARSER_PREFERENCE ('auto' or None)"""
+    from bs4.builder import builder_registry
+    if name and name != 'auto':
+        if builder_registry.lookup(name):
+            return name
+        print(f"[WARNING] HTML parser '{name}' is not installed - picking the fastest available one")
+    for candidate in HTML_PARSER_PREFERENCE:
+        if builder_registry.lookup(candidate):
+            return candidate
+    return 'html.parser'
+
+# The one place the parser is chosen: HTML_PARSER env var or --parser, default fastest installed
+HTML_PARSER = resolve_html_parser(os.getenv('HTML_PARSER'))
+
+def set_html_parser(name):
+    """Switch the parser used by every make_soup call"""
+    global HTML_PARSER
+    HTML_PARSER = resolve_html_parser(name)
+    return HTML_PARSER
+
+def make_soup(html, parser=None):
+    """Parse an HTML fragment with the configured parser"""
+    return BeautifulSoup(html, parser or HTML_PARSER)
+
+def fragment_root(soup):
+    """Element holding the parsed fragment's top-level nodes.
+
+    html.parser keeps a fragment as is; lxml wraps it in <html><body>, so
+    top-level iteration, appends and serialization go through the body.
+    """
+    for child in soup.contents:
+        if getattr(child, 'name', None) == 'html':
+            body = child.find('body', recursive=False)
+            return body if body is not None else child
+    return soup
+
+def soup_to_html(soup):
+    """Serialize a parsed fragment without any wrapper the parser added"""
+    return fragment_root(soup).decode_contents()
+
+def last_descendant(element):
+    """The element parsed last inside element (element itself if it has no children)"""
+    while getattr(element, 'contents', None):
+        element = element.contents[-1]
+    return element
+
+def remove_children(parent, doomed):
+    """Detach the children of parent whose id() is in doomed, in one pass over parent.contents.
+
+    extract() looks each element up in its parent, so removing n children
+    one by one costs O(n^2); this rebuilds the child list once and relinks
+    the sibling and parse-order (next_element) chains around the gaps
+    itself. The removed subtrees come out detached, ready for decompose().
+    """
+    children = parent.contents
+    if not children:
+        return
+    after = last_descendant(children[-1]).next_element  # First element parsed after parent
+    kept = []
+    for child in children:
+        if id(child) in doomed:
+            last_descendant(child).next_element = None
+            child.parent = child.previous_element = child.previous_sibling = child.next_sibling = None
+        else:
+            kept.append(child)
+    parent.contents = kept
+    previous = parent
+    for index, child in enumerate(kept):
+        child.previous_sibling = kept[index - 1] if index else None
+        child.next_sibling = kept[index + 1] if index + 1 < len(kept) else None
+        child.previous_element = previous
+        previous.next_element = child
+        previous = last_descendant(child)
+    previous.next_element = after
+    if after is not None:
+        after.previous_element = previous
+
 def postprocess_coda_lists(html_content):
     """Convert kr-line divs into properly nested <ul>/<ol> HTML lists using block-level-X for nesting, and robustly preserve anchor tags and all inline content. Do not change heading handling."""
-    from bs4 import BeautifulSoup, Tag, NavigableString
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = make_soup(html_content)
+    restructure_coda_lists(soup)
+    return soup_to_html(soup)
+
+def restructure_coda_lists(soup):
+    """In-place version of postprocess_coda_lists for an already parsed tree.
+
+    One forward sweep over the kr-line divs with a level stack; each line's
+    inline content is moved into its new <li>/<p> without searching the tree
+    again, and the emptied divs are removed in one pass per parent, so the
+    cost grows linearly with the number of lines.
+    """
+    from bs4 import Tag, NavigableString
+
+    def divs_with_class(predicate):
+        # Plain descendant sweep; same matches as find('div', class_=...) at a fraction of the cost
+        return (el for el in soup.descendants
+                if isinstance(el, Tag) and el.name == 'div' and any(predicate(c) for c in el.get('class') or ()))
 
     # Remove Coda header and page title if present
-    header = soup.find('div', class_='kr-canvas-header')
+    header = next(divs_with_class(lambda c: c == 'kr-canvas-header'), None)
     if header:
         header.decompose()
 
-    lines = soup.find_all('div', class_=lambda c: c and 'kr-line' in c)
+    lines = list(divs_with_class(lambda c: 'kr-line' in c))
     new_blocks = []
     stack = []  # Stack of (list_tag, level, list_obj, li_obj)
 
-    def extract_content_with_links(tag):
-        result = []
+    def collect_content_with_links(tag, result):
+        """Append the inline content of tag to result, keeping links and formatting tags whole"""
         for child in tag.children:
             if isinstance(child, NavigableString):
                 if child.strip():
@@ -181,7 +485,8 @@ def postprocess_coda_lists(html_content):
                     continue
                 # If it's a kr-object-e, look for <a>
                 if 'kr-object-e' in child.get('class', []):
-                    a = child.find('a', href=True)
+                    a = next((el for el in child.descendants
+                              if isinstance(el, Tag) and el.name == 'a' and el.has_attr('href')), None)
                     if a:
                         result.append(a)
                         continue
@@ -190,7 +495,7 @@ def postprocess_coda_lists(html_content):
                     result.append(child)
                     continue
                 # Otherwise, recurse to preserve nested formatting
-                result.extend(extract_content_with_links(child))
+                collect_content_with_links(child, result)
         return result
 
     for div in lines:
@@ -207,67 +512,58 @@ def postprocess_coda_lists(html_content):
         is_numbered = 'kr-olist' in classes and 'kr-listitem' in classes
         list_tag = 'ul' if is_bullet else ('ol' if is_numbered else None)
 
-        if is_bullet or is_numbered:
+        if list_tag:
             # Pop stack to the parent level
             while stack and (stack[-1][1] >= level):
                 stack.pop()
-            # If we need a new list at this level
-            if not stack or stack[-1][0] != list_tag or stack[-1][1] != level:
-                new_list = soup.new_tag(list_tag)
-                if stack:
-                    # Attach to parent li
-                    parent_li = stack[-1][3]
-                    if parent_li is not None:
-                        parent_li.append(new_list)
-                    else:
-                        new_blocks.append(new_list)
-                else:
-                    new_blocks.append(new_list)
-                stack.append((list_tag, level, new_list, None))
-            # Create list item
-            li = soup.new_tag('li')
-            for content in extract_content_with_links(div):
-                # Append content directly - BeautifulSoup will handle moving tags
-                # between soups. Extract first to ensure it's not lost when div
-                # is decomposed later.
-                if isinstance(content, Tag):
-                    # Extract the tag from its current location before appending
-                    # This ensures it won't be lost when we decompose the original div
-                    extracted = content.extract() if content.parent else content
-                    li.append(extracted)
-                else:
-                    # For NavigableString, append directly
-                    li.append(content)
-            # Attach li to current list
-            stack[-1][2].append(li)
-            # Update stack to point to this li for possible nested lists
-            stack[-1] = (stack[-1][0], stack[-1][1], stack[-1][2], li)
+            # Every item gets its own list; it nests under the closest open item with a lower level
+            new_list = soup.new_tag(list_tag)
+            if stack:
+                stack[-1][3].append(new_list)
+            else:
+                new_blocks.append(new_list)
+            block = soup.new_tag('li')
+            stack.append((list_tag, level, new_list, block))
         else:
             # Not a list item: close all open lists
             stack = []
-            p = soup.new_tag('p')
-            for content in extract_content_with_links(div):
-                p.append(content)
-            new_blocks.append(p)
+            block = soup.new_tag('p')
+        # Moving content out of the line only touches the line's own subtree
+        for content in collect_content_with_links(div, []):
+            block.append(content)
+        if list_tag:
+            new_list.append(block)
+        else:
+            new_blocks.append(block)
 
-    # Remove all original kr-line divs
+    # Remove the emptied kr-line divs, batched per parent so no removal has
+    # to search for or shift past the others
+    line_ids_by_parent = {}
+    for div in lines:
+        if div.parent is not None:
+            parent_entry = line_ids_by_parent.setdefault(id(div.parent), (div.parent, set()))
+            parent_entry[1].add(id(div))
+    for parent, line_ids in line_ids_by_parent.values():
+        remove_children(parent, line_ids)
     for div in lines:
         try:
             div.decompose()
         except Exception:
             pass
     # Remove empty <ul>, <ol>, <li>
-    for tag in soup.find_all(['ul', 'ol', 'li']):
+    list_tags = [el for el in soup.descendants if isinstance(el, Tag) and el.name in ('ul', 'ol', 'li')]
+    for tag in list_tags:
         if not tag.contents or all(isinstance(c, NavigableString) and not c.strip() for c in tag.contents):
             tag.decompose()
     # Append new blocks to soup
+    root = fragment_root(soup)
     for block in new_blocks:
-        soup.append(block)
-    return str(soup)
+        root.append(block)
+    return soup
 
 def convert_coda_bullets_to_lists(html):
     from bs4 import BeautifulSoup, Tag
-    soup = BeautifulSoup(html, "html.parser")
+    soup = make_soup(html)
     lines = soup.find_all("div", class_=lambda c: c and "kr-line" in c)
     new_blocks = []
     i = 0
@@ -316,149 +612,684 @@ def convert_coda_bullets_to_lists(html):
     for div in lines:
         div.decompose()
     # Append new blocks to soup
+    root = fragment_root(soup)
     for block in new_blocks:
-        soup.append(block)
-    return str(soup)
+        root.append(block)
+    return soup_to_html(soup)
 
-def extract_content(driver, url):
-    """Extract formatted content from a Coda page using robust selectors and JS."""
-    print(f"[DEBUG] extract_content called for URL: {url[:50]}...")
-    try:
-        driver.get(url)
-        print(f"[DEBUG] Page loaded, waiting for content...")
-        WebDriverWait(driver, 15).until(  # Reduced from 20 to 15 seconds
-            EC.presence_of_element_located((By.CSS_SELECTOR, '[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]'))
-        )
-        time.sleep(1)  # Reduced from 2 to 1 second
-        js = '''
-        // Function to recursively process elements and add formatting tags
-        function processNode(node) {
-            if (node.nodeType === Node.TEXT_NODE) {
-                if (!node.textContent || !node.textContent.trim()) {
-                    return null;
-                }
-                const parent = node.parentElement;
-                if (!parent) return node.cloneNode();
-                
-                const style = window.getComputedStyle(parent);
-                const fontWeight = style.fontWeight;
-                const fontStyle = style.fontStyle;
-                const textDecoration = style.textDecoration || '';
-                
-                const fontWeightNum = parseInt(fontWeight) || 400;
-                const isBold = fontWeightNum >= 600 || fontWeight === 'bold' || fontWeight === 'bolder';
-                const isItalic = fontStyle === 'italic';
-                const isUnderline = textDecoration.indexOf('underline') !== -1;
-                const isStrikethrough = textDecoration.indexOf('line-through') !== -1;
-                
-                if (isBold || isItalic || isUnderline || isStrikethrough) {
-                    let wrapper = document.createTextNode(node.textContent);
-                    
-                    if (isStrikethrough) {
-                        const s = document.createElement('s');
-                        s.appendChild(wrapper);
-                        wrapper = s;
-                    }
-                    if (isUnderline) {
-                        const u = document.createElement('u');
-                        u.appendChild(wrapper);
-                        wrapper = u;
-                    }
-                    if (isItalic) {
-                        const em = document.createElement('em');
-                        em.appendChild(wrapper);
-                        wrapper = em;
-                    }
-                    if (isBold) {
-                        const strong = document.createElement('strong');
-                        strong.appendChild(wrapper);
-                        wrapper = strong;
-                    }
-                    return wrapper;
-                }
-                return node.cloneNode();
-            } else if (node.nodeType === Node.ELEMENT_NODE) {
-                // Skip script and style elements
-                if (node.tagName === 'SCRIPT' || node.tagName === 'STYLE') {
-                    return null;
-                }
-                
-                const clone = node.cloneNode(false); // Shallow clone
-                
-                // Process all children
-                for (let i = 0; i < node.childNodes.length; i++) {
-                    const childResult = processNode(node.childNodes[i]);
-                    if (childResult) {
-                        clone.appendChild(childResult);
-                    }
-                }
-                return clone;
+# Script run with execute_async_script: resolves once the visible canvas has
+# gone quiet_ms without DOM mutations, or after max_ms at the latest.
+WAIT_FOR_CANVAS_QUIET_JS = '''
+const [selector, quietMs, maxMs] = arguments;
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+let root = null;
+for (const element of document.querySelectorAll(selector)) {
+    if (element.offsetWidth > 0 && element.offsetHeight > 0) {
+        root = element;
+        break;
+    }
+}
+root = root || document.body;
+let mutations = 0;
+let quietTimer = null;
+let capTimer = null;
+const observer = new MutationObserver((records) => {
+    mutations += records.length;
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(() => finish(true), quietMs);
+});
+function finish(settled) {
+    observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(capTimer);
+    done({settled: settled, mutations: mutations, waited_ms: performance.now() - start});
+}
+observer.observe(root, {childList: true, subtree: true, characterData: true});
+quietTimer = setTimeout(() => finish(true), quietMs);
+capTimer = setTimeout(() => finish(false), maxMs);
+'''
+
+def wait_for_canvas_ready(driver, load_timeout=PAGE_LOAD_TIMEOUT, quiet_ms=CANVAS_QUIET_MS,
+                          settle_timeout=CANVAS_SETTLE_TIMEOUT):
+    """Wait for the Coda canvas to appear and then for its DOM to stop changing.
+
+    Replaces the old fixed sleeps: returns as soon as the canvas has been quiet
+    for quiet_ms, or after settle_timeout seconds if Coda keeps re-rendering.
+    """
+    WebDriverWait(driver, load_timeout).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, CANVAS_SELECTOR))
+    )
+    driver.set_script_timeout(settle_timeout + 5)
+    result = driver.execute_async_script(
+        WAIT_FOR_CANVAS_QUIET_JS, CANVAS_SELECTOR, quiet_ms, int(settle_timeout * 1000))
+    if result and not result.get('settled'):
+        print(f"[WARNING] Canvas still changing after {settle_timeout}s "
+              f"({result.get('mutations')} mutations) - extracting anyway")
+    return result
+
+# Shared by the in-page scripts below: memoized formatting flags per element.
+STYLE_FLAGS_JS = '''
+// Formatting flags are resolved lazily and memoized: per element, per
+// styling context (ancestor tag/class chain + own tag/class) for
+// elements without inline styles, and bare elements (no class, no
+// style, no formatting tag) inherit their parent's flags. This keeps
+// getComputedStyle to one call per distinct styling context instead of
+// one call per text node.
+const FORMAT_TAGS = new Set(['B', 'STRONG', 'I', 'EM', 'U', 'S', 'STRIKE', 'DEL', 'INS',
+                             'CODE', 'A', 'H1', 'H2', 'H3', 'H4', 'H5', 'H6']);
+const contextFlags = new Map();
+const stats = {textNodes: 0, styleCalls: 0, elementHits: 0, contextHits: 0, inherited: 0};
+
+function computeFlags(element) {
+    stats.styleCalls++;
+    const style = window.getComputedStyle(element);
+    const fontWeight = style.fontWeight;
+    const fontStyle = style.fontStyle;
+    const textDecoration = style.textDecoration || '';
+    
+    const fontWeightNum = parseInt(fontWeight) || 400;
+    return {
+        bold: fontWeightNum >= 600 || fontWeight === 'bold' || fontWeight === 'bolder',
+        italic: fontStyle === 'italic',
+        underline: textDecoration.indexOf('underline') !== -1,
+        strikethrough: textDecoration.indexOf('line-through') !== -1
+    };
+}
+
+// ctx = {element, parent, key, flags}; key is null when the element
+// has an inline style and therefore cannot share cached flags
+function resolveFlags(ctx) {
+    if (ctx.flags) {
+        stats.elementHits++;
+        return ctx.flags;
+    }
+    const element = ctx.element;
+    const bare = !element.hasAttribute('class') && !element.hasAttribute('style') &&
+                 !FORMAT_TAGS.has(element.tagName);
+    if (bare && ctx.parent) {
+        stats.inherited++;
+        ctx.flags = resolveFlags(ctx.parent);
+    } else if (ctx.key !== null && contextFlags.has(ctx.key)) {
+        stats.contextHits++;
+        ctx.flags = contextFlags.get(ctx.key);
+    } else {
+        ctx.flags = computeFlags(element);
+        if (ctx.key !== null) {
+            contextFlags.set(ctx.key, ctx.flags);
+        }
+    }
+    return ctx.flags;
+}
+
+function makeContext(element, parentCtx) {
+    const parentKey = parentCtx ? parentCtx.key : '';
+    return {
+        element: element,
+        parent: parentCtx,
+        key: (parentKey === null || element.hasAttribute('style')) ? null :
+             parentKey + '>' + element.tagName + '.' + (element.getAttribute('class') || ''),
+        flags: null
+    };
+}
+'''
+
+# In-page walker used by the 'js' extraction engine: clones the visible canvas,
+# wrapping formatted text in <strong>/<em>/<u>/<s> based on computed styles.
+EXTRACT_CANVAS_HTML_JS = STYLE_FLAGS_JS + '''
+// Function to recursively process elements and add formatting tags
+function processNode(node, parentCtx) {
+    if (node.nodeType === Node.TEXT_NODE) {
+        if (!node.textContent || !node.textContent.trim()) {
+            return null;
+        }
+        if (!parentCtx) return node.cloneNode();
+        stats.textNodes++;
+        const flags = resolveFlags(parentCtx);
+        
+        if (flags.bold || flags.italic || flags.underline || flags.strikethrough) {
+            let wrapper = document.createTextNode(node.textContent);
+            
+            if (flags.strikethrough) {
+                const s = document.createElement('s');
+                s.appendChild(wrapper);
+                wrapper = s;
+            }
+            if (flags.underline) {
+                const u = document.createElement('u');
+                u.appendChild(wrapper);
+                wrapper = u;
+            }
+            if (flags.italic) {
+                const em = document.createElement('em');
+                em.appendChild(wrapper);
+                wrapper = em;
+            }
+            if (flags.bold) {
+                const strong = document.createElement('strong');
+                strong.appendChild(wrapper);
+                wrapper = strong;
             }
-            return node.cloneNode();
+            return wrapper;
+        }
+        return node.cloneNode();
+    } else if (node.nodeType === Node.ELEMENT_NODE) {
+        // Skip script and style elements
+        if (node.tagName === 'SCRIPT' || node.tagName === 'STYLE') {
+            return null;
         }
         
+        const clone = node.cloneNode(false); // Shallow clone
+        if (!node.hasChildNodes()) {
+            return clone;
+        }
+        const ctx = makeContext(node, parentCtx);
+        
+        // Process all children
+        for (let i = 0; i < node.childNodes.length; i++) {
+            const childResult = processNode(node.childNodes[i], ctx);
+            if (childResult) {
+                clone.appendChild(childResult);
+            }
+        }
+        return clone;
+    }
+    return node.cloneNode();
+}
+
+let contentElements = document.querySelectorAll('[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]');
+for (let element of contentElements) {
+    if (element.offsetWidth > 0 && element.offsetHeight > 0) {
+        const processed = processNode(element, null);
+        return processed ? {html: processed.innerHTML, stats: stats} : null;
+    }
+}
+return null;
+'''
+
+def extract_canvas_html_js(driver):
+    """Return the formatting-annotated canvas HTML using the in-page JS walker"""
+    result = driver.execute_script(EXTRACT_CANVAS_HTML_JS)
+    html_content = result.get('html') if result else None
+    if result and result.get('stats'):
+        style_stats = result['stats']
+        print(f"[DEBUG] Style cache: {style_stats.get('styleCalls')} getComputedStyle calls for "
+              f"{style_stats.get('textNodes')} text nodes ({style_stats.get('elementHits')} element hits, "
+              f"{style_stats.get('contextHits')} class-context hits, {style_stats.get('inherited')} inherited)")
+    if not html_content:
+        print("[ERROR] JavaScript returned no HTML content - falling back to innerHTML")
+        # Fallback: get innerHTML directly
+        html_content = driver.execute_script('''
         let contentElements = document.querySelectorAll('[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]');
         for (let element of contentElements) {
             if (element.offsetWidth > 0 && element.offsetHeight > 0) {
-                const processed = processNode(element);
-                return processed ? processed.innerHTML : null;
+                return element.innerHTML;
             }
         }
         return null;
-        '''
-        html_content = driver.execute_script(js)
-        if not html_content:
-            print("[ERROR] JavaScript returned no HTML content - falling back to innerHTML")
-            # Fallback: get innerHTML directly
-            html_content = driver.execute_script('''
-            let contentElements = document.querySelectorAll('[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]');
-            for (let element of contentElements) {
-                if (element.offsetWidth > 0 && element.offsetHeight > 0) {
-                    return element.innerHTML;
-                }
+        ''')
+    return html_content
+
+# Computed styles requested from DOMSnapshot by the 'cdp' extraction engine
+SNAPSHOT_COMPUTED_STYLES = ['font-weight', 'font-style', 'text-decoration-line']
+CANVAS_UI_IDS = ('canvas', 'canvas-content', 'page-content')
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+                 'meta', 'param', 'source', 'track', 'wbr'}
+
+def snapshot_to_canvas_html(snapshot):
+    """Rebuild the formatting-annotated canvas HTML from a DOMSnapshot.captureSnapshot result.
+
+    Mirrors EXTRACT_CANVAS_HTML_JS: the first visible canvas element is
+    serialized, whitespace-only text is dropped, script/style elements are
+    skipped and formatted text is wrapped in <strong>/<em>/<u>/<s> using the
+    computed style of its parent element.
+    """
+    from html import escape
+    strings = snapshot['strings']
+    document = snapshot['documents'][0]
+    nodes = document['nodes']
+    parents = nodes['parentIndex']
+    node_types = nodes['nodeType']
+    node_names = nodes['nodeName']
+    node_values = nodes['nodeValue']
+    node_attributes = nodes['attributes']
+    layout = document['layout']
+    styles_by_node = dict(zip(layout['nodeIndex'], layout['styles']))
+    bounds_by_node = dict(zip(layout['nodeIndex'], layout['bounds']))
+
+    def string_at(index):
+        return strings[index] if index >= 0 else ''
+
+    children = [[] for _ in parents]
+    for index, parent in enumerate(parents):
+        if parent >= 0:
+            children[parent].append(index)
+
+    def attributes_of(index):
+        pairs = node_attributes[index]
+        return [(string_at(pairs[i]), string_at(pairs[i + 1])) for i in range(0, len(pairs), 2)]
+
+    # Find the first visible canvas element in document order
+    root = None
+    for index, node_type in enumerate(node_types):
+        if node_type != 1:
+            continue
+        if dict(attributes_of(index)).get('data-coda-ui-id') not in CANVAS_UI_IDS:
+            continue
+        bounds = bounds_by_node.get(index)
+        if bounds and bounds[2] > 0 and bounds[3] > 0:
+            root = index
+            break
+    if root is None:
+        return None
+
+    flags_cache = {}
+
+    def flags_for(element):
+        """Formatting flags of an element, from the nearest ancestor that has layout"""
+        if element in flags_cache:
+            return flags_cache[element]
+        node = element
+        while node >= 0 and node not in styles_by_node:
+            node = parents[node]
+        if node < 0:
+            flags = (False, False, False, False)
+        else:
+            font_weight, font_style, decoration = (string_at(i) for i in styles_by_node[node])
+            try:
+                weight = int(font_weight)
+            except ValueError:
+                weight = 400
+            flags = (
+                weight >= 600 or font_weight in ('bold', 'bolder'),
+                font_style == 'italic',
+                'underline' in decoration,
+                'line-through' in decoration,
+            )
+        flags_cache[element] = flags
+        return flags
+
+    out = []
+
+    def serialize(index):
+        node_type = node_types[index]
+        if node_type == 3:
+            text = string_at(node_values[index])
+            if not text.strip():
+                return
+            bold, italic, underline, strikethrough = flags_for(parents[index])
+            opening = ''.join(tag for tag, on in (('<strong>', bold), ('<em>', italic),
+                                                  ('<u>', underline), ('<s>', strikethrough)) if on)
+            closing = ''.join(tag for tag, on in (('</s>', strikethrough), ('</u>', underline),
+                                                  ('</em>', italic), ('</strong>', bold)) if on)
+            out.append(opening + escape(text, quote=False) + closing)
+        elif node_type == 1:
+            name = string_at(node_names[index]).lower()
+            if name in ('script', 'style') or name.startswith('::'):
+                return
+            attrs = ''.join(f' {key}="{escape(value)}"' for key, value in attributes_of(index))
+            out.append(f'<{name}{attrs}>')
+            if name in VOID_ELEMENTS:
+                return
+            for child in children[index]:
+                serialize(child)
+            out.append(f'</{name}>')
+
+    for child in children[root]:
+        serialize(child)
+    return ''.join(out)
+
+def extract_canvas_html_cdp(driver):
+    """Return the formatting-annotated canvas HTML from a single CDP DOMSnapshot call"""
+    snapshot = driver.execute_cdp_cmd('DOMSnapshot.captureSnapshot', {
+        'computedStyles': SNAPSHOT_COMPUTED_STYLES,
+    })
+    return snapshot_to_canvas_html(snapshot)
+
+# In-page walker used by the 'blocks' extraction mode: instead of annotated
+# HTML it returns one compact entry per kr-line, {l: level, t: 'ul'|'ol'|'',
+# r: runs}, where each run is [text, flags, href] and flags is a bitmask
+# (1 bold, 2 italic, 4 underline, 8 strikethrough, 16 code). Text outside
+# kr-lines is kept as plain paragraph lines.
+EXTRACT_CANVAS_LINES_JS = STYLE_FLAGS_JS + '''
+const lines = [];
+let looseLine = null;
+
+function flagBits(flags, inCode) {
+    return (flags.bold ? 1 : 0) | (flags.italic ? 2 : 0) | (flags.underline ? 4 : 0) |
+           (flags.strikethrough ? 8 : 0) | (inCode ? 16 : 0);
+}
+
+function newLine(classes) {
+    let level = 0;
+    for (const c of classes) {
+        if (c.startsWith('block-level-')) {
+            level = parseInt(c.slice('block-level-'.length)) || 0;
+        }
+    }
+    const item = classes.includes('kr-listitem');
+    const list = item && classes.includes('kr-ulist') ? 'ul' : (item && classes.includes('kr-olist') ? 'ol' : '');
+    return {l: level, t: list, r: []};
+}
+
+function walk(node, ctx, line, inCode) {
+    if (node.nodeType === Node.TEXT_NODE) {
+        if (!node.textContent || !node.textContent.trim() || !ctx) {
+            return;
+        }
+        stats.textNodes++;
+        if (!line) {
+            if (!looseLine) {
+                looseLine = {l: 0, t: '', r: []};
+                lines.push(looseLine);
             }
-            return null;
-            ''')
-            if not html_content:
-                return None, None
-        
-        # Debug: Check raw HTML from JavaScript for bold tags
-        if html_content:
-            test_soup = BeautifulSoup(html_content, 'html.parser')
-            test_bold = len(test_soup.find_all(['strong', 'b']))
-            print(f"[DEBUG] Raw HTML from JS: {len(html_content)} chars, {test_bold} bold tags")
-            if test_bold == 0:
-                print("[DEBUG] No bold tags found in raw HTML - JavaScript formatting detection may have failed")
-        
-        soup = BeautifulSoup(html_content, 'html.parser')
-        for script in soup(["script", "style"]):
-            script.decompose()
-        clean_html = str(soup)
-        
-        # Check before postprocess
-        debug_soup = BeautifulSoup(clean_html, 'html.parser')
-        bold_before = len(debug_soup.find_all(['strong', 'b']))
-        print(f"[DEBUG] Before postprocess: {bold_before} bold tags")
-        
-        clean_html = postprocess_coda_lists(clean_html)
-        
-        # Check after postprocess
-        debug_soup2 = BeautifulSoup(clean_html, 'html.parser')
-        bold_after = len(debug_soup2.find_all(['strong', 'b']))
-        print(f"[DEBUG] After postprocess: {bold_after} bold tags")
-        
-        if bold_before > 0 and bold_after == 0:
-            print(f"[ERROR] postprocess_coda_lists stripped all {bold_before} bold tags!")
-        elif bold_after < bold_before:
-            print(f"[WARNING] Lost {bold_before - bold_after} bold tags in postprocess")
-        clean_text = soup.get_text(separator='\n', strip=True)
-        return clean_html, clean_text
+            line = looseLine;
+        }
+        line.r.push([node.textContent, flagBits(resolveFlags(ctx), inCode), null]);
+        return;
+    }
+    if (node.nodeType !== Node.ELEMENT_NODE || node.tagName === 'SCRIPT' || node.tagName === 'STYLE') {
+        return;
+    }
+    const classes = (node.getAttribute('class') || '').split(/\\s+/);
+    if (classes.includes('kr-canvas-header')) {
+        return;
+    }
+    const nodeCtx = makeContext(node, ctx);
+    if (classes.includes('kr-line')) {
+        line = newLine(classes);
+        lines.push(line);
+        looseLine = null;
+    }
+    if (line) {
+        // Links (and kr-object-e chips wrapping one) become a single run
+        let link = null;
+        if (node.tagName === 'A' && node.hasAttribute('href')) {
+            link = node;
+        } else if (classes.includes('kr-object-e')) {
+            link = node.querySelector('a[href]');
+        }
+        if (link) {
+            const linkCtx = link === node ? nodeCtx : {element: link, parent: nodeCtx, key: null, flags: null};
+            if (link.textContent) {
+                line.r.push([link.textContent, flagBits(resolveFlags(linkCtx), inCode), link.getAttribute('href')]);
+            }
+            return;
+        }
+    }
+    inCode = inCode || node.tagName === 'CODE';
+    for (let i = 0; i < node.childNodes.length; i++) {
+        walk(node.childNodes[i], nodeCtx, line, inCode);
+    }
+}
+
+let contentElements = document.querySelectorAll('[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]');
+for (let element of contentElements) {
+    if (element.offsetWidth > 0 && element.offsetHeight > 0) {
+        for (let i = 0; i < element.childNodes.length; i++) {
+            walk(element.childNodes[i], makeContext(element, null), null, false);
+        }
+        return {lines: lines, stats: stats};
+    }
+}
+return null;
+'''
+
+def load_page(driver, url, load_timeout=PAGE_LOAD_TIMEOUT, quiet_ms=CANVAS_QUIET_MS,
+              settle_timeout=CANVAS_SETTLE_TIMEOUT, timings=None):
+    """Navigate to a Coda page and wait until its canvas has rendered"""
+    if timings is None:
+        timings = {}
+    with tracing.span('navigate') as timed:
+        driver.get(url)
+    timings['navigate'] = timed.seconds
+    with tracing.span('ready_wait') as timed:
+        wait_for_canvas_ready(driver, load_timeout, quiet_ms, settle_timeout)
+    timings['ready_wait'] = timed.seconds
+
+def extract_lines(driver, url, load_timeout=PAGE_LOAD_TIMEOUT, quiet_ms=CANVAS_QUIET_MS,
+                  settle_timeout=CANVAS_SETTLE_TIMEOUT, timings=None):
+    """Extract a Coda page as compact kr-line entries (see EXTRACT_CANVAS_LINES_JS).
+
+    Returns (lines, clean_text), or (None, None) on failure. Skips the
+    annotated-HTML round trip entirely: lines_to_notion_blocks maps the
+    result straight to Notion blocks.
+    """
+    print(f"[DEBUG] extract_lines called for URL: {url[:50]}...")
+    if timings is None:
+        timings = {}
+    try:
+        load_page(driver, url, load_timeout, quiet_ms, settle_timeout, timings)
+        with tracing.span('extract', engine='lines') as timed:
+            result = driver.execute_script(EXTRACT_CANVAS_LINES_JS)
+        timings['extract'] = timed.seconds
+        if not result or not result.get('lines'):
+            print("[ERROR] JavaScript returned no canvas lines")
+            return None, None
+        style_stats = result.get('stats', {})
+        print(f"[DEBUG] Extracted {len(result['lines'])} lines; {style_stats.get('styleCalls')} getComputedStyle "
+              f"calls for {style_stats.get('textNodes')} text nodes")
+        lines = result['lines']
+        clean_text = '\n'.join(''.join(run[0] for run in line['r']) for line in lines if line['r'])
+        return lines, clean_text
     except Exception as e:
-        print(f"[ERROR] Exception in extract_content: {type(e).__name__}: {e}")
+        print(f"[ERROR] Exception in extract_lines: {type(e).__name__}: {e}")
         import traceback
         traceback.print_exc()
         return None, None
 
+def extract_content(driver, url, load_timeout=PAGE_LOAD_TIMEOUT, quiet_ms=CANVAS_QUIET_MS,
+                    settle_timeout=CANVAS_SETTLE_TIMEOUT, timings=None, engine='js', raw_path=None,
+                    verbose=False):
+    """Extract formatted content from a Coda page; returns (clean_html, clean_text).
+
+    Thin wrapper around extract_pipeline for callers that want strings.
+    """
+    pipeline = extract_pipeline(driver, url, load_timeout, quiet_ms, settle_timeout,
+                                timings, engine, raw_path, verbose)
+    if not pipeline:
+        return None, None
+    return pipeline.html, pipeline.text
+
+def extract_canvas_html(driver, url, load_timeout=PAGE_LOAD_TIMEOUT, quiet_ms=CANVAS_QUIET_MS,
+                        settle_timeout=CANVAS_SETTLE_TIMEOUT, timings=None, engine='js', raw_path=None):
+    """Extract formatted content from a Coda page using robust selectors and JS.
+
+    This is the only place a page is navigated to. engine selects how the
+    formatted canvas HTML is produced: 'js' runs the in-page style walker,
+    'cdp' rebuilds it in Python from one DOMSnapshot call. Returns the raw
+    canvas HTML, or None on failure; only the browser is used, so the
+    driver can go back to the pool before any parsing. If a timings dict
+    is passed it is filled with the per-stage durations (seconds) for this
+    page; raw_path saves the HTML for offline benchmarks.
+    """
+    print(f"[DEBUG] extract_content called for URL: {url[:50]}...")
+    if timings is None:
+        timings = {}
+    try:
+        load_page(driver, url, load_timeout, quiet_ms, settle_timeout, timings)
+        with tracing.span('extract', engine=engine) as timed:
+            if engine == 'cdp':
+                html_content = extract_canvas_html_cdp(driver)
+            else:
+                html_content = extract_canvas_html_js(driver)
+        timings['extract'] = timed.seconds
+        if not html_content:
+            return None
+        if raw_path:
+            with open(raw_path, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            print(f"[INFO] Saved raw canvas HTML to {raw_path}")
+        return html_content
+    except Exception as e:
+        print(f"[ERROR] Exception in extract_content: {type(e).__name__}: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def extract_pipeline(driver, url, load_timeout=PAGE_LOAD_TIMEOUT, quiet_ms=CANVAS_QUIET_MS,
+                     settle_timeout=CANVAS_SETTLE_TIMEOUT, timings=None, engine='js', raw_path=None,
+                     verbose=False):
+    """extract_canvas_html, then an HtmlPipeline that has been cleaned up and had its lists restructured"""
+    if timings is None:
+        timings = {}
+    html_content = extract_canvas_html(driver, url, load_timeout, quiet_ms, settle_timeout, timings, engine,
+                                       raw_path)
+    if not html_content:
+        return None
+    stage_start = time.time()
+    pipeline = HtmlPipeline(html_content, verbose=verbose).cleanup().restructure_lists()
+    timings['postprocess'] = time.time() - stage_start
+    return pipeline
+
+def start_page_export(page_id, output_format='html'):
+    """Ask Coda to export a page; returns the export request id"""
+    r = coda_api.post(f'/docs/{CODA_DOC_ID}/pages/{page_id}/export', json={'outputFormat': output_format})
+    r.raise_for_status()
+    return r.json()['id']
+
+def get_page_export_status(page_id, request_id):
+    """Status of an export request: {'status': 'inProgress'|'complete'|'failed', 'downloadLink', 'error'}"""
+    r = coda_api.get(f'/docs/{CODA_DOC_ID}/pages/{page_id}/export/{request_id}')
+    r.raise_for_status()
+    return r.json()
+
+def export_page_html(page_id, poll_initial=EXPORT_POLL_INITIAL, poll_max=EXPORT_POLL_MAX, timeout=EXPORT_TIMEOUT):
+    """Export one page as HTML through the Coda API; returns the HTML, or None on failure/timeout"""
+    request_id = start_page_export(page_id)
+    deadline = time.time() + timeout
+    delay = poll_initial
+    while time.time() < deadline:
+        time.sleep(min(delay, max(0, deadline - time.time())))
+        status = get_page_export_status(page_id, request_id)
+        if status.get('status') == 'complete':
+            # The download link is pre-signed; it must not get the API token
+            r = coda_api.download(status['downloadLink'], timeout=60)
+            r.raise_for_status()
+            return r.content.decode('utf-8', errors='replace')
+        if status.get('status') == 'failed':
+            print(f"[WARNING] Coda export failed for page {page_id}: {status.get('error')}")
+            return None
+        delay = min(delay * 2, poll_max) * random.uniform(0.8, 1.2)
+    print(f"[WARNING] Coda export for page {page_id} did not finish within {timeout}s")
+    return None
+
+INLINE_FORMATTING_STYLE = re.compile(r'style="[^"]*(font-weight|font-style|text-decoration)', re.IGNORECASE)
+# Elements html_to_notion_blocks has no block for; their content would be dropped
+EXPORT_UNSUPPORTED_TAGS = ('table', 'img')
+
+def strip_export_title(soup, page_name):
+    """Remove the <h1> a Coda export starts with when it repeats the page name.
+
+    The name becomes the Notion page title, so the heading would show it
+    twice; the browser engines drop the kr-canvas-header the same way.
+    Returns True if a heading was removed.
+    """
+    from bs4 import NavigableString
+    root = fragment_root(soup)
+    first = next((el for el in root.children if not (isinstance(el, NavigableString) and not el.strip())), None)
+    if getattr(first, 'name', None) == 'h1' and normalize(first.get_text(' ', strip=True)) == normalize(page_name):
+        first.decompose()
+        return True
+    return False
+
+EXPORT_BLOCK_TAGS = frozenset(('p', 'div', 'h1', 'h2', 'h3', 'ul', 'ol', 'li', 'br', 'body'))
+
+def collapse_export_whitespace(soup):
+    """Drop the line breaks and indentation the export puts between tags.
+
+    The canvas HTML has none, but an exported "<li>Scope\n<ul>" would give
+    the list item the text 'Scope\n'. As a browser would, whitespace runs
+    become one space and are trimmed where a block starts or ends.
+    """
+    from bs4 import NavigableString, Tag
+    def at_boundary(sibling):
+        return sibling is None or (isinstance(sibling, Tag) and sibling.name in EXPORT_BLOCK_TAGS)
+    for string in list(soup.find_all(string=True)):
+        if type(string) is not NavigableString or string.find_parent(['pre', 'code']) is not None:
+            continue
+        text = re.sub(r'\s+', ' ', str(string))
+        block_parent = string.parent is None or string.parent.name in EXPORT_BLOCK_TAGS
+        if block_parent and at_boundary(string.previous_sibling):
+            text = text.lstrip()
+        if block_parent and at_boundary(string.next_sibling):
+            text = text.rstrip()
+        if not text:
+            string.extract()
+        elif text != string:
+            string.replace_with(text)
+
+def prepare_export_html(html, page_name):
+    """Check an exported page and cut it down to the content the canvas extraction would return.
+
+    Returns (html, None) with the body of the export minus its title
+    heading, or (None, reason) if the page must be re-extracted in Chrome:
+    html_to_notion_blocks only understands semantic tags, so exports that
+    carry formatting in inline styles, contain tables or images, or carry
+    no text at all would lose content.
+    """
+    if not html:
+        return None, 'empty export'
+    soup = make_soup(html)
+    for tag in soup(['head', 'script', 'style']):
+        tag.decompose()
+    if not soup.get_text(strip=True):
+        return None, 'empty export'
+    if INLINE_FORMATTING_STYLE.search(html):
+        return None, 'formatting in inline styles'
+    unsupported = soup.find(EXPORT_UNSUPPORTED_TAGS)
+    if unsupported is not None:
+        return None, f"contains <{unsupported.name}>"
+    strip_export_title(soup, page_name)
+    collapse_export_whitespace(soup)
+    return soup_to_html(soup), None
+
+def export_pages(pages, concurrency=EXPORT_CONCURRENCY, timeout=EXPORT_TIMEOUT):
+    """Export many pages concurrently without a browser.
+
+    Returns ({page_id: html}, {page_id: seconds}) for the usable exports,
+    as prepare_export_html() leaves them; pages that failed, timed out or
+    would lose formatting are left out so the caller can fall back to
+    Chrome extraction for them.
+    """
+    exports = {}
+    durations = {}
+
+    def export_one(page):
+        start = time.time()
+        try:
+            html = export_page_html(page['id'], timeout=timeout)
+        except Exception as e:
+            print(f"[WARNING] Coda export error for {page.get('name')}: {type(e).__name__}: {e}")
+            return page, None, time.time() - start
+        return page, html, time.time() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pages)))) as executor:
+        for page, html, seconds in executor.map(export_one, pages):
+            html, reason = prepare_export_html(html, page.get('name', '')) if html is not None else (None, 'export failed')
+            if reason:
+                print(f"[INFO] {page.get('name')}: {reason} - will extract in Chrome")
+                continue
+            exports[page['id']] = html
+            durations[page['id']] = seconds
+    print(f"[INFO] Coda export: {len(exports)}/{len(pages)} page(s) exported, "
+          f"{len(pages) - len(exports)} left for Chrome")
+    return exports, durations
+
+def export_page_for_worker(page, timeout=EXPORT_TIMEOUT):
+    """Export one page like export_pages(); returns (html, seconds), or (None, seconds) to fall back to Chrome"""
+    start = time.time()
+    try:
+        html = export_page_html(page['id'], timeout=timeout)
+    except Exception as e:
+        print(f"[WARNING] Coda export error for {page.get('name')}: {type(e).__name__}: {e}")
+        html = None
+    html, reason = prepare_export_html(html, page.get('name', '')) if html is not None else (None, 'export failed')
+    if reason:
+        print(f"[INFO] {page.get('name')}: {reason} - will extract in Chrome")
+        return None, time.time() - start
+    return html, time.time() - start
+
 def safe_filename(name):
     # Only allow alphanumeric, space, dash, and underscore
     return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
@@ -479,9 +1310,13 @@ def save_content(html_content, text_content, page_name):
             f.write(text_content)
         print(f"[INFO] Saved text content to {text_path}")
 
-def html_to_notion_blocks(html):
-    from bs4 import BeautifulSoup, NavigableString, Tag
-    soup = BeautifulSoup(html, 'html.parser')
+def html_to_notion_blocks(html, verbose=False):
+    return soup_to_notion_blocks(make_soup(html), verbose=verbose)
+
+def soup_to_notion_blocks(soup, verbose=False):
+    """Convert a parsed page to Notion blocks. List item contents are moved
+    out of the tree while converting, so this must be the last use of soup."""
+    from bs4 import NavigableString, Tag
 
     # Remove empty <ul> and <li> elements
     for ul in soup.find_all('ul'):
@@ -494,15 +1329,16 @@ def html_to_notion_blocks(html):
     blocks = []
 
     # Always process all top-level elements, including <ul> and <ol>
-    elements = [el for el in soup.contents if not (isinstance(el, NavigableString) and not el.strip())]
+    elements = [el for el in fragment_root(soup).contents if not (isinstance(el, NavigableString) and not el.strip())]
 
-    # DEBUG: Print first 5 top-level elements for any HTML processed
-    print("\n[DEBUG] Top-level elements in html_to_notion_blocks:")
-    for i, el in enumerate(elements[:5]):
-        if isinstance(el, Tag):
-            print(f"  [{i}] <{el.name}>: {str(el)[:80]}...")
-        elif isinstance(el, NavigableString):
-            print(f"  [{i}] NavigableString: {repr(str(el)[:80])}")
+    # DEBUG: Print first 5 top-level elements
+    if verbose:
+        print("\n[DEBUG] Top-level elements in html_to_notion_blocks:")
+        for i, el in enumerate(elements[:5]):
+            if isinstance(el, Tag):
+                print(f"  [{i}] <{el.name}>: {str(el)[:80]}...")
+            elif isinstance(el, NavigableString):
+                print(f"  [{i}] NavigableString: {repr(str(el)[:80])}")
 
     def parse_rich_text(el, parent_annotations=None):
         if parent_annotations is None:
@@ -681,135 +1517,287 @@ def html_to_notion_blocks(html):
                 "paragraph": {"rich_text": []}
             })
 
+    trim_leading_empty_paragraphs(blocks)
+
+    return blocks
+
+def trim_leading_empty_paragraphs(blocks):
+    """Drop empty or whitespace-only paragraphs from the start of a block list (in place)"""
     while blocks and blocks[0]["type"] == "paragraph" and (not blocks[0]["paragraph"]["rich_text"] or all(rt["type"] == "text" and not rt["text"]["content"].strip() for rt in blocks[0]["paragraph"]["rich_text"])):
         blocks.pop(0)
 
+# Bits of the run flags emitted by EXTRACT_CANVAS_LINES_JS
+RUN_FLAG_ANNOTATIONS = (('bold', 1), ('italic', 2), ('underline', 4), ('strikethrough', 8), ('code', 16))
+
+def runs_to_rich_text(runs):
+    """Convert [text, flags, href] runs to Notion rich_text objects"""
+    rich_text = []
+    previous = None
+    for text, flags, href in runs:
+        # Merge adjacent plain runs with the same formatting
+        if previous and not href and previous[1:] == (flags, href):
+            rich_text[-1]["text"]["content"] += text
+            continue
+        previous = (text, flags, href)
+        content = {"content": text}
+        if href:
+            content["link"] = {"url": href}
+        annotations = {name: bool(flags & bit) for name, bit in RUN_FLAG_ANNOTATIONS}
+        annotations["color"] = "default"
+        rich_text.append({"type": "text", "text": content, "annotations": annotations})
+    return rich_text
+
+def call_date_rich_text(call_date, trailing_space=True):
+    """Bold 'Call <date>' banner run placed at the top of dated pages"""
+    return {
+        "type": "text",
+        "text": {"content": f"Call {call_date} " if trailing_space else f"Call {call_date}"},
+        "annotations": {"bold": True, "italic": False, "underline": False, "strikethrough": False, "code": False, "color": "default"}
+    }
+
+def lines_to_notion_blocks(lines, call_date=None):
+    """Build Notion blocks directly from the compact lines of extract_lines.
+
+    List items nest under the closest preceding item with a lower
+    block-level, the same rule postprocess_coda_lists applies to the HTML
+    path; a paragraph line ends any open list. If call_date is given the
+    'Call <date>' banner is prepended to the first paragraph.
+    """
+    blocks = []
+    open_items = []  # (level, block) for each list item that can still take children
+    for line in lines:
+        rich_text = runs_to_rich_text(line['r'])
+        list_type = line.get('t')
+        if not list_type:
+            open_items = []
+            blocks.append({
+                "object": "block",
+                "type": "paragraph",
+                "paragraph": {"rich_text": rich_text}
+            })
+            continue
+        level = line.get('l', 0)
+        block_type = 'bulleted_list_item' if list_type == 'ul' else 'numbered_list_item'
+        block = {
+            "object": "block",
+            "type": block_type,
+            block_type: {"rich_text": rich_text}
+        }
+        while open_items and open_items[-1][0] >= level:
+            open_items.pop()
+        if open_items:
+            parent = open_items[-1][1]
+            parent[parent["type"]].setdefault("children", []).append(block)
+        else:
+            blocks.append(block)
+        open_items.append((level, block))
+
+    blocks = prune_empty_list_items(blocks)
+    if call_date:
+        for block in blocks:
+            if block["type"] == "paragraph":
+                block["paragraph"]["rich_text"].insert(0, call_date_rich_text(call_date))
+                break
+        else:
+            blocks.insert(0, {
+                "object": "block",
+                "type": "paragraph",
+                "paragraph": {"rich_text": [call_date_rich_text(call_date, trailing_space=False)]}
+            })
+    trim_leading_empty_paragraphs(blocks)
     return blocks
 
-def calculate_content_hash(html):
-    """Calculate MD5 hash of content for change detection, including formatting"""
-    # Normalize HTML by removing whitespace differences
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html, 'html.parser')
-    # Get text content
-    text_content = soup.get_text(separator='\n', strip=True)
-    # Include formatting tags (strong, em, u, s, code, a) in structure
-    # This ensures formatting changes are detected
-    formatting_info = []
-    for tag in soup.find_all(['strong', 'b', 'em', 'i', 'u', 's', 'strike', 'code', 'a']):
-        tag_info = f"{tag.name}:{tag.get_text(strip=True)}"
-        if tag.name == 'a' and tag.get('href'):
-            tag_info += f":{tag['href']}"
-        formatting_info.append(tag_info)
-    # Combine text, structure, and formatting
-    structure = ''.join([tag.name for tag in soup.find_all() if tag.name])
-    formatting_str = '|'.join(formatting_info)
-    combined = f"{text_content}|{structure}|{formatting_str}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
-
-def get_notion_page_content_hash(page_id):
-    """Get content hash from existing Notion page, including formatting annotations"""
-    try:
-        url = f'https://api.notion.com/v1/blocks/{page_id}/children'
-        r = requests.get(url, headers=notion_headers)
-        if not r.ok:
-            return None
-        
-        blocks = r.json().get('results', [])
-        # Extract text content AND formatting annotations from blocks
-        content_parts = []
-        for block in blocks[:100]:  # Check first 100 blocks
-            block_type = block.get('type')
-            if block_type in ['paragraph', 'heading_1', 'heading_2', 'heading_3', 
-                            'bulleted_list_item', 'numbered_list_item']:
-                rich_text = block.get(block_type, {}).get('rich_text', [])
-                for text_obj in rich_text:
-                    plain_text = text_obj.get('plain_text', '')
-                    annotations = text_obj.get('annotations', {})
-                    # Include formatting in hash: bold, italic, underline, strikethrough, code
-                    formatting = ''.join([
-                        'B' if annotations.get('bold') else '',
-                        'I' if annotations.get('italic') else '',
-                        'U' if annotations.get('underline') else '',
-                        'S' if annotations.get('strikethrough') else '',
-                        'C' if annotations.get('code') else '',
-                    ])
-                    # Include link if present
-                    link = ''
-                    if text_obj.get('text', {}).get('link'):
-                        link = text_obj['text']['link'].get('url', '')
-                    # Combine text + formatting + link
-                    content_parts.append(f"{plain_text}|{formatting}|{link}")
-        
-        content = '\n'.join(content_parts)
-        if content:
-            return hashlib.md5(content.encode('utf-8')).hexdigest()
-        return None
-    except Exception as e:
-        print(f"[WARNING] Error getting Notion page content: {e}")
-        return None
+def prune_empty_list_items(blocks):
+    """Remove list items that have neither text nor nested items"""
+    pruned = []
+    for block in blocks:
+        body = block[block["type"]]
+        if "children" in body:
+            body["children"] = prune_empty_list_items(body["children"])
+            if not body["children"]:
+                del body["children"]
+        if (block["type"] in ('bulleted_list_item', 'numbered_list_item') and
+                "children" not in body and
+                not ''.join(rt["text"]["content"] for rt in body["rich_text"]).strip()):
+            continue
+        pruned.append(block)
+    return pruned
+
+def insert_call_date_banner(soup, call_date):
+    """Put a bold 'Call <date>' banner at the start of the first paragraph (in place)"""
+    from bs4 import NavigableString
+    first_block = soup.find(['p', 'div'])
+    strong_tag = soup.new_tag('strong')
+    if first_block:
+        strong_tag.string = f'Call {call_date} '
+        if first_block.contents:
+            first_block.insert(0, strong_tag)
+            if (len(first_block.contents) > 1 and
+                isinstance(first_block.contents[1], str) and
+                not first_block.contents[1].startswith(' ')):
+                first_block.insert(1, ' ')
+        else:
+            first_block.append(strong_tag)
+    else:
+        # No paragraph to attach to: the banner becomes its own paragraph
+        root = fragment_root(soup)
+        while root.contents and isinstance(root.contents[0], NavigableString):
+            leading = root.contents[0]
+            if leading.strip():
+                leading.replace_with(leading.lstrip())
+                break
+            leading.extract()
+        strong_tag.string = f'Call {call_date}'
+        paragraph = soup.new_tag('p')
+        paragraph.append(strong_tag)
+        root.insert(0, paragraph)
+    return soup
+
+class HtmlPipeline:
+    """Parse extracted canvas HTML once and hand the same tree through each stage.
+
+    Stages, in order: cleanup(), restructure_lists(), add_call_date(),
+    then to_blocks(), block_hashes() and content_hash(). html serializes the current tree on
+    demand (for saving, before to_blocks), text is the plain text captured
+    at cleanup. Debug statistics are only collected when verbose is set.
+    """
+
+    def __init__(self, html_content, verbose=False, parser=None):
+        with tracing.span('parse', chars=len(html_content)):
+            self.soup = make_soup(html_content, parser)
+        self.verbose = verbose
+        self.text = None
+        self._blocks = None
+        self._block_hashes = None
+        if verbose:
+            print(f"[DEBUG] Raw HTML from JS: {len(html_content)} chars, {self._count_bold()} bold tags")
+
+    def _count_bold(self):
+        return len(self.soup.find_all(['strong', 'b']))
+
+    def cleanup(self):
+        """Drop script/style elements and capture the plain text"""
+        with tracing.span('cleanup'):
+            for script in self.soup(["script", "style"]):
+                script.decompose()
+            self.text = self.soup.get_text(separator='\n', strip=True)
+        return self
+
+    def restructure_lists(self):
+        """Turn kr-line divs into nested lists (see postprocess_coda_lists)"""
+        bold_before = self._count_bold() if self.verbose else 0
+        with tracing.span('restructure_lists'):
+            restructure_coda_lists(self.soup)
+            # Moved strings are merged the same way re-parsing serialized HTML would
+            self.soup.smooth()
+        if self.verbose:
+            bold_after = self._count_bold()
+            print(f"[DEBUG] Bold tags before/after postprocess: {bold_before}/{bold_after}")
+            if bold_before > 0 and bold_after == 0:
+                print(f"[ERROR] postprocess_coda_lists stripped all {bold_before} bold tags!")
+            elif bold_after < bold_before:
+                print(f"[WARNING] Lost {bold_before - bold_after} bold tags in postprocess")
+        return self
+
+    def add_call_date(self, call_date):
+        """Insert the 'Call <date>' banner for dated pages"""
+        if call_date:
+            insert_call_date_banner(self.soup, call_date)
+            self.soup.smooth()
+        return self
+
+    @property
+    def html(self):
+        return soup_to_html(self.soup)
+
+    def block_hashes(self):
+        """notion_blocks.hash_tree of the converted blocks (once)"""
+        if self._block_hashes is None:
+            blocks = self.to_blocks()
+            with tracing.span('hash'):
+                self._block_hashes = hash_tree(blocks)
+        return self._block_hashes
+
+    def content_hash(self):
+        """page_fingerprint of the converted blocks: the root of block_hashes()"""
+        return tree_root(self.block_hashes())
+
+    def to_blocks(self):
+        """Convert to Notion blocks (once); the tree is consumed"""
+        if self._blocks is None:
+            with tracing.span('to_blocks') as timed:
+                self._blocks = soup_to_notion_blocks(self.soup, verbose=self.verbose)
+                timed.attrs['blocks'] = len(self._blocks)
+        return self._blocks
+
+# Page writes and block listings go through one asyncio client on a background loop
+_notion_uploader = None
+_notion_uploader_lock = threading.Lock()
+
+def notion_request_totals():
+    """(requests, 429 responses) so far across the requests-based and async Notion clients"""
+    clients = [notion_api] + ([_notion_uploader.client] if _notion_uploader is not None else [])
+    totals = [client.totals() for client in clients]
+    return sum(requests for requests, _ in totals), sum(limited for _, limited in totals)
+
+def get_notion_uploader():
+    """The shared NotionUploader, started on first use"""
+    global _notion_uploader
+    with _notion_uploader_lock:
+        if _notion_uploader is None:
+            _notion_uploader = NotionUploader(NOTION_API_TOKEN)
+        return _notion_uploader
 
 # Cache for Notion pages to avoid repeated API calls
 _notion_pages_cache = None
 
 def get_all_notion_pages_cached():
-    """Get all Notion pages and cache them. Returns dict of {normalized_title: (page_id, page_data)}"""
+    """Get all Notion pages and cache them. Returns dict of {normalized_title: (page_id, child_page_block)}
+
+    Built from the parent's children listing alone (child_page.title, 100
+    blocks per request); no per-page requests are made.
+    """
     global _notion_pages_cache
     if _notion_pages_cache is not None:
         return _notion_pages_cache
     
     _notion_pages_cache = {}
     try:
-        url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children'
-        while url:
-            r = requests.get(url, headers=notion_headers, timeout=10)
-            if not r.ok:
-                break
-            
-            data = r.json()
-            for result in data.get('results', []):
-                if result.get('type') == 'child_page':
+        for result in get_notion_uploader().list_children(NOTION_PARENT_PAGE_ID):
+            if result.get('type') == 'child_page':
+                page_title = result.get('child_page', {}).get('title', '')
+                if page_title:
                     page_id = result.get('id')
-                    page_url = f'https://api.notion.com/v1/pages/{page_id}'
-                    page_resp = requests.get(page_url, headers=notion_headers, timeout=10)
-                    if page_resp.ok:
-                        page_data = page_resp.json()
-                        page_title_prop = page_data.get('properties', {}).get('title', {})
-                        if page_title_prop.get('title'):
-                            page_title = page_title_prop['title'][0].get('plain_text', '')
-                            normalized_title = normalize(page_title)
-                            _notion_pages_cache[normalized_title] = (page_id, page_data)
-            
-            # Check pagination
-            if data.get('has_more'):
-                next_cursor = data.get('next_cursor')
-                if next_cursor:
-                    url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children?start_cursor={next_cursor}'
-                else:
-                    url = None
-            else:
-                url = None
+                    _notion_pages_cache[normalize(page_title)] = (page_id, result)
     except Exception as e:
         print(f"[WARNING] Error fetching Notion pages cache: {e}")
     
     return _notion_pages_cache
 
-def check_page_exists_and_content(title, new_content_hash):
-    """Check if page exists and compare content hash. Returns (exists, page_id, content_changed)"""
+def check_page_exists_and_content(title, block_hashes):
+    """Check if page exists and compare it to the new block hash tree. Returns (exists, page_id, content_changed)
+
+    The existing page is read one nesting level at a time and the
+    comparison stops at the first level that differs. content_changed is
+    None when the page exists but could not be read: neither "same" nor
+    "changed" is known, so the caller must leave it for a later run.
+    """
     try:
         # Use cached page list for much faster lookup
         notion_pages = get_all_notion_pages_cached()
         normalized_title = normalize(title)
         
         if normalized_title in notion_pages:
-            page_id, page_data = notion_pages[normalized_title]
+            page_id, _ = notion_pages[normalized_title]
             # Found matching page, check content
-            existing_hash = get_notion_page_content_hash(page_id)
-            if existing_hash and new_content_hash:
-                content_changed = (existing_hash != new_content_hash)
-                return True, page_id, content_changed
-            # If we can't get hash, assume it exists (conservative)
-            return True, page_id, False
+            try:
+                same, _ = get_notion_uploader().compare_page(page_id, block_hashes)
+                return True, page_id, not same
+            except NotionApiError as e:
+                # Can't read the page (error response, connection error or timeout): it exists, so
+                # creating it would duplicate it, but recording it as migrated could hide a change
+                print(f"[WARNING] Error getting Notion page content: {e}")
+                return True, page_id, None
         
         return False, None, False
     except Exception as e:
@@ -819,24 +1807,99 @@ def check_page_exists_and_content(title, new_content_hash):
 def archive_notion_page(page_id):
     """Archive (delete) a Notion page"""
     try:
-        url = f'https://api.notion.com/v1/pages/{page_id}'
-        data = {"archived": True}
-        r = requests.patch(url, headers=notion_headers, json=data)
-        return r.ok
+        get_notion_uploader().archive_page(page_id)
+        return True
     except Exception as e:
         print(f"[WARNING] Error archiving page: {e}")
         return False
 
-def create_notion_page(title, html, dry_run=False):
-    blocks = html_to_notion_blocks(html)
+def update_notion_page_in_place(page_id, title, blocks, block_hashes=None, known=None):
+    """Diff update: change only the blocks that differ on an existing Notion page.
+
+    The page keeps its id (and inbound links). `known` is the hash tree
+    recorded at the last upload; subtrees whose hash it still matches are
+    not read from Notion. Returns False if the page could not be read or
+    patched, so the caller can archive and recreate.
+    """
+    uploader = get_notion_uploader()
+    try:
+        diff, reads = uploader.diff_page(page_id, blocks, known, block_hashes)
+        if not diff.empty:
+            uploader.apply_diff(diff)
+    except NotionApiError as e:
+        # Connection errors and timeouts arrive as NotionApiError too (status None)
+        reason = e.status if e.status is not None else e.body
+        print(f"[WARNING] In-place update of '{title}' failed ({reason}), falling back to archive and recreate")
+        return False
+    writes = diff.write_requests()
+    recreate = 2 + -(-max(0, len(blocks) - 100) // 100)  # archive, create, then appends of 100
+    saved = recreate - writes - reads
+    rewritten = f", {len(diff.rewrites)} block list(s) rewritten" if diff.rewrites else ''
+    print(f"[UPDATE] '{title}' updated in place: {diff.summary()}{rewritten}; "
+          f"{writes} write + {reads} read request(s) vs {recreate} to recreate "
+          f"({'saved ' + str(saved) if saved >= 0 else str(-saved) + ' more'})")
+    return True
+
+def record_page_state(state, coda_page, notion_page_id, content_hash, block_hashes=None):
+    """Remember which Notion page a Coda page became and what was uploaded"""
+    if state is not None and coda_page and coda_page.get('id'):
+        state.record_migration(coda_page['id'], coda_page.get('name'), notion_page_id, content_hash,
+                               coda_page.get('updatedAt'), block_hashes)
+
+def create_notion_page(title, html=None, dry_run=False, blocks=None, content_hash=None,
+                       coda_page=None, state=None, update_mode='recreate', block_hashes=None, progress=None):
+    """Create a Notion page from cleaned HTML, or from ready-made blocks and their hash.
+
+    With a MigrationState and the Coda page dict, a page that was migrated
+    before is decided from local state alone: skipped if its fingerprint is
+    unchanged, otherwise its recorded Notion page is archived and replaced.
+    Pages without state fall back to matching existing Notion pages by title.
+    With update_mode='diff', changed pages are patched block by block
+    instead of archived and replaced. The block hash tree is recorded with
+    the page, so the next diff can skip every subtree that is unchanged.
+    progress is passed on to the uploader to checkpoint a new page's chunks.
+    """
+    if blocks is None:
+        blocks = html_to_notion_blocks(html)
+    if block_hashes is None:
+        block_hashes = hash_tree(blocks)
+    if content_hash is None:
+        content_hash = tree_root(block_hashes)
     
-    # Calculate content hash for change detection
-    content_hash = calculate_content_hash(html)
+    record = None
+    if state is not None and coda_page and coda_page.get('id'):
+        record = state.get(coda_page['id'])
     
     # Check for existing page and content changes
-    if not dry_run:
-        exists, page_id, content_changed = check_page_exists_and_content(title, content_hash)
+    if not dry_run and record and record.get('notion_page_id'):
+        if record.get('content_hash') == content_hash:
+            print(f"[SKIP] Page '{title}' unchanged since last migration, skipping")
+            if record.get('coda_updated_at') != coda_page.get('updatedAt'):
+                # Touched in Coda without a content change: record the new updatedAt so
+                # --incremental stops rescheduling the page
+                record_page_state(state, coda_page, record['notion_page_id'], content_hash, block_hashes)
+            return None
+        if update_mode == 'diff' and update_notion_page_in_place(record['notion_page_id'], title, blocks,
+                                                                 block_hashes, state.block_hashes(coda_page['id'])):
+            record_page_state(state, coda_page, record['notion_page_id'], content_hash, block_hashes)
+            return record['notion_page_id']
+        print(f"[UPDATE] Page '{title}' content has changed - archiving old version")
+        if not archive_notion_page(record['notion_page_id']):
+            print(f"[WARNING] Failed to archive old page, skipping update")
+            return None
+        state.forget(coda_page['id'])
+        print(f"[UPDATE] Archived old page, will create updated version")
+    elif not dry_run:
+        with tracing.span('notion.lookup'):
+            exists, page_id, content_changed = check_page_exists_and_content(title, block_hashes)
+        if exists and content_changed is None:
+            print(f"[WARNING] Page '{title}' exists but could not be compared - leaving it for the next run")
+            return None
         if exists:
+            if content_changed and update_mode == 'diff' and update_notion_page_in_place(page_id, title, blocks,
+                                                                                         block_hashes):
+                record_page_state(state, coda_page, page_id, content_hash, block_hashes)
+                return page_id
             if content_changed:
                 print(f"[UPDATE] Page '{title}' exists but content has changed - archiving old version")
                 if archive_notion_page(page_id):
@@ -846,6 +1909,7 @@ def create_notion_page(title, html, dry_run=False):
                     return None
             else:
                 print(f"[SKIP] Page '{title}' already exists with same content, skipping")
+                record_page_state(state, coda_page, page_id, content_hash, block_hashes)
                 return None
     
     if dry_run:
@@ -877,38 +1941,64 @@ def create_notion_page(title, html, dry_run=False):
         }
         print("\n[DEBUG] Notion API payload for Lagoon:")
         print(json.dumps(payload, indent=2))
-    first_chunk = blocks[:100]
-    remaining = blocks[100:]
-    payload = {
-        "parent": {"page_id": NOTION_PARENT_PAGE_ID},
-        "properties": {
-            "title": {"title": [{"type": "text", "text": {"content": title}}]}
-        },
-        "children": first_chunk
-    }
-    url = 'https://api.notion.com/v1/pages'
-    r = requests.post(url, headers=notion_headers, json=payload)
-    if not r.ok:
+    # Creates the page with the first 100 blocks, then appends the rest in chunks of 100
+    try:
+        page_id = get_notion_uploader().create_page(NOTION_PARENT_PAGE_ID, title, blocks, progress)
+    except NotionApiError as e:
         print("[ERROR] Notion API failed:")
-        print("Status Code:", r.status_code)
-        print("Response:", r.text)
+        print("Status Code:", e.status)
+        print("Response:", e.body)
         return None
-    page_id = r.json().get("id")
-    # Append remaining blocks in chunks of 100
-    append_url = f"https://api.notion.com/v1/blocks/{page_id}/children"
-    while remaining:
-        chunk = remaining[:100]
-        remaining = remaining[100:]
-        append_payload = {"children": chunk}
-        r = requests.patch(append_url, headers=notion_headers, json=append_payload)
-        if not r.ok:
-            print("[ERROR] Notion API failed on chunk append:")
-            print("Status Code:", r.status_code)
-            print("Response:", r.text)
-            return None
     
+    record_page_state(state, coda_page, page_id, content_hash, block_hashes)
     return page_id
 
+def resume_notion_page(title, page_id, blocks, progress=None):
+    """Append what an interrupted run did not upload to the page it left half-created.
+
+    False once the page has been archived and should be created anew; None
+    if Notion could not be reached, leaving the page half-created for the
+    next run to resume rather than creating a second copy of it.
+    """
+    try:
+        appended = get_notion_uploader().resume_page(page_id, blocks, progress)
+    except NotionApiError as e:
+        print(f"[WARNING] Could not resume partially uploaded page '{title}', leaving it for the next run: {e}")
+        return None
+    if appended is None:
+        print(f"[WARNING] Partially uploaded page '{title}' does not match its blocks - archiving it")
+        archive_notion_page(page_id)
+        return False
+    print(f"[RESUME] Page '{title}': {appended} block(s) appended to the partially uploaded page")
+    return True
+
+def parse_coda_timestamp(value):
+    """Parse a Coda ISO-8601 timestamp ('2024-01-02T03:04:05.678Z'); None if missing or malformed"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+def select_changed_pages(pages, known_pages):
+    """Split Coda pages into (changed, unchanged) using updatedAt against the migration state.
+
+    A page is unchanged only if it was migrated before and Coda reports no
+    modification since the updatedAt recorded at that migration; pages
+    without usable timestamps are always scheduled.
+    """
+    changed, unchanged = [], []
+    for page in pages:
+        record = known_pages.get(page.get('id')) or {}
+        current = parse_coda_timestamp(page.get('updatedAt'))
+        migrated = parse_coda_timestamp(record.get('coda_updated_at'))
+        if record.get('notion_page_id') and current and migrated and current <= migrated:
+            unchanged.append(page)
+        else:
+            changed.append(page)
+    return changed, unchanged
+
 def extract_title_and_date(page_name):
     # Match patterns like 'Title 10/20/21' or 'Title - 10/20/21'
     match = re.match(r"^(.*?)(?:\s*-)?\s*(\d{1,2}/\d{1,2}/\d{2,4})$", page_name)
@@ -918,17 +2008,43 @@ def extract_title_and_date(page_name):
         return title, date
     return page_name, None
 
-def main():
-    parser = argparse.ArgumentParser(description='Migrate Coda pages to Notion')
-    parser.add_argument('--dry-run', action='store_true',
-                       help='Preview migration without creating Notion pages')
-    args = parser.parse_args()
-    
-    if args.dry_run:
-        print("=" * 60)
-        print("DRY RUN MODE - No pages will be created in Notion")
-        print("=" * 60)
-    
+def resumed_job(journal, page):
+    """PageJob for a page the journal has an extracted or converted checkpoint for, or None"""
+    step = journal.step(page['id'])
+    if step in ('converted', 'created', 'appended'):
+        saved = journal.artifact(page['id'], 'converted')
+        if saved is not None:
+            job = PageJob(page, timings=saved['timings'])
+            job.blocks, job.block_hashes = saved['blocks'], saved['block_hashes']
+            job.content_hash = tree_root(job.block_hashes)
+            print(f"[RESUME] {job.name}: converted blocks restored from the checkpoint")
+            return job
+    if step == 'extracted':
+        saved = journal.artifact(page['id'], 'extracted')
+        if saved is not None:
+            job = PageJob(page, saved['html'], saved['timings'])
+            job.lines, job.text = saved['lines'], saved['text']
+            print(f"[RESUME] {job.name}: extracted content restored from the checkpoint")
+            return job
+    return None
+
+class PageJob:
+    """One page on its way through the migration stages; each stage drops what the next one no longer needs"""
+
+    def __init__(self, page, html=None, timings=None):
+        self.page = page
+        self.name = page.get('name', 'unnamed_page')
+        self.html = html  # Raw canvas or export HTML (extract stage)
+        self.lines = None  # kr-lines instead, with --extract-mode blocks
+        self.text = None
+        self.blocks = None  # Notion blocks and their hash tree (convert stage)
+        self.block_hashes = None
+        self.content_hash = None
+        self.timings = timings if timings is not None else {}
+        self.started = time.time()
+
+def select_sales_notes_pages():
+    """The Coda pages to migrate: the Sales Notes section, from "Protego" to "ARKN" inclusive"""
     pages = fetch_all_pages_flat()
     if not pages:
         print("[ERROR] No pages found!")
@@ -988,146 +2104,464 @@ def main():
         print(f"  {idx}. {page.get('name', 'unnamed_page')}")
     if len(pages_to_process) > 10:
         print(f"  ... and {len(pages_to_process) - 10} more")
+    return pages_to_process
 
-    # Pre-load Notion pages cache for faster lookups
-    print("\n[INFO] Loading Notion pages cache...")
-    notion_cache = get_all_notion_pages_cached()
-    print(f"[INFO] Cached {len(notion_cache)} existing Notion pages for fast lookup")
+def main():
+    parser = argparse.ArgumentParser(description='Migrate Coda pages to Notion')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Preview migration without creating Notion pages')
+    parser.add_argument('--load-timeout', type=float, default=PAGE_LOAD_TIMEOUT,
+                       help=f'Seconds to wait for the Coda canvas to appear (default: {PAGE_LOAD_TIMEOUT})')
+    parser.add_argument('--quiet-ms', type=int, default=CANVAS_QUIET_MS,
+                       help=f'Milliseconds without DOM changes before the canvas counts as rendered (default: {CANVAS_QUIET_MS})')
+    parser.add_argument('--settle-timeout', type=float, default=CANVAS_SETTLE_TIMEOUT,
+                       help=f'Maximum seconds to wait for the canvas to stop changing (default: {CANVAS_SETTLE_TIMEOUT})')
+    parser.add_argument('--engine', choices=['js', 'cdp', 'export'], default='js',
+                       help="Extraction backend: 'js' walks the page with getComputedStyle, "
+                            "'cdp' uses one DevTools DOMSnapshot call, 'export' uses the Coda page export API "
+                            "without a browser and falls back to 'js' for pages it cannot export faithfully (default: js)")
+    parser.add_argument('--export-concurrency', type=int, default=EXPORT_CONCURRENCY,
+                       help=f'Coda exports in flight at once with --engine export (default: {EXPORT_CONCURRENCY})')
+    parser.add_argument('--extract-mode', choices=['html', 'blocks'], default='html',
+                       help="'html' extracts annotated HTML and converts it with BeautifulSoup, "
+                            "'blocks' has the browser emit a compact line list mapped straight to Notion blocks (default: html)")
+    parser.add_argument('--parser', default=os.getenv('HTML_PARSER', 'auto'),
+                       choices=['auto'] + list(HTML_PARSER_PREFERENCE),
+                       help="BeautifulSoup parser backend; 'auto' picks the fastest installed (default: auto, or $HTML_PARSER)")
+    parser.add_argument('--incremental', action='store_true',
+                       help='Only render pages that are new or whose Coda updatedAt is newer than their last migration')
+    parser.add_argument('--update-mode', choices=['recreate', 'diff'], default='recreate',
+                       help="How changed pages are updated: 'recreate' archives the Notion page and uploads it again, "
+                            "'diff' patches only the blocks that changed and keeps the page (default: recreate)")
+    parser.add_argument('--extract-workers', type=int, default=EXTRACT_WORKERS,
+                       help=f'Pages rendered in Chrome at once; one browser each (default: {EXTRACT_WORKERS})')
+    parser.add_argument('--convert-workers', type=int, default=CONVERT_WORKERS,
+                       help=f'Threads parsing HTML and converting it to Notion blocks (default: {CONVERT_WORKERS})')
+    parser.add_argument('--convert-processes', type=int, default=None,
+                       help='Worker processes for HTML conversion, 0 to convert in the convert threads '
+                            '(default: one per available core, or 0 on a single core)')
+    parser.add_argument('--upload-workers', type=int, default=UPLOAD_WORKERS,
+                       help=f'Pages uploaded to Notion at once (default: {UPLOAD_WORKERS})')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Grow and shrink extract and upload workers at runtime from page latency, free memory, '
+                            'CPU and Notion 429s; --extract-workers/--upload-workers are the starting points')
+    parser.add_argument('--max-extract-workers', type=int, default=MAX_EXTRACT_WORKERS,
+                       help=f'Most extract workers --adaptive may run (default: {MAX_EXTRACT_WORKERS})')
+    parser.add_argument('--max-upload-workers', type=int, default=MAX_UPLOAD_WORKERS,
+                       help=f'Most upload workers --adaptive may run (default: {MAX_UPLOAD_WORKERS})')
+    parser.add_argument('--min-free-memory', type=float, default=MIN_FREE_MEMORY * 100,
+                       help=f'With --adaptive, shed browsers below this percentage of host memory available '
+                            f'(default: {MIN_FREE_MEMORY * 100:.0f})')
+    parser.add_argument('--adapt-interval', type=float, default=DEFAULT_INTERVAL,
+                       help=f'Seconds between --adaptive decisions (default: {DEFAULT_INTERVAL:g})')
+    parser.add_argument('--queue-size', type=int, default=None,
+                       help='Pages waiting in front of each stage before the previous one blocks '
+                            '(default: twice the stage\'s workers)')
+    parser.add_argument('--state-db', default=DEFAULT_STATE_PATH,
+                       help=f'SQLite migration state file (default: {DEFAULT_STATE_PATH}, or $MIGRATION_STATE_DB)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Continue an interrupted run from its checkpoint journal: finished pages are skipped, '
+                            'extracted/converted ones restored and half-uploaded Notion pages completed')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL_PATH,
+                       help=f'Checkpoint journal file (default: {DEFAULT_JOURNAL_PATH}, or $MIGRATION_JOURNAL)')
+    parser.add_argument('--work-queue', default=None,
+                       help='Shared SQLite work queue for migrating on several machines: with --coordinator the '
+                            'selected pages are added to it, otherwise pages are leased from it')
+    parser.add_argument('--coordinator', action='store_true',
+                       help='Fill --work-queue with the pages to migrate and exit, without migrating anything')
+    parser.add_argument('--requeue-failed', action='store_true',
+                       help='With --coordinator, give pages that used up their attempts another round')
+    parser.add_argument('--worker-id', default=None,
+                       help='Name this worker\'s leases carry (default: <hostname>-<pid>)')
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                       help=f'Seconds a leased page stays reserved without a heartbeat (default: {DEFAULT_LEASE_SECONDS:g})')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                       help=f'Attempts per page before the work queue marks it failed (default: {DEFAULT_MAX_ATTEMPTS})')
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                       help='Write a JSON-lines span per timed step of every page (driver acquisition, navigation, '
+                            'readiness wait, extraction, parse, list restructuring, block conversion, hashing, '
+                            'Notion lookup, create, appends) to FILE')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Collect and print per-page HTML debug statistics (bold tag counts, top-level elements)')
+    parser.add_argument('--save-raw', action='store_true',
+                       help='Also save the unprocessed canvas HTML to output/<page>_raw.html for offline benchmarks')
+    args = parser.parse_args()
+    if args.resume and args.dry_run:
+        parser.error('--dry-run does not write checkpoints, so there is nothing to --resume')
+    if (args.coordinator or args.requeue_failed) and not args.work_queue:
+        parser.error('--coordinator and --requeue-failed need --work-queue')
+    if args.dry_run and args.work_queue and not args.coordinator:
+        # A dry run can't finish a leased page, so the worker would keep leasing it again
+        parser.error('--dry-run does not migrate pages, so it cannot work through a --work-queue')
+    if args.extract_mode == 'blocks' and (args.engine != 'js' or args.save_raw):
+        # 'export' is html-only too: the export API returns HTML, not kr-lines
+        parser.error('--extract-mode blocks works with the js engine only and does not support --save-raw')
+    html_parser = set_html_parser(args.parser)
+    print(f"[INFO] HTML parser: {html_parser}")
+    if args.trace:
+        tracing.configure(args.trace)
+        print(f"[INFO] Writing timing spans to {args.trace}")
+    
+    if args.dry_run:
+        print("=" * 60)
+        print("DRY RUN MODE - No pages will be created in Notion")
+        print("=" * 60)
+    
+    # Pages migrated before are matched through local state, not by title
+    state = MigrationState(args.state_db)
+    work_queue = None
+    if args.work_queue:
+        work_queue = WorkQueue(args.work_queue, args.worker_id, args.lease_seconds, args.max_attempts)
+    worker_mode = work_queue is not None and not args.coordinator
+    if worker_mode:
+        # The coordinator selected the pages; lease them one at a time as the pipeline has room
+        counts = work_queue.counts()
+        page_count = sum(counts.get(status, 0) for status in ('pending', 'leased', 'expired'))
+        print(f"[INFO] Worker {work_queue.worker_id} on work queue {args.work_queue}: "
+              + ', '.join(f"{pages} {status}" for status, pages in sorted(counts.items())))
+        if not page_count:
+            print("[INFO] Nothing to migrate")
+            work_queue.close()
+            state.close()
+            return
+        pages_to_process = work_queue.pages()
+        untracked = []
+    else:
+        pages_to_process = select_sales_notes_pages()
+        known_pages = state.all()
+        untracked = [page for page in pages_to_process
+                     if not (known_pages.get(page.get('id')) or {}).get('notion_page_id')]
+        print(f"[INFO] Migration state ({args.state_db}): {len(pages_to_process) - len(untracked)} page(s) tracked, "
+              f"{len(untracked)} untracked")
+    
+        if args.incremental:
+            pages_to_process, skipped = select_changed_pages(pages_to_process, known_pages)
+            print(f"[INFO] Incremental: {len(pages_to_process)} new or changed page(s) scheduled, "
+                  f"{len(skipped)} unchanged since last migration skipped")
+            if not pages_to_process:
+                print("[INFO] Nothing to migrate")
+                state.close()
+                return
+            scheduled_ids = {page.get('id') for page in pages_to_process}
+            untracked = [page for page in untracked if page.get('id') in scheduled_ids]
+        page_count = len(pages_to_process)
+    
+        if work_queue is not None:
+            # Coordinator: hand the selection to the workers and stop
+            added = work_queue.enqueue(pages_to_process)
+            requeued = work_queue.requeue_failed() if args.requeue_failed else 0
+            counts = work_queue.counts()
+            print(f"[INFO] Work queue {args.work_queue}: {added} page(s) added, {requeued} failed page(s) requeued; "
+                  + ', '.join(f"{pages} {status}" for status, pages in sorted(counts.items())))
+            work_queue.close()
+            state.close()
+            return
+    
+    # Every step of every page is checkpointed; --resume picks up after the last one recorded
+    journal = CheckpointJournal(args.journal, resume=args.resume, enabled=not args.dry_run)
+    if args.resume:
+        summary = journal.summary()
+        print(f"[INFO] Resuming from {args.journal}: "
+              + (', '.join(f"{pages} {step}" for step, pages in summary.items()) or 'no checkpoints'))
+        if not worker_mode:
+            finished = [page for page in pages_to_process if journal.step(page.get('id')) == 'done']
+            pages_to_process = [page for page in pages_to_process if journal.step(page.get('id')) != 'done']
+            page_count = len(pages_to_process)
+            print(f"[INFO] Resume: {len(finished)} page(s) finished earlier skipped, {page_count} to go")
+            if not pages_to_process:
+                print("[INFO] Nothing to migrate")
+                journal.close()
+                state.close()
+                return
+    
+    # Pre-load Notion pages cache for faster lookups (only untracked pages are matched by title;
+    # a worker can't tell which leased pages will be)
+    if (untracked or worker_mode) and not args.dry_run:
+        print("\n[INFO] Loading Notion pages cache...")
+        notion_cache = get_all_notion_pages_cached()
+        print(f"[INFO] Cached {len(notion_cache)} existing Notion pages for fast lookup")
     
     # Thread-safe counter and lock
     processed_count = 0
     processed_lock = threading.Lock()
+    page_timings = []  # Per-page extraction timing breakdowns
     
-    def process_page(page):
-        """Process a single page - runs in its own thread with its own driver"""
-        nonlocal processed_count
+    def extract_stage(page):
+        """Browser stage: raw canvas HTML (or kr-lines) for one page, holding a driver only while rendering"""
         page_name = page.get('name', 'unnamed_page')
-        safe_name = safe_filename(page_name)
         page_url = page.get('browserLink', '')
-        
-        # Each thread gets its own driver instance
-        driver = None
-        try:
-            print(f"[INFO] Processing page: {page_name}")
-            driver = setup_driver()
-            
-            driver.get(page_url)
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, '[data-coda-ui-id="canvas"], [data-coda-ui-id="canvas-content"], [data-coda-ui-id="page-content"]'))
-            )
-            time.sleep(1)
-            
-            # Use extract_content function which includes formatting detection
-            raw_html, clean_text = extract_content(driver, page_url)
-            if not raw_html:
-                print(f"[ERROR] No HTML extracted for {page_name} at {page_url}")
-                return False
-            
-            # raw_html already processed by extract_content with formatting detection
-            clean_html = raw_html
-            if clean_html and clean_text:
-                save_content(clean_html, clean_text, safe_name)
-                notion_title, call_date = extract_title_and_date(page_name)
-                if call_date:
-                    soup2 = BeautifulSoup(clean_html, 'html.parser')
-                    first_block = soup2.find(['p', 'div'])
-                    if first_block:
-                        strong_tag = soup2.new_tag('strong')
-                        strong_tag.string = f'Call {call_date} '
-                        if first_block.contents:
-                            first_block.insert(0, strong_tag)
-                            if (len(first_block.contents) > 1 and
-                                isinstance(first_block.contents[1], str) and
-                                not first_block.contents[1].startswith(' ')):
-                                first_block.insert(1, ' ')
-                        else:
-                            first_block.append(strong_tag)
-                        clean_html = str(soup2)
-                    else:
-                        clean_html = f'<p><strong>Call {call_date}</strong></p>' + clean_html.lstrip('\n').lstrip('\r').lstrip()
-                
-                create_notion_page(notion_title, clean_html, dry_run=args.dry_run)
-                if args.dry_run:
-                    print(f"[DRY RUN] ✓ Would create Notion page: {notion_title}")
+        print(f"[INFO] Processing page: {page_name}")
+        job = resumed_job(journal, page)
+        if job is not None:
+            return job
+        if page.get('id') in exported_html:
+            # Export engine: the Coda export API already returned the page HTML, no browser needed
+            job = PageJob(page, exported_html.pop(page['id']), {'export': exported_seconds[page['id']]})
+            tracing.record('export', job.timings['export'])
+        elif args.engine == 'export' and worker_mode:
+            # Leased pages arrive one at a time, so they are exported here rather than up front
+            html, seconds = export_page_for_worker(page)
+            tracing.record('export', seconds, exported=html is not None)
+            if html is not None:
+                job = PageJob(page, html, {'export': seconds})
+        if job is None:
+            job = PageJob(page)
+            # Borrow a warm driver from the shared pool instead of starting Chrome per page
+            with driver_pool.borrow() as driver:
+                if args.extract_mode == 'blocks':
+                    job.lines, job.text = extract_lines(
+                        driver, page_url, load_timeout=args.load_timeout, quiet_ms=args.quiet_ms,
+                        settle_timeout=args.settle_timeout, timings=job.timings)
                 else:
-                    print(f"[✓] Notion page created: {notion_title}")
-                    with processed_lock:
-                        processed_count += 1
-                return True
-            else:
-                print(f"[ERROR] No content extracted for {page_name}")
-                return False
-        except Exception as e:
-            print(f"[ERROR] Exception during extraction for {page_name} at {page_url}: {e}")
-            return False
-        finally:
-            if driver:
-                driver.quit()
-                # Clean up temporary profile directory if it exists
-                import shutil
-                if hasattr(driver, '_temp_profile'):
-                    try:
-                        shutil.rmtree(driver._temp_profile, ignore_errors=True)
-                    except:
-                        pass
+                    job.html = extract_canvas_html(
+                        driver, page_url, load_timeout=args.load_timeout, quiet_ms=args.quiet_ms,
+                        settle_timeout=args.settle_timeout, timings=job.timings, engine=browser_engine,
+                        raw_path=f'output/{safe_filename(page_name)}_raw.html' if args.save_raw else None)
+            if not (job.lines or job.html):
+                print(f"[ERROR] No content extracted for {page_name} at {page_url}")
+                return None
+        journal.extracted(page['id'], html=job.html, lines=job.lines, text=job.text, timings=job.timings)
+        return job
+    
+    def convert_stage(job):
+        """CPU stage: parse and restructure, save, add the call date banner, convert to blocks and hash"""
+        if job.blocks is not None:
+            return job  # Resumed from a converted checkpoint
+        stage_start = time.time()
+        notion_title, call_date = extract_title_and_date(job.name)
+        if job.lines is not None:
+            # Blocks extraction mode: browser lines -> Notion blocks, no HTML round trip
+            with tracing.span('to_blocks') as timed:
+                job.blocks = lines_to_notion_blocks(job.lines, call_date)
+                timed.attrs['blocks'] = len(job.blocks)
+            with tracing.span('hash'):
+                job.block_hashes = hash_tree(job.blocks)
+            save_content(None, job.text, job.name)
+        elif conversion_pool is not None:
+            # Parsing and conversion are pure Python: run them in a worker process, off the GIL
+            converted = conversion_pool.convert(job.html, call_date, args.verbose)
+            tracing.replay(converted['spans'])
+            if not converted['text']:
+                print(f"[ERROR] No content extracted for {job.name}")
+                return None
+            save_content(converted['html'], converted['text'], safe_filename(job.name))
+            job.blocks, job.block_hashes = converted['blocks'], converted['block_hashes']
+        else:
+            # The pipeline keeps the parsed tree: banner, hash and blocks reuse it
+            pipeline = HtmlPipeline(job.html, verbose=args.verbose).cleanup().restructure_lists()
+            if not pipeline.text:
+                print(f"[ERROR] No content extracted for {job.name}")
+                return None
+            save_content(pipeline.html, pipeline.text, safe_filename(job.name))
+            pipeline.add_call_date(call_date)
+            job.blocks = pipeline.to_blocks()
+            job.block_hashes = pipeline.block_hashes()
+        job.content_hash = tree_root(job.block_hashes)
+        job.html = job.lines = None
+        job.timings['convert'] = time.time() - stage_start
+        journal.converted(job.page['id'], job.blocks, job.block_hashes, job.timings)
+        return job
+    
+    def upload_stage(job):
+        """Notion stage: create, skip or update the page"""
+        nonlocal processed_count
+        stage_start = time.time()
+        notion_title, _ = extract_title_and_date(job.name)
+        if work_queue is not None and not work_queue.holds(job.page['id']):
+            # The lease expired and another worker may have the page now: uploading could duplicate it
+            print(f"[SKIP] Lease on '{job.name}' was lost, leaving it to the worker that holds it")
+            return None
+        checkpoint = journal.entry(job.page['id'])
+        progress = traced_progress(journal.upload_progress(job.page['id']))
+        resumed = False
+        if not args.dry_run and checkpoint.get('step') in ('created', 'appended'):
+            resumed = resume_notion_page(notion_title, checkpoint['notion_page_id'], job.blocks, progress)
+            if resumed is None:
+                # The journal keeps the half-created page; a work queue releases it for another attempt
+                return None
+        if resumed:
+            record_page_state(state, job.page, checkpoint['notion_page_id'], job.content_hash, job.block_hashes)
+        else:
+            create_notion_page(notion_title, dry_run=args.dry_run, blocks=job.blocks, content_hash=job.content_hash,
+                               coda_page=job.page, state=state, update_mode=args.update_mode,
+                               block_hashes=job.block_hashes, progress=progress)
+        job.blocks = None
+        # create_notion_page returns None for skips and failures alike; only a page the state
+        # now records with this content is finished
+        finished = (state.get(job.page['id']) or {}).get('content_hash') == job.content_hash
+        if finished:
+            journal.done(job.page['id'])
+        if work_queue is not None:
+            if not finished:
+                print(f"[ERROR] '{job.name}' was not uploaded, releasing it for another attempt")
+                return None  # leased() releases the page and counts the attempt
+            work_queue.ack(job.page['id'])
+        job.timings['upload'] = time.time() - stage_start
+        job.timings['total'] = job.timings.get('export', 0) + time.time() - job.started
+        print(f"[TIMING] {job.name}: " + ' '.join(f"{stage}={secs:.2f}s" for stage, secs in job.timings.items()))
+        with processed_lock:
+            page_timings.append(job.timings)
+        if args.dry_run:
+            print(f"[DRY RUN] ✓ Would create Notion page: {notion_title}")
+        else:
+            print(f"[✓] Notion page created: {notion_title}")
+            with processed_lock:
+                processed_count += 1
+        return job
+    
+    def traced_progress(checkpoint):
+        """Upload progress callback that also records the create and every append as spans of this page.
+
+        The uploader calls it from its event loop thread, so the page is captured here.
+        """
+        context = tracing.current()
+        def progress(notion_page_id, chunk, chunks, seconds=None):
+            if seconds is not None:
+                tracing.record('notion.create' if chunk == 1 else 'notion.append', seconds, context=context,
+                               chunk=chunk, chunks=chunks)
+            checkpoint(notion_page_id, chunk, chunks, seconds)
+        return progress
+    
+    def traced(stage_name, stage_handler):
+        """Run the stage handler with its page as the current trace, timing the whole stage as one span"""
+        def handler(item):
+            page = item.page if isinstance(item, PageJob) else item
+            with tracing.page(page.get('id'), page.get('name')), tracing.span(f'stage.{stage_name}'):
+                return stage_handler(item)
+        return handler
+    
+    def leased(stage_handler):
+        """With a work queue, release the page for another attempt when the stage drops it or raises"""
+        if work_queue is None:
+            return stage_handler
+        def handler(item):
+            page_id = (item.page if isinstance(item, PageJob) else item)['id']
+            try:
+                result = stage_handler(item)
+            except Exception as e:
+                work_queue.release(page_id, f"{type(e).__name__}: {e}")
+                raise
+            if result is None:
+                work_queue.release(page_id, 'dropped by a migration stage')
+            return result
+        return handler
     
     # Use concurrent processing with thread pool
     output_dir = 'output'
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    # Determine number of workers (concurrent pages to process)
-    # Use 3-5 workers to balance speed vs resource usage
-    max_workers = min(5, len(pages_to_process))
-    print(f"\n[INFO] Using {max_workers} concurrent workers for faster processing")
-    print(f"[INFO] Processing {len(pages_to_process)} pages...\n")
+    # Browsers only render; parsing and uploading run in their own stages so drivers never wait on Notion
+    extract_workers = max(1, min(args.extract_workers, page_count))
+    upload_workers = max(1, args.upload_workers)
+    # --adaptive starts every thread the bounds allow and moves the stage limits between them
+    extract_threads, upload_threads = extract_workers, upload_workers
+    if args.adaptive:
+        extract_threads = max(extract_workers, min(args.max_extract_workers, page_count))
+        upload_threads = max(upload_workers, args.max_upload_workers)
+    convert_processes = args.convert_processes
+    if convert_processes is None:
+        # One process can't beat the GIL-bound thread it would replace
+        convert_processes = available_cores() if available_cores() > 1 else 0
+    conversion_pool = None
+    convert_workers = args.convert_workers
+    if convert_processes > 0 and args.extract_mode == 'html':
+        conversion_pool = ConversionPool(convert_processes, html_parser)
+        convert_workers = convert_processes  # One thread per process hands it pages
+    print(f"\n[INFO] Pipeline: {extract_workers} extract, {convert_workers} convert"
+          f"{f' (in {convert_processes} process(es))' if conversion_pool else ''}, "
+          f"{upload_workers} upload worker(s)"
+          f"{f' (adaptive, up to {extract_threads} extract and {upload_threads} upload)' if args.adaptive else ''}")
+    print(f"[INFO] Processing {page_count} pages{' (leased from the work queue)' if worker_mode else ''}...\n")
+    
+    # One pooled API connection per worker
+    coda_api.resize_pool(max(extract_threads, args.export_concurrency if args.engine == 'export' else 1))
+    notion_api.resize_pool(upload_threads)
+    
+    # One driver per extract worker at most; drivers are reused across pages.
+    # Drivers start on first borrow, so a run served entirely by exports never launches Chrome.
+    driver_pool = DriverPool(max_size=extract_workers)
+    
+    # Export engine: fetch page HTML through the API first; anything it can't
+    # reproduce faithfully falls back to the 'js' browser engine
+    exported_html, exported_seconds = {}, {}
+    browser_engine = args.engine
+    if args.engine == 'export':
+        browser_engine = 'js'
+    if args.engine == 'export' and not worker_mode:
+        # Pages with a checkpoint already have their content
+        to_export = [page for page in pages_to_process if journal.step(page.get('id')) is None]
+        print(f"[INFO] Exporting {len(to_export)} page(s) through the Coda API...")
+        exported_html, exported_seconds = export_pages(to_export, concurrency=args.export_concurrency)
+    
+    # Bounded queues between the stages keep at most a few pages in memory
+    stage_pipeline = StagedPipeline([
+        Stage('extract', leased(traced('extract', extract_stage)), extract_threads, args.queue_size,
+              limit=extract_workers),
+        Stage('convert', leased(traced('convert', convert_stage)), convert_workers, args.queue_size),
+        Stage('upload', leased(traced('upload', upload_stage)), upload_threads, args.queue_size,
+              limit=upload_workers),
+    ])
+    controller = None
+    if args.adaptive:
+        # Browsers are what exhausts memory and CPU; uploads are what Notion answers 429 to
+        controller = ConcurrencyController(args.adapt_interval, min_free_memory=args.min_free_memory / 100)
+        extract, _, upload = stage_pipeline.stages
+        controller.manage(extract, 1, extract_threads, memory=True, cpu=True, on_resize=driver_pool.resize)
+        controller.manage(upload, 1, upload_threads, requests=notion_request_totals)
     
     try:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all pages to the thread pool
-            future_to_page = {executor.submit(process_page, page): page for page in pages_to_process}
-            
-            # Process completed tasks as they finish
-            for future in as_completed(future_to_page):
-                page = future_to_page[future]
-                try:
-                    result = future.result()
-                except Exception as e:
-                    page_name = page.get('name', 'unnamed_page')
-                    print(f"[ERROR] Page {page_name} generated an exception: {e}")
+        if controller is not None:
+            controller.start()
+        if work_queue is not None:
+            work_queue.start_heartbeat()
+        stage_pipeline.run(pages_to_process)
         
         if not args.dry_run:
             print(f"\n[✓] Migration complete! Processed {processed_count} page(s).")
     except KeyboardInterrupt:
         print("\n[INFO] Migration interrupted by user")
         sys.exit(1)
+    finally:
+        if page_timings:
+            stages = list(dict.fromkeys(stage for t in page_timings for stage in t if stage != 'total')) + ['total']
+            averages = ' '.join(
+                f"{stage}={sum(t.get(stage, 0) for t in page_timings) / len(page_timings):.2f}s"
+                for stage in stages)
+            print(f"[TIMING] Average over {len(page_timings)} page(s): {averages}")
+        tracing.print_summary()
+        tracing.close()
+        if controller is not None:
+            controller.stop()
+        stage_pipeline.print_stats()
+        if controller is not None:
+            controller.print_stats()
+        if conversion_pool is not None:
+            conversion_pool.print_stats()
+            conversion_pool.close()
+        stats = driver_pool.stats()
+        print(f"[INFO] Driver pool: {stats['hits']} reused, {stats['misses']} started "
+              f"({stats['startup_seconds']}s total startup, {stats['avg_startup_seconds']}s avg), "
+              f"{stats['discarded']} discarded")
+        driver_pool.close()
+        if work_queue is not None:
+            returned = work_queue.return_held()
+            counts = work_queue.counts()
+            print(f"[INFO] Work queue: {returned} unfinished lease(s) returned; "
+                  + ', '.join(f"{pages} {status}" for status, pages in sorted(counts.items())))
+            work_queue.close()
+        summary = journal.summary()
+        if journal.enabled and summary:
+            print(f"[INFO] Checkpoint journal {args.journal}: "
+                  + ', '.join(f"{pages} {step}" for step, pages in summary.items())
+                  + ('' if set(summary) == {'done'} else ' - run again with --resume to finish the rest'))
+        journal.close()
+        coda_api.print_stats()
+        notion_api.print_stats()
+        if _notion_uploader is not None:
+            _notion_uploader.print_stats()
+            _notion_uploader.close()
+        state.close()
 
 if __name__ == "__main__":
     main()
-    # --- TEST HARNESS FOR postprocess_coda_lists ---
-    test_raw_path = 'output/Lagoon_raw.html'
-    test_out_path = 'output/Lagoon_test_processed.html'
-    import os
-    if os.path.exists(test_raw_path):
-        with open(test_raw_path, 'r', encoding='utf-8') as f:
-            raw_html = f.read()
-        processed_html = postprocess_coda_lists(raw_html)
-        with open(test_out_path, 'w', encoding='utf-8') as f:
-            f.write(processed_html)
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(processed_html, 'html.parser')
-        kr_lines = soup.find_all('div', class_=lambda c: c and 'kr-line' in c)
-        num_kr_lines = len(kr_lines)
-        num_ul = len(soup.find_all('ul'))
-        num_ol = len(soup.find_all('ol'))
-        num_a = len(soup.find_all('a'))
-        print(f"[INFO] TEST HARNESS: kr-line divs in processed: {num_kr_lines}, <ul>: {num_ul}, <ol>: {num_ol}, <a>: {num_a}")
-        print(f"[INFO] TEST HARNESS: Output written to {test_out_path}")
-    # TEST HARNESS: Minimal nested list and link
-    test_html = '''<ul><li>Parent item <a href="https://example.com">Example</a><ul><li>Child item <a href="https://child.com">ChildLink</a></li></ul></li></ul>'''
-    print("\n[TEST HARNESS] Minimal nested list and link HTML:")
-    print(test_html)
-    blocks = html_to_notion_blocks(test_html)
-    import json
-    print("\n[TEST HARNESS] Notion blocks for minimal nested list and link:")
-    print(json.dumps(blocks, indent=2))
\ No newline at end of file
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the Coda API used by the 'export' engine.
+
+Serves a directory of saved page HTML files (one page per file, the file
+name is the page name) as a Coda doc, so `coda-download.py --engine export`
+can be exercised end to end without Coda, Chrome or network access:
+
+    GET  /docs/<doc>/pages                       page listing (paginated)
+    POST /docs/<doc>/pages/<page>/export         start an export
+    GET  /docs/<doc>/pages/<page>/export/<req>   inProgress, then complete
+    GET  /downloads/<req>                        the exported HTML
+
+Exports report inProgress for --export-delay seconds before completing,
+like the real API's asynchronous exports.
+
+Usage:
+    python3 coda-export-stub-server.py --pages-dir output --port 8765
+    CODA_API_BASE=http://127.0.0.1:8765 python3 coda-download.py --engine export --dry-run
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_SIZE = 100
+
+class StubDoc:
+    """Pages loaded from disk plus the export requests made against them"""
+
+    def __init__(self, pages_dir, export_delay):
+        self.export_delay = export_delay
+        self.pages = {}
+        for index, path in enumerate(sorted(glob.glob(os.path.join(pages_dir, '*.html')))):
+            name = os.path.basename(path)[:-len('.html')]
+            if name.endswith('_raw'):
+                name = name[:-len('_raw')]
+            modified = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+            self.pages[f'canvas-{index:05d}'] = {
+                'name': name,
+                'path': path,
+                'updatedAt': modified.isoformat(timespec='seconds').replace('+00:00', 'Z'),
+            }
+        self.exports = {}
+        self.lock = threading.Lock()
+        self.export_count = 0
+        self.poll_count = 0
+
+    def listing(self, page_token):
+        ids = list(self.pages)
+        start = int(page_token or 0)
+        items = [{
+            'id': page_id,
+            'type': 'page',
+            'name': page['name'],
+            'browserLink': f'https://coda.io/d/_dstub/_su{page_id}',
+            'updatedAt': page['updatedAt'],
+        } for page_id, page in ((i, self.pages[i]) for i in ids[start:start + PAGE_SIZE])]
+        body = {'items': items}
+        if start + PAGE_SIZE < len(ids):
+            body['nextPageToken'] = str(start + PAGE_SIZE)
+        return body
+
+    def start_export(self, page_id):
+        request_id = uuid.uuid4().hex
+        with self.lock:
+            self.exports[request_id] = (page_id, time.time())
+            self.export_count += 1
+        return request_id
+
+    def export_status(self, request_id, host):
+        with self.lock:
+            self.poll_count += 1
+            page_id, started = self.exports[request_id]
+        if time.time() - started < self.export_delay:
+            return {'id': request_id, 'status': 'inProgress'}
+        return {'id': request_id, 'status': 'complete',
+                'downloadLink': f'http://{host}/downloads/{request_id}'}
+
+    def download(self, request_id):
+        page_id, _ = self.exports[request_id]
+        with open(self.pages[page_id]['path'], 'rb') as f:
+            return f.read()
+
+def make_handler(doc, verbose=False):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def not_found(self):
+            self.send_json(404, {'statusCode': 404, 'message': f'Not found: {self.path}'})
+
+        def do_GET(self):
+            path, _, query = self.path.partition('?')
+            params = dict(part.split('=', 1) for part in query.split('&') if '=' in part)
+            if re.fullmatch(r'/docs/[^/]+/pages', path):
+                return self.send_json(200, doc.listing(params.get('pageToken')))
+            match = re.fullmatch(r'/docs/[^/]+/pages/([^/]+)/export/([^/]+)', path)
+            if match and match.group(2) in doc.exports:
+                return self.send_json(200, doc.export_status(match.group(2), self.headers.get('Host')))
+            match = re.fullmatch(r'/downloads/([^/]+)', path)
+            if match and match.group(1) in doc.exports:
+                data = doc.download(match.group(1))
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            self.not_found()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            match = re.fullmatch(r'/docs/[^/]+/pages/([^/]+)/export', self.path)
+            if match and match.group(1) in doc.pages:
+                return self.send_json(202, {'id': doc.start_export(match.group(1)), 'status': 'inProgress'})
+            self.not_found()
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve saved pages through a stand-in Coda export API')
+    parser.add_argument('--pages-dir', default='output', help='Directory of <page name>.html files (default: output)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--export-delay', type=float, default=1.0,
+                        help='Seconds an export stays inProgress before completing (default: 1.0)')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    doc = StubDoc(args.pages_dir, args.export_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(doc, args.verbose))
+    print(f"📄 Serving {len(doc.pages)} page(s) from {args.pages_dir}")
+    print(f"🔗 CODA_API_BASE=http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {doc.export_count} export(s) started, {doc.poll_count} status poll(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Adaptive worker counts for the staged migration pipeline.
+
+A fixed number of browsers is wrong in both directions: too few leaves a
+large machine idle, too many makes Chrome instances fight over memory and
+CPU until every page renders slower. Likewise too many uploaders only buy
+429s from Notion. ConcurrencyController watches the pipeline while it
+runs and moves each managed stage's worker limit between bounds:
+
+    shrink  by half on 429s from the stage's API (more than MAX_429_SHARE of its requests),
+            by one when host free memory or CPU crosses its threshold, or
+            by one when the last step up did not raise throughput (pages per second per worker
+            count, from observed per-page latency); that level is then not retried for a while
+    grow    by one when pages are waiting for the stage, it is not blocked on the next stage,
+            the host has memory and CPU to spare and the current level has been measured
+
+Every change, and every change of the reason for holding still, is
+printed as a [CONCURRENCY] line with the signals behind it.
+"""
+import os
+import threading
+
+from conversion_pool import available_cores
+
+DEFAULT_INTERVAL = 10.0  # Seconds between decisions
+MIN_FREE_MEMORY = 0.15  # Shrink memory-bound stages below this share of host memory available
+MAX_CPU_BUSY = 0.90  # Shrink CPU-bound stages above this share of host CPU busy
+MAX_429_SHARE = 0.01  # Halve API-bound stages above this share of requests answered 429
+MIN_GAIN = 1.05  # A step up must raise throughput by this factor to be kept
+MAX_BLOCKED_SHARE = 0.25  # Above this share of worker time blocked on the next stage, more workers can't help
+COOLDOWN_DECISIONS = 6  # Decisions before retrying a level that did not help or a 429 backoff
+
+def free_memory_share():
+    """MemAvailable / MemTotal from /proc/meminfo, or None where that is not available"""
+    try:
+        with open('/proc/meminfo') as f:
+            fields = dict(line.split(':', 1) for line in f)
+        return int(fields['MemAvailable'].split()[0]) / int(fields['MemTotal'].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def cpu_times():
+    """(busy, total) jiffies for the whole host from /proc/stat, or None"""
+    try:
+        with open('/proc/stat') as f:
+            values = [int(value) for value in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    return sum(values) - idle, sum(values)
+
+class CpuMeter:
+    """Share of host CPU busy since the previous reading (load average where /proc/stat is missing)"""
+
+    def __init__(self):
+        self._last = cpu_times()
+
+    def busy_share(self):
+        current = cpu_times()
+        if current is None or self._last is None:
+            if hasattr(os, 'getloadavg'):
+                return min(1.0, os.getloadavg()[0] / available_cores())
+            return None
+        busy, total = current[0] - self._last[0], current[1] - self._last[1]
+        self._last = current
+        return busy / total if total else None
+
+class ManagedStage:
+    """Controller bookkeeping for one Stage"""
+
+    def __init__(self, stage, minimum, maximum, memory, cpu, requests, on_resize):
+        self.stage = stage
+        self.minimum = max(1, minimum)
+        self.maximum = min(stage.workers, maximum)
+        self.memory = memory
+        self.cpu = cpu
+        self.requests = requests  # Callable -> (requests, 429s) for the API this stage calls
+        self.on_resize = on_resize
+        self.levels = {}  # limit -> [items, busy seconds] observed at that limit
+        self.last = None  # (items, busy, blocked, requests, 429s) at the previous decision
+        self.ceiling = None  # Don't grow to this limit until cooldown runs out...
+        self.ceiling_reason = None  # ...because of this
+        self.cooldown = 0
+        self.hold_reason = None
+        self.changes = 0
+        self.lowest = self.highest = stage.limit
+
+    def page_seconds(self, limit):
+        """Average busy seconds per item observed at limit, once each worker finished one"""
+        items, busy = self.levels.get(limit, (0, 0.0))
+        return busy / items if items and items >= limit else None
+
+class ConcurrencyController:
+    """Background thread re-deciding managed stages' worker limits every `interval` seconds"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, min_free_memory=MIN_FREE_MEMORY, max_cpu_busy=MAX_CPU_BUSY):
+        self.interval = interval
+        self.min_free_memory = min_free_memory
+        self.max_cpu_busy = max_cpu_busy
+        self.managed = []
+        self.cpu_meter = CpuMeter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def manage(self, stage, minimum, maximum, memory=False, cpu=False, requests=None, on_resize=None):
+        """Adapt stage.limit within minimum..maximum.
+
+        memory / cpu: shrink it under host memory / CPU pressure (browsers).
+        requests: callable returning (requests, 429s) so far for the API it calls.
+        on_resize: called with the new limit after every change.
+        """
+        self.managed.append(ManagedStage(stage, minimum, maximum, memory, cpu, requests, on_resize))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='concurrency-controller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            free_memory = free_memory_share()
+            cpu_busy = self.cpu_meter.busy_share()
+            for managed in self.managed:
+                if managed.stage.finished is None:
+                    self.decide(managed, free_memory, cpu_busy)
+
+    def decide(self, managed, free_memory, cpu_busy):
+        """One decision for one stage; returns its (possibly unchanged) limit"""
+        stage = managed.stage
+        stats = stage.stats()
+        requests, limited = managed.requests() if managed.requests else (0, 0)
+        current = (stats['items'], stats['busy_seconds'], stats['blocked_seconds'], requests, limited)
+        last = managed.last or current
+        managed.last = current
+        items, busy, blocked, requests, limited = (now - before for now, before in zip(current, last))
+        limit = stage.limit
+        level = managed.levels.setdefault(limit, [0, 0.0])
+        level[0] += items
+        level[1] += busy
+        if managed.cooldown:
+            managed.cooldown -= 1
+            if not managed.cooldown:
+                managed.ceiling = None
+
+        seconds = managed.page_seconds(limit)
+        below = managed.page_seconds(limit - 1)
+        signals = [f"queue {stage.depth()}/{stage.queue_size}"]
+        if free_memory is not None and managed.memory:
+            signals.append(f"{free_memory * 100:.0f}% memory free")
+        if cpu_busy is not None and managed.cpu:
+            signals.append(f"CPU {cpu_busy * 100:.0f}%")
+        if managed.requests:
+            signals.append(f"{limited}/{requests} requests 429")
+        if seconds is not None:
+            signals.append(f"{seconds:.2f}s/page")
+
+        target, reason = limit, None
+        if managed.requests and requests and limited / requests > MAX_429_SHARE:
+            target, reason = limit // 2, "rate limited"
+            managed.ceiling, managed.cooldown = max(1, limit // 2) + 1, COOLDOWN_DECISIONS
+            managed.ceiling_reason = "backing off after 429s"
+        elif managed.memory and free_memory is not None and free_memory < self.min_free_memory:
+            target, reason = limit - 1, f"memory below {self.min_free_memory * 100:.0f}% free"
+        elif managed.cpu and cpu_busy is not None and cpu_busy > self.max_cpu_busy:
+            target, reason = limit - 1, f"CPU above {self.max_cpu_busy * 100:.0f}%"
+        elif seconds is not None and below is not None and (limit / seconds) < MIN_GAIN * ((limit - 1) / below):
+            # Throughput is workers / seconds per page: the last step up did not pay for itself
+            target, reason = limit - 1, f"{limit} workers no faster than {limit - 1} ({below:.2f}s/page there)"
+            managed.ceiling, managed.cooldown = limit, COOLDOWN_DECISIONS
+            managed.ceiling_reason = f"{limit} workers did not help"
+        else:
+            hold = self.hold_reason(managed, blocked, free_memory, cpu_busy, seconds)
+            if hold is None:
+                target, reason = limit + 1, "work waiting and resources to spare"
+            elif hold != managed.hold_reason:
+                print(f"[CONCURRENCY] {stage.name} holding at {limit}: {hold} ({', '.join(signals)})")
+            managed.hold_reason = hold
+
+        target = min(managed.maximum, max(managed.minimum, target))
+        if target == limit:
+            return limit
+        managed.hold_reason = None
+        managed.levels[target] = [0, 0.0]  # Measure the new level afresh
+        stage.set_limit(target)
+        managed.changes += 1
+        managed.lowest, managed.highest = min(managed.lowest, target), max(managed.highest, target)
+        print(f"[CONCURRENCY] {stage.name} {limit} -> {target}: {reason} ({', '.join(signals)})")
+        if managed.on_resize is not None:
+            managed.on_resize(target)
+        return target
+
+    def hold_reason(self, managed, blocked, free_memory, cpu_busy, seconds):
+        """Why the stage should not grow now, or None if it should"""
+        stage = managed.stage
+        if stage.limit >= managed.maximum:
+            return "at the maximum"
+        if managed.ceiling is not None and stage.limit + 1 >= managed.ceiling:
+            return f"{managed.ceiling_reason}, retrying in {managed.cooldown} decision(s)"
+        if not stage.depth():
+            return "no work waiting"
+        if blocked > MAX_BLOCKED_SHARE * stage.limit * self.interval:
+            return "blocked on the next stage"
+        if managed.memory and free_memory is not None and free_memory < 1.5 * self.min_free_memory:
+            return "not enough memory to spare"
+        if managed.cpu and cpu_busy is not None and cpu_busy > 0.8 * self.max_cpu_busy:
+            return "not enough CPU to spare"
+        if seconds is None:
+            items = managed.levels[stage.limit][0]
+            return f"measuring ({items}/{stage.limit} pages at this level)"
+        return None
+
+    def print_stats(self):
+        for managed in self.managed:
+            print(f"[CONCURRENCY] {managed.stage.name}: {managed.changes} change(s), limit ranged "
+                  f"{managed.lowest}-{managed.highest} (bounds {managed.minimum}-{managed.maximum}), "
+                  f"ended at {managed.stage.limit}")
@@ -0,0 +1,105 @@
+"""
+Process pool for the CPU-bound part of the migration.
+
+Parsing canvas HTML with BeautifulSoup, restructuring its lists,
+converting it to Notion blocks and hashing them is pure Python, so
+threads doing it take turns on the GIL. ConversionPool runs that work in
+worker processes instead: raw HTML goes in, blocks and their hash tree
+come out, and throughput grows with the number of cores.
+
+The conversion code lives in coda-download.py, which is not importable
+by name (the file name has a hyphen), so each worker loads it from its
+path once, when it starts. Workers are spawned rather than forked: the
+migration already runs threads (pipeline stages, the Notion event loop)
+when the pool starts, and forking a threaded process can copy held locks.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+import tracing
+
+CODA_DOWNLOAD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'coda-download.py')
+
+_converter = None  # coda-download, loaded once per worker process
+
+def available_cores():
+    """CPUs this process may run on (honours affinity masks and container CPU sets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _init_worker(parser):
+    global _converter
+    # Workers never call the APIs, but coda-download refuses to load without tokens
+    os.environ.setdefault('CODA_API_TOKEN', 'conversion-worker')
+    os.environ.setdefault('NOTION_API_TOKEN', 'conversion-worker')
+    module = sys.modules.get('coda_download')
+    main = sys.modules.get('__mp_main__')
+    if module is None and os.path.abspath(getattr(main, '__file__', '')) == CODA_DOWNLOAD_PATH:
+        module = main  # Spawned from coda-download.py itself, which is already loaded as the main module
+    if module is None:
+        spec = importlib.util.spec_from_file_location('coda_download', CODA_DOWNLOAD_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules['coda_download'] = module
+    if parser:
+        module.set_html_parser(parser)
+    _converter = module
+
+def convert_html(html, call_date=None, verbose=False):
+    """Raw canvas/export HTML -> {html, text, blocks, block_hashes, content_hash, seconds, spans}.
+
+    html and text are taken before the call date banner is added, as the
+    migration saves them; blocks and hashes include the banner. text is
+    empty when the page has no content. spans are the tracing spans of
+    the conversion steps, for the caller to tracing.replay() under its page.
+    """
+    start = time.perf_counter()
+    with tracing.collect() as spans:
+        pipeline = _converter.HtmlPipeline(html, verbose=verbose).cleanup().restructure_lists()
+        result = {'html': pipeline.html, 'text': pipeline.text, 'blocks': None, 'block_hashes': None,
+                  'content_hash': None}
+        if pipeline.text:
+            pipeline.add_call_date(call_date)
+            result['blocks'] = pipeline.to_blocks()
+            result['block_hashes'] = pipeline.block_hashes()
+            result['content_hash'] = pipeline.content_hash()
+    result['seconds'] = time.perf_counter() - start
+    result['spans'] = spans
+    return result
+
+class ConversionPool:
+    """ProcessPoolExecutor running convert_html, one worker process per core by default"""
+
+    def __init__(self, processes=None, parser=None):
+        self.processes = processes or available_cores()
+        self.executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                            initargs=(parser,), mp_context=multiprocessing.get_context('spawn'))
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.worker_seconds = 0.0
+
+    def submit(self, html, call_date=None, verbose=False):
+        """Schedule one page; returns a concurrent.futures.Future of the convert_html result"""
+        return self.executor.submit(convert_html, html, call_date, verbose)
+
+    def convert(self, html, call_date=None, verbose=False):
+        """convert_html in a worker process, waiting for the result"""
+        result = self.submit(html, call_date, verbose).result()
+        with self._lock:
+            self.pages += 1
+            self.worker_seconds += result['seconds']
+        return result
+
+    def print_stats(self):
+        if self.pages:
+            print(f"[TIMING] Conversion pool: {self.pages} page(s) in {self.processes} process(es), "
+                  f"{self.worker_seconds:.2f}s of conversion ({self.worker_seconds / self.pages:.2f}s avg)")
+
+    def close(self):
+        self.executor.shutdown()
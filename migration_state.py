@@ -0,0 +1,99 @@
+"""
+Local migration state, keyed by Coda page id.
+
+One SQLite row per migrated Coda page records the Notion page it became,
+the fingerprint of the content last uploaded (the root of its block hash
+tree, which is kept alongside as JSON), the Coda updatedAt seen at that
+time and when it happened. The migration and verification scripts
+consult it before matching pages by title or reading anything from Notion.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_STATE_PATH = os.getenv('MIGRATION_STATE_DB', 'migration_state.db')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pages (
+    coda_page_id TEXT PRIMARY KEY,
+    coda_name TEXT,
+    notion_page_id TEXT,
+    content_hash TEXT,
+    coda_updated_at TEXT,
+    first_migrated_at TEXT,
+    last_migrated_at TEXT,
+    block_hashes TEXT
+)
+'''
+
+# Everything but block_hashes, which can run to hundreds of KB for long pages
+ROW_COLUMNS = ('coda_page_id, coda_name, notion_page_id, content_hash, coda_updated_at, '
+               'first_migrated_at, last_migrated_at')
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+class MigrationState:
+    """Thread-safe SQLite store of per-page migration results"""
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(pages)')}
+            if 'block_hashes' not in columns:
+                self._conn.execute('ALTER TABLE pages ADD COLUMN block_hashes TEXT')
+
+    def get(self, coda_page_id):
+        """Row for a Coda page as a dict, or None if it was never migrated"""
+        with self._lock:
+            row = self._conn.execute(f'SELECT {ROW_COLUMNS} FROM pages WHERE coda_page_id = ?',
+                                     (coda_page_id,)).fetchone()
+        return dict(row) if row else None
+
+    def all(self):
+        """All rows as {coda_page_id: row dict}"""
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {ROW_COLUMNS} FROM pages').fetchall()
+        return {row['coda_page_id']: dict(row) for row in rows}
+
+    def block_hashes(self, coda_page_id):
+        """The notion_blocks.hash_tree recorded with the last upload, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT block_hashes FROM pages WHERE coda_page_id = ?',
+                                     (coda_page_id,)).fetchone()
+        return json.loads(row['block_hashes']) if row and row['block_hashes'] else None
+
+    def record_migration(self, coda_page_id, coda_name, notion_page_id, content_hash, coda_updated_at=None,
+                         block_hashes=None):
+        """Store the result of a successful upload (or of confirming an existing page)"""
+        now = utc_now()
+        tree = json.dumps(block_hashes, separators=(',', ':')) if block_hashes is not None else None
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO pages (coda_page_id, coda_name, notion_page_id, content_hash, coda_updated_at,
+                                   first_migrated_at, last_migrated_at, block_hashes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(coda_page_id) DO UPDATE SET
+                    coda_name = excluded.coda_name,
+                    notion_page_id = excluded.notion_page_id,
+                    content_hash = excluded.content_hash,
+                    coda_updated_at = excluded.coda_updated_at,
+                    last_migrated_at = excluded.last_migrated_at,
+                    block_hashes = excluded.block_hashes
+            ''', (coda_page_id, coda_name, notion_page_id, content_hash, coda_updated_at, now, now, tree))
+
+    def forget(self, coda_page_id):
+        """Drop a page's row, e.g. after its Notion page was archived by hand"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM pages WHERE coda_page_id = ?', (coda_page_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,8 +5,8 @@ Monitor the Sales Notes migration progress
 import os
 import time
 import sys
-import requests
 import importlib.util
+from api_clients import coda_client, notion_client
 
 # Import from coda-download
 spec = importlib.util.spec_from_file_location("coda_download", "coda-download.py")
@@ -27,10 +27,13 @@ if os.path.exists('.env'):
 CODA_DOC_ID = '0eJEEjA-GU'
 NOTION_PARENT_PAGE_ID = '2c3636dd-0ba5-807e-b374-c07a0134e636'
 
+# Kept alive across polls, so each refresh reuses the same connections
+coda_api = coda_client(coda_token)
+notion_api = notion_client(notion_token)
+
 def get_coda_sales_notes_pages():
     """Get all pages in Sales Notes section (Protego to ARKN)"""
-    headers = {'Authorization': f'Bearer {coda_token}'}
-    base_url = f'https://coda.io/apis/v1/docs/{CODA_DOC_ID}/pages'
+    base_url = f'/docs/{CODA_DOC_ID}/pages'
     
     all_pages = []
     next_token = None
@@ -40,7 +43,7 @@ def get_coda_sales_notes_pages():
         if next_token:
             params['pageToken'] = next_token
         
-        resp = requests.get(base_url, headers=headers, params=params, timeout=10)
+        resp = coda_api.get(base_url, params=params, timeout=10)
         if resp.status_code != 200:
             break
         
@@ -69,32 +72,24 @@ def get_coda_sales_notes_pages():
 
 def get_notion_pages():
     """Get all Notion pages"""
-    notion_headers = {
-        'Authorization': f'Bearer {notion_token}',
-        'Notion-Version': '2022-06-28'
-    }
-    
     notion_pages = {}
-    notion_url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children'
+    notion_url = f'/blocks/{NOTION_PARENT_PAGE_ID}/children'
+    params = {'page_size': 100}
     
     while notion_url:
-        resp = requests.get(notion_url, headers=notion_headers, timeout=10)
+        resp = notion_api.get(notion_url, params=params, timeout=10)
         if resp.status_code == 200:
             data = resp.json()
             for result in data.get('results', []):
                 if result.get('type') == 'child_page':
-                    page_id = result.get('id')
-                    page_url = f'https://api.notion.com/v1/pages/{page_id}'
-                    page_resp = requests.get(page_url, headers=notion_headers, timeout=10)
-                    if page_resp.ok:
-                        page_data = page_resp.json()
-                        page_title_prop = page_data.get('properties', {}).get('title', {})
-                        if page_title_prop.get('title'):
-                            page_title = page_title_prop['title'][0].get('plain_text', '')
-                            notion_pages[coda_download.normalize(page_title)] = page_title
+                    # The listing already carries the title; no per-page request needed
+                    page_title = result.get('child_page', {}).get('title', '')
+                    if page_title:
+                        notion_pages[coda_download.normalize(page_title)] = page_title
             
             next_cursor = data.get('next_cursor')
-            notion_url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children?start_cursor={next_cursor}' if next_cursor else None
+            params['start_cursor'] = next_cursor
+            notion_url = notion_url if next_cursor else None
         else:
             break
     
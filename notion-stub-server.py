@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Notion endpoints the migration writes to.
+
+Keeps pages and their child blocks in memory and serves:
+
+    POST   /v1/pages                    create a page with its first children
+    PATCH  /v1/pages/<id>               archive a page
+    PATCH  /v1/blocks/<id>/children     append children (at the end or `after` a child)
+    GET    /v1/blocks/<id>/children     list children (page_size / start_cursor)
+    PATCH  /v1/blocks/<id>              update a block's content
+    DELETE /v1/blocks/<id>              delete a block
+
+--latency adds a fixed delay to every response, like a round trip to the
+real API, and --rate-limit answers 429 with Retry-After once requests
+average more than that many per second (short bursts are allowed), so
+clients' throttling can be exercised.
+
+Usage:
+    python3 notion-stub-server.py --port 8766 --latency 0.15 --rate-limit 3
+    NOTION_API_BASE=http://127.0.0.1:8766/v1 python3 coda-download.py ...
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANNOTATIONS = {'bold': False, 'italic': False, 'underline': False, 'strikethrough': False,
+                       'code': False, 'color': 'default'}
+
+def stored_rich_text(rich_text):
+    """Rich text the way Notion returns it: full annotations, plain_text and href filled in"""
+    stored = []
+    for item in rich_text:
+        content = item.get('text', {}).get('content', '')
+        link = item.get('text', {}).get('link')
+        stored.append({
+            'type': 'text',
+            'text': {'content': content, 'link': link},
+            'annotations': dict(DEFAULT_ANNOTATIONS, **item.get('annotations', {})),
+            'plain_text': content,
+            'href': link.get('url') if link else None,
+        })
+    return stored
+
+class StubNotion:
+    """In-memory pages and blocks plus request counters"""
+
+    def __init__(self, latency=0.0, rate_limit=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.children = {}  # block/page id -> [child block dicts]
+        self.titles = {}  # page id -> title
+        self.archived = set()
+        self.requests = 0
+        self.throttled = 0
+        # Notion limits the average rate and allows short bursts: a token bucket of rate_limit/s
+        self._tokens = rate_limit or 0
+        self._updated = time.monotonic()
+
+    def admit(self):
+        """False if this request is over the rate limit"""
+        with self.lock:
+            self.requests += 1
+            if not self.rate_limit:
+                return True
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit)
+            self._updated = now
+            if self._tokens < 1:
+                self.throttled += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def retry_after(self):
+        with self.lock:
+            return max(0.0, (1 - self._tokens) / self.rate_limit)
+
+    def add_children(self, parent_id, blocks, after=None):
+        """Store blocks (and their nested children) under a parent; returns the stored top-level blocks"""
+        added = []
+        with self.lock:
+            siblings = self.children.setdefault(parent_id, [])
+            position = len(siblings)
+            if after is not None:
+                position = next(index + 1 for index, block in enumerate(siblings) if block['id'] == after)
+            for block in blocks:
+                block_type = block.get('type')
+                body = dict(block.get(block_type, {}))
+                nested = body.pop('children', [])
+                if 'rich_text' in body:
+                    body['rich_text'] = stored_rich_text(body['rich_text'])
+                stored = dict(block, id=str(uuid.uuid4()), object='block', has_children=bool(nested))
+                stored[block_type] = body
+                siblings.insert(position, stored)
+                position += 1
+                added.append((stored, nested))
+        for stored, nested in added:
+            if nested:
+                self.add_children(stored['id'], nested)
+        return [stored for stored, _ in added]
+
+    def find_block(self, block_id):
+        for parent_id, blocks in self.children.items():
+            for index, block in enumerate(blocks):
+                if block['id'] == block_id:
+                    return parent_id, index
+        return None, None
+
+    def update_block(self, block_id, body):
+        with self.lock:
+            parent_id, index = self.find_block(block_id)
+            if parent_id is None:
+                return None
+            block = self.children[parent_id][index]
+            update = dict(body.get(block['type'], {}))
+            if 'rich_text' in update:
+                update['rich_text'] = stored_rich_text(update['rich_text'])
+            block[block['type']] = dict(block[block['type']], **update)
+            return block
+
+    def delete_block(self, block_id):
+        with self.lock:
+            parent_id, index = self.find_block(block_id)
+            if parent_id is None:
+                return None
+            return self.children[parent_id].pop(index)
+
+    def tree(self, block_id):
+        """Nested (type, text) view of a page, for checking results"""
+        with self.lock:
+            blocks = list(self.children.get(block_id, []))
+        return [(block['type'],
+                 ''.join(part.get('text', {}).get('content', '')
+                         for part in block.get(block['type'], {}).get('rich_text', [])),
+                 self.tree(block['id']))
+                for block in blocks]
+
+    def create_page(self, body):
+        page_id = str(uuid.uuid4())
+        title = ''.join(part.get('text', {}).get('content', '')
+                        for part in body.get('properties', {}).get('title', {}).get('title', []))
+        with self.lock:
+            self.titles[page_id] = title
+            self.children[page_id] = []
+            parent_id = body.get('parent', {}).get('page_id')
+            if parent_id:
+                self.children.setdefault(parent_id, []).append({
+                    'object': 'block', 'id': page_id, 'type': 'child_page', 'child_page': {'title': title}})
+        self.add_children(page_id, body.get('children', []))
+        return {'object': 'page', 'id': page_id}
+
+    def list_children(self, block_id, page_size, start_cursor):
+        with self.lock:
+            blocks = [block for block in self.children.get(block_id, []) if block['id'] not in self.archived]
+        start = int(start_cursor or 0)
+        end = start + page_size
+        return {'object': 'list', 'results': blocks[start:end], 'has_more': end < len(blocks),
+                'next_cursor': str(end) if end < len(blocks) else None}
+
+    def block_count(self, page_id):
+        with self.lock:
+            return len(self.children.get(page_id, []))
+
+def make_handler(notion, verbose=False):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+        def send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def handle_request(self, method):
+            body = self.read_json() if method != 'GET' else None
+            if notion.latency:
+                time.sleep(notion.latency)
+            if not notion.admit():
+                return self.send_json(429, {'object': 'error', 'code': 'rate_limited'},
+                                      {'Retry-After': f'{notion.retry_after():.2f}'})
+            path, _, query = self.path.partition('?')
+            params = dict(part.split('=', 1) for part in query.split('&') if '=' in part)
+            if method == 'POST' and path == '/v1/pages':
+                return self.send_json(200, notion.create_page(body))
+            match = re.fullmatch(r'/v1/pages/([^/]+)', path)
+            if method == 'PATCH' and match:
+                if body.get('archived'):
+                    with notion.lock:
+                        notion.archived.add(match.group(1))
+                return self.send_json(200, {'object': 'page', 'id': match.group(1), 'archived': True})
+            match = re.fullmatch(r'/v1/blocks/([^/]+)/children', path)
+            if method == 'PATCH' and match:
+                added = notion.add_children(match.group(1), body.get('children', []), body.get('after'))
+                return self.send_json(200, {'object': 'list', 'results': added})
+            if method == 'GET' and match:
+                return self.send_json(200, notion.list_children(
+                    match.group(1), min(int(params.get('page_size', 100)), 100), params.get('start_cursor')))
+            match = re.fullmatch(r'/v1/blocks/([^/]+)', path)
+            if match and method in ('PATCH', 'DELETE'):
+                block = (notion.update_block(match.group(1), body) if method == 'PATCH'
+                         else notion.delete_block(match.group(1)))
+                if block is not None:
+                    return self.send_json(200, block)
+            self.send_json(404, {'object': 'error', 'code': 'object_not_found', 'message': self.path})
+
+        def do_GET(self):
+            self.handle_request('GET')
+
+        def do_POST(self):
+            self.handle_request('POST')
+
+        def do_PATCH(self):
+            self.handle_request('PATCH')
+
+        def do_DELETE(self):
+            self.handle_request('DELETE')
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+def start_server(port=0, latency=0.0, rate_limit=None):
+    """Serve a fresh StubNotion on a background thread; returns (server, notion, base_url)"""
+    notion = StubNotion(latency, rate_limit)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(notion))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, notion, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve an in-memory stand-in for the Notion API')
+    parser.add_argument('--port', type=int, default=8766, help='Port to listen on (default: 8766)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response (default: 0)')
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help='Answer 429 above this many requests per second (default: no limit)')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    notion = StubNotion(args.latency, args.rate_limit)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(notion, args.verbose))
+    print(f"🔗 NOTION_API_BASE=http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {notion.requests} request(s), {notion.throttled} answered 429, "
+              f"{len(notion.titles)} page(s) created, {len(notion.archived)} archived")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Asyncio Notion writer.
+
+AsyncNotionClient is the awaitable API: page creation (first 100 blocks,
+then appends of 100, resumable after an interruption), block appends and inserts, block updates and
+deletes, archiving, paginated listing of children or whole block trees,
+and hash-tree comparisons and diffs that read a page one level at a time
+and stop wherever subtrees match, over one aiohttp session. It takes tokens from the same
+process-wide bucket as the requests-based clients and retries 429s (and
+5xx responses to reads) the same way, so any number of pages can be in flight while the
+integration stays under Notion's rate limit.
+
+NotionUploader runs one client on a background event loop so threaded
+code (the migration workers) can share it: blocking calls wait for a
+result, submit() returns a concurrent.futures.Future.
+"""
+import asyncio
+import threading
+import time
+from json import loads as parse_json
+
+import aiohttp
+
+from api_clients import (NOTION_API_BASE, NOTION_VERSION, DEFAULT_TIMEOUT, MAX_RETRIES, RequestStats,
+                         backoff_seconds, endpoint_key, notion_rate_limiter, retry_delay, should_retry)
+from notion_blocks import BlockDiff, block_children, diff_level, hash_tree, own_fingerprint
+
+DEFAULT_IN_FLIGHT = 20  # Concurrent Notion requests per client; the rate limit still applies
+BLOCKS_PER_REQUEST = 100  # Notion's cap on children per create/append request
+
+def page_chunks(blocks):
+    """Requests a page upload takes: the create carries the first chunk, each append one more"""
+    return max(1, -(-len(blocks) // BLOCKS_PER_REQUEST))
+
+def listing_requests(blocks):
+    """Requests list_children made to return these blocks"""
+    return max(1, -(-len(blocks) // BLOCKS_PER_REQUEST))
+
+class NotionApiError(Exception):
+    """A Notion request that still failed after retries.
+
+    status is None when no response arrived (connection error or timeout);
+    body then describes the error.
+    """
+
+    def __init__(self, method, path, status, body):
+        reason = f"with {status}" if status is not None else "without a response"
+        super().__init__(f"{method} {path} failed {reason}: {body[:500]}")
+        self.status = status
+        self.body = body
+
+class AsyncNotionClient(RequestStats):
+    """Awaitable Notion API over one aiohttp session; use as `async with AsyncNotionClient(token) as notion`"""
+
+    def __init__(self, token, base_url=NOTION_API_BASE, max_in_flight=DEFAULT_IN_FLIGHT,
+                 rate_limiter=notion_rate_limiter, max_retries=MAX_RETRIES, timeout=DEFAULT_TIMEOUT):
+        super().__init__('Notion (async)', rate_limiter)
+        self.base_url = base_url.rstrip('/')
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        connect, read = timeout
+        self.timeout = aiohttp.ClientTimeout(connect=connect, sock_read=read)
+        self.headers = {
+            'Authorization': f'Bearer {token}',
+            'Notion-Version': NOTION_VERSION,
+            'Content-Type': 'application/json',
+        }
+        self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+            self.session = aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def describe_connections(self):
+        return f' over up to {self.max_in_flight} concurrent connection(s)'
+
+    async def request(self, method, path, json=None, params=None):
+        """JSON body of a successful response; raises NotionApiError once retries are exhausted.
+
+        Connection errors and timeouts are raised as NotionApiError too
+        (status None), so callers have one exception to handle.
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        key = endpoint_key(method, url)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self._throttled(await self.rate_limiter.acquire_async())
+            start = time.perf_counter()
+            try:
+                async with self.session.request(method, url, json=json, params=params) as response:
+                    body = await response.text()
+                    status, headers = response.status, response.headers
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self._record(key, time.perf_counter() - start, None)
+                # Only GETs are safe to resend when we can't tell whether the server acted
+                if method != 'GET' or attempt >= self.max_retries:
+                    raise NotionApiError(method, path, None, f"{type(e).__name__}: {e}") from e
+                status, delay = None, backoff_seconds(attempt)
+            else:
+                self._record(key, time.perf_counter() - start, status)
+                if status < 400:
+                    return parse_json(body) if body else {}
+                # A write answered 5xx may have been applied: resending could duplicate a page or chunk
+                if not should_retry(method, status) or attempt >= self.max_retries:
+                    raise NotionApiError(method, path, status, body)
+                delay = retry_delay(headers, attempt)
+            self._retrying(status, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def create_page(self, parent_page_id, title, blocks, progress=None):
+        """Create a child page with all blocks (appended 100 at a time); returns the new page id.
+
+        progress(page_id, chunks_sent, chunks_total, seconds) is called
+        after the create and after every append, e.g. to checkpoint the
+        upload; seconds is how long that request took, retries included.
+        """
+        payload = {
+            "parent": {"page_id": parent_page_id},
+            "properties": {
+                "title": {"title": [{"type": "text", "text": {"content": title}}]}
+            },
+            "children": blocks[:BLOCKS_PER_REQUEST]
+        }
+        start = time.perf_counter()
+        page_id = (await self.request('POST', '/pages', json=payload))['id']
+        if progress is not None:
+            progress(page_id, 1, page_chunks(blocks), time.perf_counter() - start)
+        await self.append_from(page_id, blocks, BLOCKS_PER_REQUEST, progress)
+        return page_id
+
+    async def append_from(self, page_id, blocks, start, progress=None):
+        """Append a page's blocks from index `start` on (a chunk boundary), reporting progress like create_page"""
+        for offset in range(start, len(blocks), BLOCKS_PER_REQUEST):
+            sent = time.perf_counter()
+            await self.request('PATCH', f'/blocks/{page_id}/children',
+                               json={"children": blocks[offset:offset + BLOCKS_PER_REQUEST]})
+            if progress is not None:
+                progress(page_id, offset // BLOCKS_PER_REQUEST + 1, page_chunks(blocks), time.perf_counter() - sent)
+
+    async def resume_page(self, page_id, blocks, progress=None):
+        """Finish uploading a page that create_page left part way; returns the blocks appended, or None.
+
+        The live page decides where to continue, not the caller's record
+        of it: an append that went through just before a crash is not
+        sent twice. None means the page's top-level blocks are not a
+        chunk-aligned prefix of `blocks`, so it can't be resumed.
+        """
+        existing = await self.list_children(page_id)
+        count = len(existing)
+        if count > len(blocks) or (count % BLOCKS_PER_REQUEST and count != len(blocks)):
+            return None
+        if any(own_fingerprint(old) != own_fingerprint(new) for old, new in zip(existing, blocks)):
+            return None
+        await self.append_from(page_id, blocks, count, progress)
+        return len(blocks) - count
+
+    async def append_blocks(self, block_id, blocks):
+        """Append children in order; chunks of one page go one after another"""
+        for start in range(0, len(blocks), BLOCKS_PER_REQUEST):
+            await self.request('PATCH', f'/blocks/{block_id}/children',
+                               json={"children": blocks[start:start + BLOCKS_PER_REQUEST]})
+
+    async def insert_blocks(self, parent_id, blocks, after=None):
+        """Insert children after the `after` child (at the end if None), keeping their order"""
+        for start in range(0, len(blocks), BLOCKS_PER_REQUEST):
+            payload = {"children": blocks[start:start + BLOCKS_PER_REQUEST]}
+            if after is not None:
+                payload["after"] = after
+            results = (await self.request('PATCH', f'/blocks/{parent_id}/children', json=payload)).get('results', [])
+            if after is not None and results:
+                after = results[-1]['id']
+
+    async def update_block(self, block_id, block):
+        """Replace a block's own content (same type); its children are left alone"""
+        await self.request('PATCH', f'/blocks/{block_id}', json={block['type']: block[block['type']]})
+
+    async def delete_block(self, block_id):
+        await self.request('DELETE', f'/blocks/{block_id}')
+
+    async def archive_page(self, page_id):
+        await self.request('PATCH', f'/pages/{page_id}', json={"archived": True})
+
+    async def list_children(self, block_id, max_blocks=None):
+        """Child blocks of a page or block, following pagination (up to max_blocks)"""
+        results = []
+        params = {'page_size': BLOCKS_PER_REQUEST}
+        while max_blocks is None or len(results) < max_blocks:
+            data = await self.request('GET', f'/blocks/{block_id}/children', params=params)
+            results.extend(data.get('results', []))
+            if not data.get('has_more') or not data.get('next_cursor'):
+                break
+            params['start_cursor'] = data['next_cursor']
+        return results if max_blocks is None else results[:max_blocks]
+
+    async def list_block_tree(self, block_id):
+        """All children with their descendants under a 'children' key; returns (blocks, requests made)"""
+        blocks = await self.list_children(block_id)
+        requests_made = listing_requests(blocks)
+        parents = [block for block in blocks if block.get('has_children') and block.get('type') != 'child_page']
+        subtrees = await asyncio.gather(*(self.list_block_tree(block['id']) for block in parents))
+        for block, (children, child_requests) in zip(parents, subtrees):
+            block['children'] = children
+            requests_made += child_requests
+        return blocks, requests_made
+
+    async def compare_page(self, page_id, nodes):
+        """Whether the live page matches a notion_blocks.hash_tree; returns (equal, requests made).
+
+        Reads the page one nesting level at a time and stops at the first
+        level that differs, so a changed page usually costs one listing.
+        """
+        level = [(page_id, nodes)]
+        requests_made = 0
+        while level:
+            listings = await asyncio.gather(*(self.list_children(block_id) for block_id, _ in level))
+            requests_made += sum(listing_requests(blocks) for blocks in listings)
+            next_level = []
+            for (_, expected), blocks in zip(level, listings):
+                if [own_fingerprint(block) for block in blocks] != [node[0] for node in expected]:
+                    return False, requests_made
+                for block, node in zip(blocks, expected):
+                    if bool(block.get('has_children')) != bool(node[2]):
+                        return False, requests_made
+                    if node[2]:
+                        next_level.append((block['id'], node[2]))
+            level = next_level
+        return True, requests_made
+
+    async def diff_page(self, page_id, blocks, known=None, nodes=None):
+        """notion_blocks.BlockDiff from the live page to `blocks`; returns (diff, requests made).
+
+        Children are listed level by level and only below kept blocks whose
+        subtree may differ: deleted blocks are never read, and with `known`
+        (the hash_tree recorded at the last upload) neither are subtrees
+        whose recorded hash equals the new one.
+        """
+        diff = BlockDiff()
+        requests_made = 0
+        # (parent id, its existing children or None if not read yet, new children, their nodes, recorded nodes)
+        level = [(page_id, None, blocks, nodes or hash_tree(blocks), known)]
+        while level:
+            unread = [entry[0] for entry in level if entry[1] is None]
+            listings = dict(zip(unread, await asyncio.gather(*(self.list_children(parent_id)
+                                                               for parent_id in unread))))
+            requests_made += sum(listing_requests(children) for children in listings.values())
+            next_level = []
+            for parent_id, existing, new, new_nodes, recorded in level:
+                if existing is None:
+                    existing = listings[parent_id]
+                for old_block, new_block, old_known, child_nodes in diff_level(parent_id, existing, new,
+                                                                               new_nodes, diff, recorded):
+                    # A block without children has nothing to read
+                    loaded = 'children' in old_block or not old_block.get('has_children')
+                    next_level.append((old_block['id'], block_children(old_block) if loaded else None,
+                                       block_children(new_block), child_nodes, old_known))
+            level = next_level
+        return diff, requests_made
+
+    async def apply_diff(self, diff):
+        """Apply a notion_blocks.BlockDiff: updates and deletes concurrently, then the inserts"""
+        await asyncio.gather(*[self.update_block(block_id, block) for block_id, block in diff.updates],
+                             *[self.delete_block(block_id) for block_id in diff.deletes])
+        # Each insert anchors on a kept block, so separate groups don't depend on each other
+        await asyncio.gather(*(self.insert_blocks(parent_id, blocks, after)
+                               for parent_id, after, blocks in diff.inserts))
+
+class NotionUploader:
+    """An AsyncNotionClient on a background event loop, callable from any thread"""
+
+    def __init__(self, token, **client_kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='notion-uploader', daemon=True)
+        self._thread.start()
+        self.client = AsyncNotionClient(token, **client_kwargs)
+        self.run(self.client.open())
+
+    def submit(self, coroutine):
+        """Schedule a client coroutine; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def run(self, coroutine):
+        """Run a client coroutine and wait for its result"""
+        return self.submit(coroutine).result()
+
+    def create_page(self, parent_page_id, title, blocks, progress=None):
+        return self.run(self.client.create_page(parent_page_id, title, blocks, progress))
+
+    def resume_page(self, page_id, blocks, progress=None):
+        return self.run(self.client.resume_page(page_id, blocks, progress))
+
+    def archive_page(self, page_id):
+        return self.run(self.client.archive_page(page_id))
+
+    def list_children(self, block_id, max_blocks=None):
+        return self.run(self.client.list_children(block_id, max_blocks))
+
+    def list_block_tree(self, block_id):
+        return self.run(self.client.list_block_tree(block_id))
+
+    def compare_page(self, page_id, nodes):
+        return self.run(self.client.compare_page(page_id, nodes))
+
+    def diff_page(self, page_id, blocks, known=None, nodes=None):
+        return self.run(self.client.diff_page(page_id, blocks, known, nodes))
+
+    def apply_diff(self, diff):
+        return self.run(self.client.apply_diff(diff))
+
+    def print_stats(self):
+        self.client.print_stats()
+
+    def close(self):
+        self.run(self.client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
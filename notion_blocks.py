@@ -0,0 +1,226 @@
+"""
+Notion block model helpers: canonical block content, fingerprints, the
+per-block hash tree and block-level diffs.
+
+page_fingerprint() is the one content fingerprint used for change
+detection. It is defined over blocks rather than HTML, so the value
+computed from freshly converted blocks before upload equals the value
+computed from the same page fetched back from Notion.
+
+hash_tree() is the Merkle tree behind it: every block gets its own hash
+and a subtree hash covering its descendants, and page_fingerprint() is
+the root. Two subtrees with equal hashes are equal, so comparisons stop
+there instead of reading further down.
+
+Blocks come in two shapes. Converted blocks (html_to_notion_blocks,
+lines_to_notion_blocks) carry nested children under block[type]['children'].
+Blocks fetched from Notion carry an 'id', 'has_children' and, once
+AsyncNotionClient.list_block_tree has filled them in, a top-level
+'children' list. Everything here accepts both.
+"""
+import hashlib
+import json
+from difflib import SequenceMatcher
+
+ANNOTATION_FLAGS = ('bold', 'italic', 'underline', 'strikethrough', 'code')
+
+def block_children(block):
+    """Child blocks of a converted or fetched block"""
+    if 'children' in block:
+        return block['children']
+    return block.get(block.get('type'), {}).get('children', [])
+
+def canonical_rich_text(rich_text):
+    """[(text, flags, color, link)] with adjacent runs of identical formatting merged.
+
+    Notion splits and joins runs on its own, so only the formatting of
+    each character counts, not where one run ends and the next begins.
+    """
+    runs = []
+    for item in rich_text:
+        if item.get('type', 'text') == 'text':
+            text = item.get('text', {}).get('content', '')
+            link = (item.get('text', {}).get('link') or {}).get('url')
+        else:
+            text = item.get('plain_text', '')
+            link = item.get('href')
+        if not text:
+            continue
+        annotations = item.get('annotations', {})
+        flags = ''.join(name[0].upper() for name in ANNOTATION_FLAGS if annotations.get(name))
+        key = (flags, annotations.get('color', 'default'), link or '')
+        if runs and runs[-1][1:] == key:
+            runs[-1] = (runs[-1][0] + text,) + key
+        else:
+            runs.append((text,) + key)
+    return runs
+
+def block_content(block):
+    """A block's own content (type and canonical rich text), ignoring its children"""
+    block_type = block.get('type')
+    return [block_type, canonical_rich_text(block.get(block_type, {}).get('rich_text', []))]
+
+def _digest(value):
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+def own_fingerprint(block):
+    """Hash of block_content; equal for a converted block and its uploaded copy"""
+    return _digest(block_content(block))
+
+def _hash_node(block):
+    content = block_content(block)
+    children = [_hash_node(child) for child in block_children(block)]
+    return [_digest(content), _digest([content, [child[1] for child in children]]), children]
+
+def hash_tree(blocks):
+    """[own hash, subtree hash, child nodes] for every block, computed bottom-up in one pass.
+
+    Plain lists, so the tree round-trips through JSON (MigrationState
+    stores it with the page's record).
+    """
+    return [_hash_node(block) for block in blocks]
+
+def tree_root(nodes):
+    """Root hash of a hash_tree; equals page_fingerprint of the same blocks"""
+    return _digest([node[1] for node in nodes])
+
+def tree_size(nodes):
+    """Number of blocks in a hash_tree, every nesting level included"""
+    return sum(1 + tree_size(node[2]) for node in nodes)
+
+def block_fingerprint(block):
+    """Hash of a block's own content and, recursively, of its children"""
+    return _hash_node(block)[1]
+
+def page_fingerprint(blocks):
+    """Fingerprint of a page's full block tree (every block, every nesting level)"""
+    return tree_root(hash_tree(blocks))
+
+def has_child_blocks(block):
+    """True if a fetched or converted block has children, loaded or not"""
+    return bool(block.get('has_children') or block_children(block))
+
+def strip_children(block):
+    """Copy of a converted block without nested children, for an update call"""
+    block_type = block['type']
+    body = {key: value for key, value in block[block_type].items() if key != 'children'}
+    return {'type': block_type, block_type: body}
+
+class BlockDiff:
+    """Operations turning an existing Notion block tree into a new block list.
+
+    updates: [(block_id, new_block)]     same type, content changed
+    deletes: [block_id]                  removed (with their children)
+    inserts: [(parent_id, after_id, [new_blocks])]  after_id None appends at the end
+    rewrites: [parent_id]                parents whose children are all deleted and re-appended,
+                                         used when something must go before the first kept child
+    """
+
+    def __init__(self):
+        self.updates = []
+        self.deletes = []
+        self.inserts = []
+        self.rewrites = []
+        self.unchanged = 0
+        self.skipped_subtrees = 0  # Kept subtrees matched by recorded hash, children never read
+
+    @property
+    def empty(self):
+        return not (self.updates or self.deletes or self.inserts)
+
+    def write_requests(self, per_request=100):
+        """Notion requests needed to apply this diff"""
+        insert_requests = sum(-(-len(blocks) // per_request) for _, _, blocks in self.inserts)
+        return len(self.updates) + len(self.deletes) + insert_requests
+
+    def summary(self):
+        inserted = sum(len(blocks) for _, _, blocks in self.inserts)
+        skipped = f" ({self.skipped_subtrees} subtree(s) matched by hash)" if self.skipped_subtrees else ''
+        return (f"{len(self.updates)} updated, {len(self.deletes)} deleted, {inserted} inserted, "
+                f"{self.unchanged} unchanged{skipped}")
+
+def diff_level(parent_id, existing, new, new_nodes, diff, known=None):
+    """Diff one list of children into `diff`; returns the kept pairs whose children still differ.
+
+    Blocks are matched by own hash in order (difflib), and an unmatched
+    pair of the same type becomes an in-place update rather than a delete
+    plus insert. `known` is the hash_tree recorded when `existing` was
+    uploaded: a kept block whose recorded subtree hash equals the new one
+    is unchanged all the way down and its children are never looked at.
+    Returns [(old_block, new_block, recorded child nodes or None, new child nodes)].
+    """
+    old_keys = [own_fingerprint(block) for block in existing]
+    new_keys = [node[0] for node in new_nodes]
+    # A recorded node only vouches for the block still holding the content it was recorded with
+    if known and len(known) == len(existing):
+        known = [node if node[0] == key else None for node, key in zip(known, old_keys)]
+    else:
+        known = [None] * len(existing)
+
+    # (existing index or None, new index) in new order; existing blocks left out are deleted
+    pairs = []
+    deleted = []
+    matcher = SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            pairs.extend(zip(range(i1, i2), range(j1, j2)))
+            continue
+        for k, new_index in enumerate(range(j1, j2)):
+            old_index = i1 + k if i1 + k < i2 else None
+            if old_index is not None and existing[old_index].get('type') == new[new_index].get('type'):
+                pairs.append((old_index, new_index))
+            else:
+                if old_index is not None:
+                    deleted.append(old_index)
+                pairs.append((None, new_index))
+        deleted.extend(range(i1 + (j2 - j1), i2))
+
+    # Notion can only insert after an existing block, never before the first one
+    first_kept = next((index for index, (old_index, _) in enumerate(pairs) if old_index is not None), None)
+    if first_kept is not None and first_kept > 0:
+        diff.rewrites.append(parent_id)
+        diff.deletes.extend(block['id'] for block in existing)
+        diff.inserts.append((parent_id, None, list(new)))
+        return []
+
+    diff.deletes.extend(existing[index]['id'] for index in deleted)
+    descend = []
+    anchor = None
+    pending = []
+    for old_index, new_index in pairs:
+        if old_index is None:
+            pending.append(new[new_index])
+            continue
+        if pending:
+            diff.inserts.append((parent_id, anchor, pending))
+            pending = []
+        old_block, new_block, node = existing[old_index], new[new_index], new_nodes[new_index]
+        recorded = known[old_index]
+        anchor = old_block['id']
+        if recorded is not None and recorded[1] == node[1]:
+            diff.unchanged += 1 + tree_size(node[2])
+            diff.skipped_subtrees += bool(node[2])
+            continue
+        if old_keys[old_index] == node[0]:
+            diff.unchanged += 1
+        else:
+            diff.updates.append((old_block['id'], strip_children(new_block)))
+        if node[2] or has_child_blocks(old_block):
+            descend.append((old_block, new_block, recorded[2] if recorded else None, node[2]))
+    if pending:
+        diff.inserts.append((parent_id, anchor, pending))
+    return descend
+
+def diff_blocks(parent_id, existing, new, diff=None, known=None):
+    """Minimal BlockDiff from fetched `existing` children of parent_id (children loaded) to converted `new` blocks"""
+    if diff is None:
+        diff = BlockDiff()
+    levels = [(parent_id, existing, new, hash_tree(new), known)]
+    while levels:
+        parent_id, existing, new, new_nodes, known = levels.pop()
+        for old_block, new_block, old_known, child_nodes in diff_level(parent_id, existing, new, new_nodes,
+                                                                       diff, known):
+            levels.append((old_block['id'], block_children(old_block), block_children(new_block),
+                           child_nodes, old_known))
+    return diff
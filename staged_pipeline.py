@@ -0,0 +1,223 @@
+"""
+Thread-based staged pipeline with bounded queues.
+
+Each Stage runs its own pool of worker threads that take items from a
+bounded inbox, handle them and put the result into the next stage's
+inbox. A full inbox blocks the stage feeding it, so a slow stage holds
+back the ones before it instead of letting work pile up in memory: at
+most the inbox sizes plus one item per worker are alive at any time.
+
+Every stage counts items, failures, the time its workers spend busy,
+waiting for input and blocked on a full downstream queue, and a
+sampler records queue depths, so the run summary shows which stage is
+the bottleneck.
+
+A stage starts `workers` threads but only lets `limit` of them take
+items; set_limit() moves the limit at runtime (see
+concurrency_controller.py) and the others park without holding an item.
+"""
+import threading
+import time
+import traceback
+from queue import Queue, Empty
+
+DEFAULT_SAMPLE_INTERVAL = 0.5  # Seconds between queue depth samples
+DEFAULT_REPORT_INTERVAL = 30.0  # Seconds between [PIPELINE] progress lines
+
+_DONE = object()  # End-of-input marker, one per worker
+
+class Stage:
+    """A named pool of `workers` threads calling handler(item) on items from a bounded inbox.
+
+    The handler returns the item to pass downstream, or None to drop it
+    (a failure it already reported). Exceptions are printed and counted.
+    `limit` (default: workers) caps how many workers take items at once.
+    """
+
+    def __init__(self, name, handler, workers, queue_size=None, limit=None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.limit = min(self.workers, max(1, limit or self.workers))
+        self.queue_size = queue_size or 2 * self.workers
+        self.inbox = Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self._holding = 0  # Workers allowed to take items right now (at most limit)
+        self._active = 0  # Workers inside the handler right now
+        self._running = self.workers  # Workers that have not seen _DONE yet
+        self.items = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.idle_seconds = 0.0  # Waiting for input
+        self.blocked_seconds = 0.0  # Waiting for room downstream
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.limit_seconds = 0.0  # Integral of limit over time, up to _limit_since
+        self._limit_since = None
+        self.started = None
+        self.finished = None
+
+    def depth(self):
+        return self.inbox.qsize()
+
+    def active(self):
+        with self._lock:
+            return self._active
+
+    def set_limit(self, limit):
+        """Let `limit` workers (clamped to 1..workers) take items; returns the new limit"""
+        with self._slots:
+            limit = min(self.workers, max(1, limit))
+            if self._limit_since is not None and self.finished is None:
+                now = time.perf_counter()
+                self.limit_seconds += self.limit * (now - self._limit_since)
+                self._limit_since = now
+            self.limit = limit
+            self._slots.notify_all()
+            return limit
+
+    def _start(self, started):
+        self.started = self._limit_since = started
+
+    def _sample(self):
+        depth = self.inbox.qsize()
+        with self._lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def _release(self):
+        with self._slots:
+            self._holding -= 1
+            self._slots.notify()
+
+    def _worker(self, downstream, on_finished):
+        while True:
+            with self._slots:
+                # Over the limit: park before taking an item, so the inbox is left to the workers allowed to run
+                while self._holding >= self.limit:
+                    self._slots.wait()
+                self._holding += 1
+            wait_start = time.perf_counter()
+            item = self.inbox.get()
+            waited = time.perf_counter() - wait_start
+            if item is _DONE:
+                with self._lock:
+                    self.idle_seconds += waited
+                    self._running -= 1
+                    last = self._running == 0
+                self._release()  # A parked worker takes the slot and its own _DONE
+                if last:
+                    self.finished = time.perf_counter()
+                    on_finished()
+                return
+            with self._lock:
+                self.idle_seconds += waited
+                self._active += 1
+            start = time.perf_counter()
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                print(f"[ERROR] {self.name} stage failed: {type(e).__name__}: {e}")
+                traceback.print_exc()
+                result = None
+            busy = time.perf_counter() - start
+            with self._lock:
+                self._active -= 1
+                self.items += 1
+                self.failures += result is None
+                self.busy_seconds += busy
+            if result is not None and downstream is not None:
+                put_start = time.perf_counter()
+                downstream.inbox.put(result)
+                with self._lock:
+                    self.blocked_seconds += time.perf_counter() - put_start
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            # Worker-seconds the limit allowed: utilization stays meaningful when the limit moves
+            capacity = self.limit_seconds
+            if self._limit_since is not None:
+                capacity += self.limit * ((self.finished or time.perf_counter()) - self._limit_since)
+            return {
+                'items': self.items,
+                'failures': self.failures,
+                'workers': self.workers,
+                'limit': self.limit,
+                'busy_seconds': round(self.busy_seconds, 2),
+                'idle_seconds': round(self.idle_seconds, 2),
+                'blocked_seconds': round(self.blocked_seconds, 2),
+                # Workers finishing an item after the limit dropped can briefly exceed it
+                'utilization': min(1.0, self.busy_seconds / capacity) if capacity else 0.0,
+                'avg_depth': self.depth_total / self.depth_samples if self.depth_samples else 0.0,
+                'max_depth': self.max_depth,
+                'queue_size': self.queue_size,
+            }
+
+class StagedPipeline:
+    """Stages chained by their inboxes: run(items) feeds the first, waits for the last to finish"""
+
+    def __init__(self, stages, sample_interval=DEFAULT_SAMPLE_INTERVAL, report_interval=DEFAULT_REPORT_INTERVAL):
+        self.stages = stages
+        self.sample_interval = sample_interval
+        self.report_interval = report_interval
+        self._done = threading.Event()
+
+    def _finisher(self, index):
+        """Called once every worker of stage `index` has exited: end the next stage's input"""
+        def finished():
+            if index + 1 < len(self.stages):
+                following = self.stages[index + 1]
+                for _ in range(following.workers):
+                    following.inbox.put(_DONE)
+            else:
+                self._done.set()
+        return finished
+
+    def _monitor(self):
+        last_report = time.perf_counter()
+        while not self._done.wait(self.sample_interval):
+            for stage in self.stages:
+                stage._sample()
+            if self.report_interval and time.perf_counter() - last_report >= self.report_interval:
+                last_report = time.perf_counter()
+                print("[PIPELINE] " + ' | '.join(
+                    f"{stage.name}: {stage.items} done, {stage.active()}/{stage.limit} busy, "
+                    f"queue {stage.depth()}/{stage.queue_size}" for stage in self.stages))
+
+    def run(self, items):
+        """Push every item through all stages (blocking while the first inbox is full)"""
+        threads = []
+        started = time.perf_counter()
+        for index, stage in enumerate(self.stages):
+            stage._start(started)
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for number in range(stage.workers):
+                thread = threading.Thread(target=stage._worker, args=(downstream, self._finisher(index)),
+                                          name=f'{stage.name}-{number + 1}', daemon=True)
+                thread.start()
+                threads.append(thread)
+        monitor = threading.Thread(target=self._monitor, name='pipeline-monitor', daemon=True)
+        monitor.start()
+        first = self.stages[0]
+        for item in items:
+            first.inbox.put(item)
+        for _ in range(first.workers):
+            first.inbox.put(_DONE)
+        self._done.wait()
+        for thread in threads:
+            thread.join()
+        monitor.join()
+
+    def print_stats(self):
+        for stage in self.stages:
+            stats = stage.stats()
+            failed = f", {stats['failures']} failed" if stats['failures'] else ''
+            workers = stats['workers'] if stats['limit'] == stats['workers'] else f"{stats['limit']}/{stats['workers']}"
+            print(f"[TIMING] Stage {stage.name}: {stats['items']} item(s){failed}, {workers} worker(s), "
+                  f"utilization {stats['utilization'] * 100:.0f}%, queue depth avg {stats['avg_depth']:.1f} "
+                  f"max {stats['max_depth']}/{stats['queue_size']}, busy {stats['busy_seconds']}s "
+                  f"idle {stats['idle_seconds']}s blocked {stats['blocked_seconds']}s")
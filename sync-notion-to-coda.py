@@ -9,11 +9,10 @@ This script will:
 4. Handle renames (pages that exist in both but with different names)
 5. Report what was deleted and renamed
 """
-import requests
 import os
 from dotenv import load_dotenv
 import unicodedata
-import time
+from api_clients import coda_client, notion_client
 
 load_dotenv()
 
@@ -22,19 +21,15 @@ CODA_DOC_ID = '0eJEEjA-GU'
 NOTION_API_TOKEN = os.getenv('NOTION_API_TOKEN')
 NOTION_PARENT_PAGE_ID = '2c3636dd-0ba5-807e-b374-c07a0134e636'
 
-coda_headers = {'Authorization': f'Bearer {CODA_API_TOKEN}'}
-notion_headers = {
-    'Authorization': f'Bearer {NOTION_API_TOKEN}',
-    'Notion-Version': '2022-06-28',
-    'Content-Type': 'application/json'
-}
+coda_api = coda_client(CODA_API_TOKEN)
+notion_api = notion_client(NOTION_API_TOKEN)
 
 def normalize(text):
     return unicodedata.normalize("NFKC", text.strip().lower())
 
 def get_all_coda_pages():
     """Fetch all current pages from Coda"""
-    url = f'https://coda.io/apis/v1/docs/{CODA_DOC_ID}/pages'
+    url = f'/docs/{CODA_DOC_ID}/pages'
     all_pages = []
     next_token = None
     
@@ -43,7 +38,7 @@ def get_all_coda_pages():
         if next_token:
             params['pageToken'] = next_token
         
-        resp = requests.get(url, headers=coda_headers, params=params)
+        resp = coda_api.get(url, params=params)
         if resp.status_code != 200:
             print(f"[ERROR] Failed to fetch Coda pages: {resp.status_code}")
             break
@@ -60,16 +55,16 @@ def get_all_coda_pages():
 
 def get_all_notion_pages():
     """Fetch all child pages from Notion parent"""
-    url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children'
+    url = f'/blocks/{NOTION_PARENT_PAGE_ID}/children'
     all_pages = []
     next_cursor = None
     
     while True:
-        params = {}
+        params = {'page_size': 100}
         if next_cursor:
             params['start_cursor'] = next_cursor
         
-        resp = requests.get(url, headers=notion_headers, params=params)
+        resp = notion_api.get(url, params=params)
         if resp.status_code != 200:
             print(f"[ERROR] Failed to fetch Notion pages: {resp.status_code}")
             break
@@ -77,21 +72,15 @@ def get_all_notion_pages():
         data = resp.json()
         results = data.get('results', [])
         
-        # Get full page details for child_page blocks
+        # child_page blocks already carry the page title
         for result in results:
             if result.get('type') == 'child_page':
-                page_id = result.get('id')
-                page_url = f'https://api.notion.com/v1/pages/{page_id}'
-                page_resp = requests.get(page_url, headers=notion_headers)
-                if page_resp.ok:
-                    page_data = page_resp.json()
-                    page_title_prop = page_data.get('properties', {}).get('title', {})
-                    if page_title_prop.get('title'):
-                        page_title = page_title_prop['title'][0].get('plain_text', '')
-                        all_pages.append({
-                            'id': page_id,
-                            'title': page_title
-                        })
+                page_title = result.get('child_page', {}).get('title', '')
+                if page_title:
+                    all_pages.append({
+                        'id': result.get('id'),
+                        'title': page_title
+                    })
         
         next_cursor = data.get('next_cursor')
         if not next_cursor:
@@ -102,9 +91,8 @@ def get_all_notion_pages():
 def archive_notion_page(page_id):
     """Archive (delete) a Notion page"""
     try:
-        url = f'https://api.notion.com/v1/pages/{page_id}'
         data = {"archived": True}
-        r = requests.patch(url, headers=notion_headers, json=data)
+        r = notion_api.patch(f'/pages/{page_id}', json=data)
         return r.ok
     except Exception as e:
         print(f"[WARNING] Error archiving page {page_id}: {e}")
@@ -211,7 +199,6 @@ def main():
             else:
                 failed_count += 1
                 print(f"      ❌ Failed to archive")
-            time.sleep(0.5)  # Rate limiting
         
         print()
         print("=" * 60)
@@ -226,6 +213,8 @@ def main():
         print("✅ No pages to delete - Notion is already in sync")
         print()
     
+    coda_api.print_stats()
+    notion_api.print_stats()
     print("=" * 60)
     print("SYNC COMPLETE")
     print("=" * 60)
@@ -0,0 +1,28 @@
+"""
+Shared fixtures. coda-download.py is not importable by name (its file
+name has a hyphen), so it is loaded from its path once per session, the
+way the benchmark scripts load it.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, ROOT)
+
+# Tests never call the Coda or Notion APIs, but coda-download refuses to load without tokens
+os.environ.setdefault('CODA_API_TOKEN', 'test')
+os.environ.setdefault('NOTION_API_TOKEN', 'test')
+
+@pytest.fixture(scope='session')
+def coda_download():
+    module = sys.modules.get('coda_download')
+    if module is None:
+        spec = importlib.util.spec_from_file_location('coda_download', os.path.join(ROOT, 'coda-download.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['coda_download'] = module
+        spec.loader.exec_module(module)
+    return module
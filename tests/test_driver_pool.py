@@ -0,0 +1,86 @@
+"""DriverPool hands out reused drivers without the previous page's cookies or storage"""
+from urllib.parse import urlsplit
+
+import pytest
+
+class FakeDriver:
+    """Just enough of a Chrome WebDriver to model where browser state lives.
+
+    Cookies and storage are kept per origin; like the real thing,
+    delete_all_cookies() and page scripts only reach the current document's
+    origin, and about:blank has none.
+    """
+
+    def __init__(self, cdp=True):
+        self.origin = None
+        self.cookies = {}  # origin -> {name: value}
+        self.storage = {}  # origin -> {key: value}, local and session storage together
+        if not cdp:
+            self.execute_cdp_cmd = None
+            del self.execute_cdp_cmd
+
+    def get(self, url):
+        parts = urlsplit(url)
+        self.origin = f"{parts.scheme}://{parts.netloc}" if parts.netloc else None
+
+    def visit(self, url):
+        """Load a page that sets a cookie on its own origin and a third-party one, and writes storage"""
+        self.get(url)
+        self.cookies.setdefault(self.origin, {})['session'] = 'secret'
+        self.cookies.setdefault('https://tracker.example', {})['id'] = '42'
+        self.storage.setdefault(self.origin, {})['draft'] = 'x'
+
+    def delete_all_cookies(self):
+        if self.origin is not None:
+            self.cookies.pop(self.origin, None)
+
+    def execute_script(self, script):
+        if script == 'return 1':
+            return 1
+        if 'location.origin' in script:
+            return self.origin or 'null'
+        if 'localStorage.clear()' in script and self.origin is not None:
+            self.storage.pop(self.origin, None)
+        return None
+
+    def execute_cdp_cmd(self, command, params):
+        if command == 'Network.clearBrowserCookies':
+            self.cookies.clear()
+        elif command == 'Storage.clearDataForOrigin':
+            self.storage.pop(params['origin'], None)
+        return {}
+
+    def quit(self):
+        pass
+
+    def is_clean(self):
+        return not any(self.cookies.values()) and not any(self.storage.values())
+
+@pytest.fixture
+def pool(coda_download, monkeypatch):
+    started = []
+    def setup_driver():
+        started.append(FakeDriver())
+        return started[-1]
+    monkeypatch.setattr(coda_download, 'setup_driver', setup_driver)
+    pool = coda_download.DriverPool(max_size=1)
+    yield pool
+    pool.close()
+
+def test_reused_driver_starts_clean(pool):
+    with pool.borrow() as driver:
+        driver.visit('https://coda.io/d/doc/page')
+        assert not driver.is_clean()
+    with pool.borrow() as reused:
+        assert reused is driver
+        assert reused.is_clean()
+        assert reused.origin is None  # Parked on about:blank
+    assert pool.stats()['hits'] == 1
+
+def test_reset_without_devtools_still_clears_the_page_origin(coda_download):
+    pool = coda_download.DriverPool(max_size=1)
+    driver = FakeDriver(cdp=False)
+    driver.visit('https://coda.io/d/doc/page')
+    assert pool._reset(driver)
+    assert not driver.cookies.get('https://coda.io')
+    assert not driver.storage.get('https://coda.io')
@@ -0,0 +1,73 @@
+"""Coda page exports through prepare_export_html and the HTML pipeline to Notion blocks.
+
+The fixtures are modelled on the markup of Coda's HTML page export (a full
+document whose body starts with the page name as <h1>, semantic lists
+indented over several lines, tables as <table>), not captured from it.
+"""
+import os
+
+import pytest
+
+from conftest import FIXTURES
+
+EXPORTS = os.path.join(FIXTURES, 'export')
+
+def read_export(page_name):
+    with open(os.path.join(EXPORTS, f'{page_name}.html'), encoding='utf-8') as f:
+        return f.read()
+
+def outline(blocks):
+    """(type, [(text, annotations set, link)], children) per block; the parts of a block the tests care about"""
+    result = []
+    for block in blocks:
+        body = block[block['type']]
+        runs = [(run['text']['content'], {name for name, on in run['annotations'].items() if on is True},
+                 (run['text'].get('link') or {}).get('url'))
+                for run in body['rich_text']]
+        result.append((block['type'], runs, outline(body.get('children', []))))
+    return result
+
+def plain(text):
+    return (text, set(), None)
+
+@pytest.mark.parametrize('parser', ['html.parser', 'lxml'])
+def test_export_becomes_notion_blocks(coda_download, parser):
+    html, reason = coda_download.prepare_export_html(read_export('Acme Kickoff'), 'Acme Kickoff')
+    assert reason is None
+    pipeline = coda_download.HtmlPipeline(html, parser=parser).cleanup().restructure_lists()
+    assert outline(pipeline.to_blocks()) == [
+        ('paragraph', [plain('Attendees: '), ('Dana', {'bold'}, None), plain(', '), ('Lee', {'italic'}, None),
+                       plain(' and the '), ('Acme team', set(), 'https://acme.example/team'), plain('.')], []),
+        ('heading_2', [plain('Agenda')], []),
+        ('numbered_list_item', [plain('Scope')], [
+            ('bulleted_list_item', [plain('Import '), ('all', {'bold'}, None), plain(' accounts')], []),
+            ('bulleted_list_item', [plain('Keep '), ('legacy_id', {'code'}, None)], []),
+        ]),
+        ('numbered_list_item', [plain('Timeline')], []),
+        ('heading_2', [plain('Next steps')], []),
+        ('bulleted_list_item', [plain('Send the contract')], []),
+        ('bulleted_list_item', [plain('Book the follow-up')], [
+            ('bulleted_list_item', [plain('Tuesday or Wednesday')], []),
+        ]),
+        ('paragraph', [plain('Notes by '), ('Dana', {'underline'}, None), plain(', '),
+                       ('draft', {'strikethrough'}, None)], []),
+    ]
+
+def test_title_heading_is_stripped_only_when_it_repeats_the_page_name(coda_download):
+    html, _ = coda_download.prepare_export_html(read_export('Acme Kickoff'), 'acme kickoff')
+    assert '<h1>' not in html and 'Acme Kickoff' not in html
+    html, _ = coda_download.prepare_export_html(read_export('Acme Kickoff'), 'Acme Kickoff 3/5/24')
+    assert html.startswith('<h1>Acme Kickoff</h1>')
+    exported = '<html><body>\n<h1>Summary</h1>\n<p>Renewal agreed</p>\n</body></html>'
+    html, _ = coda_download.prepare_export_html(exported, 'Acme Renewal')
+    assert html == '<h1>Summary</h1><p>Renewal agreed</p>'
+
+@pytest.mark.parametrize('exported, reason', [
+    (read_export('Acme Pricing'), 'contains <table>'),
+    ('<html><body><h1>Acme Logo</h1><p><img src="logo.png"></p></body></html>', 'contains <img>'),
+    ('<p><span style="font-weight: bold">Dana</span></p>', 'formatting in inline styles'),
+    ('<html><head><title>Acme Kickoff</title></head><body>\n</body></html>', 'empty export'),
+    ('', 'empty export'),
+])
+def test_exports_that_would_lose_content_fall_back_to_chrome(coda_download, exported, reason):
+    assert coda_download.prepare_export_html(exported, 'Acme Kickoff') == (None, reason)
@@ -0,0 +1,112 @@
+"""restructure_coda_lists leaves a tree bs4 can walk like one freshly parsed from its output.
+
+remove_children relinks bs4's sibling and parse-order chains by hand, so
+every way of walking the tree (descendants, find_all, next_element and
+previous_element, sibling links) is compared against a re-parse.
+"""
+import importlib.util
+import os
+
+import pytest
+from bs4 import Tag
+
+from conftest import ROOT
+
+PARSERS = ['html.parser', 'lxml']
+
+MIXED_CANVAS = (
+    '<div class="kr-canvas-header"><h1>Mixed page</h1></div>'
+    '<div class="kr-canvas">'
+    '<h2>Agenda</h2>'
+    '<div class="kr-line block-level-0"><span>Intro with <strong>bold</strong> text</span></div>'
+    '<div class="kr-line kr-ulist kr-listitem block-level-0">First</div>'
+    '<div class="kr-line kr-ulist kr-listitem block-level-1"><a href="https://example.com/a">nested link</a></div>'
+    '<div class="kr-line kr-olist kr-listitem block-level-2"><em>deep</em> numbered</div>'
+    '<div class="kr-line kr-ulist kr-listitem block-level-0">Second</div>'
+    '<p>Loose paragraph</p>'
+    '<div class="kr-line kr-olist kr-listitem block-level-0">'
+    '<span class="kr-object-e"><span><a href="https://example.com/chip">chip</a></span></span> after chip</div>'
+    '<div class="kr-line block-level-0"></div>'
+    '<div class="kr-line block-level-0"><s>struck</s> <code>code()</code></div>'
+    '</div>'
+    '<p>After the canvas</p>'
+)
+
+@pytest.fixture(scope='module')
+def synthetic_canvas():
+    """benchmark-list-restructure's canvas generator; the benchmark loads coda-download relative to the repo root"""
+    previous = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        spec = importlib.util.spec_from_file_location('benchmark_list_restructure',
+                                                      os.path.join(ROOT, 'benchmark-list-restructure.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(previous)
+    return module.synthetic_canvas
+
+def node(element):
+    if isinstance(element, Tag):
+        return ('tag', element.name, tuple(sorted((k, str(v)) for k, v in element.attrs.items())))
+    return (type(element).__name__, str(element))
+
+def walks(soup):
+    """Every way of walking the tree, as comparable node lists"""
+    descendants = list(soup.descendants)
+    # bs4 keeps the BeautifulSoup object itself out of the parse-order chain
+    forward, element = [], descendants[0] if descendants else None
+    while element is not None:
+        forward.append(element)
+        element = element.next_element
+    backward, element = [], descendants[-1] if descendants else None
+    while element is not None:
+        backward.append(element)
+        element = element.previous_element
+    return {
+        'descendants': [node(el) for el in descendants],
+        'next_element': [node(el) for el in forward],
+        'previous_element': [node(el) for el in reversed(backward)],
+        'find_all': [node(el) for el in soup.find_all(True)],
+        'find_all li': [node(el) for el in soup.find_all('li')],
+        'find_all a': [node(el) for el in soup.find_all('a', href=True)],
+        'find_all string': [str(s) for s in soup.find_all(string=True)],
+        'find_next': [node(el) for el in soup.find_all(True)[0].find_all_next()] if soup.find(True) else [],
+    }
+
+def assert_links_consistent(soup):
+    """Parent, sibling and parse-order links agree with each element's contents"""
+    previous = None
+    for element in soup.descendants:
+        assert element.previous_element is previous
+        if previous is not None:
+            assert previous.next_element is element
+        previous = element
+        if isinstance(element, Tag):
+            for index, child in enumerate(element.contents):
+                assert child.parent is element
+                assert child.previous_sibling is (element.contents[index - 1] if index else None)
+                assert child.next_sibling is (element.contents[index + 1] if index + 1 < len(element.contents) else None)
+    assert previous.next_element is None
+
+def assert_walks_like_fresh_parse(coda_download, html, parser):
+    soup = coda_download.make_soup(html, parser)
+    coda_download.restructure_coda_lists(soup)
+    soup.smooth()  # As HtmlPipeline does; a fresh parse merges adjacent strings too
+    fresh = coda_download.make_soup(soup.decode(), parser)
+    assert_links_consistent(soup)
+    restructured, reparsed = walks(soup), walks(fresh)
+    for walk in reparsed:
+        assert restructured[walk] == reparsed[walk], walk
+    return soup
+
+@pytest.mark.parametrize('parser', PARSERS)
+def test_mixed_content_walks_like_fresh_parse(coda_download, parser):
+    soup = assert_walks_like_fresh_parse(coda_download, MIXED_CANVAS, parser)
+    assert soup.find('div', class_='kr-line') is None
+    assert soup.find('div', class_='kr-canvas-header') is None
+
+@pytest.mark.parametrize('parser', PARSERS)
+@pytest.mark.parametrize('seed', range(3))
+def test_synthetic_canvas_walks_like_fresh_parse(coda_download, synthetic_canvas, parser, seed):
+    assert_walks_like_fresh_parse(coda_download, synthetic_canvas(300, seed=seed), parser)
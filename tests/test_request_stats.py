@@ -0,0 +1,37 @@
+"""RequestStats counts every 429, whether the client retries it or hands it back"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api_clients import ApiClient
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    """Answers every request 429 with Retry-After: 0"""
+
+    def do_GET(self):
+        self.send_response(429)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RateLimitedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize('max_retries', [0, 2])
+def test_every_429_is_counted(base_url, max_retries):
+    client = ApiClient('test', base_url, {}, max_retries=max_retries)
+    assert client.get('/pages').status_code == 429
+    assert client.totals() == (max_retries + 1, max_retries + 1)
+    assert client.retries == max_retries
@@ -0,0 +1,167 @@
+"""
+Per-step timing spans for the migration.
+
+Each page gets a trace (its Coda page id) and every step timed while the
+page is on its way through the pipeline becomes a span in it: driver
+acquisition, navigation, the canvas readiness wait, the JS extraction,
+parsing, list restructuring, block conversion, hashing, the Notion
+lookup, the page create and every append. With a trace file configured,
+spans are written as JSON lines as they finish:
+
+    {"trace": "<coda page id>", "page": "Protego", "span": "navigate",
+     "start": 1760700000.123, "seconds": 1.234, "thread": "extract-0"}
+
+plus any attributes the span was given (engine, chunk, ...). Durations
+are kept in memory either way, and print_summary() ends the run with
+count, p50, p95, max and total per span.
+
+The current page is thread-local: page(trace_id, name) sets it around a
+stage handler and span() picks it up. Work done elsewhere - conversion
+worker processes, the Notion event loop - hands its timings back to be
+recorded under the page (collect() and replay(), or record() with an
+explicit context from current()).
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+SUMMARY_PERCENTILES = (0.50, 0.95)
+
+_local = threading.local()
+
+class Span:
+    """What a `with span(...)` block yields; seconds is set when the block exits"""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+        self.seconds = None
+
+class Tracer:
+    """Span durations per name, and the JSON-lines trace file when one is configured"""
+
+    def __init__(self):
+        self.path = None
+        self._file = None
+        self._lock = threading.Lock()
+        self.durations = {}  # span name -> [seconds], in the order names were first seen
+        self.traces = set()
+
+    def configure(self, path):
+        """Write every span from now on to path (truncated)"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self.path = path
+            self._file = open(path, 'w', encoding='utf-8', buffering=1)  # Line-buffered: tail -f friendly
+
+    def record(self, name, seconds, start=None, context=None, thread=None, **attrs):
+        """Record one finished span under context (default: this thread's current page)"""
+        trace_id, page_name = context if context is not None else current()
+        if start is None:
+            start = time.time() - seconds
+        with self._lock:
+            self.durations.setdefault(name, []).append(seconds)
+            if trace_id is not None:
+                self.traces.add(trace_id)
+            if self._file is None:
+                return
+            entry = {'trace': trace_id, 'page': page_name, 'span': name, 'start': round(start, 3),
+                     'seconds': round(seconds, 6), 'thread': thread or threading.current_thread().name}
+            entry.update(attrs)
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def summary(self):
+        """[(span, count, p50, p95, max, total)] in the order spans were first recorded"""
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self.durations.items()}
+        return [(name, len(values)) + tuple(percentile(values, p) for p in SUMMARY_PERCENTILES)
+                + (values[-1], sum(values))
+                for name, values in durations.items()]
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        where = f", trace in {self.path}" if self.path else ''
+        print(f"[TIMING] Spans over {len(self.traces)} page(s){where}:")
+        print(f"[TIMING]   {'span':<18} {'count':>6} {'p50':>8} {'p95':>8} {'max':>8} {'total':>9}")
+        for name, count, p50, p95, longest, total in rows:
+            print(f"[TIMING]   {name:<18} {count:>6} {p50:>7.3f}s {p95:>7.3f}s {longest:>7.3f}s {total:>8.2f}s")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+tracer = Tracer()
+
+def percentile(values, share):
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+def current():
+    """(trace id, page name) this thread is working on, or (None, None)"""
+    return getattr(_local, 'context', (None, None))
+
+@contextmanager
+def page(trace_id, name=None):
+    """Spans started in this thread inside the block belong to this page"""
+    previous = current()
+    _local.context = (trace_id, name)
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+@contextmanager
+def span(name, **attrs):
+    """Time the block as one span of the current page.
+
+    Inside collect() the span is kept for the collector instead.
+    """
+    timed = Span(name, attrs)
+    timed.start = time.time()
+    started = time.perf_counter()
+    try:
+        yield timed
+    finally:
+        timed.seconds = time.perf_counter() - started
+        collected = getattr(_local, 'collected', None)
+        if collected is not None:
+            collected.append({'span': name, 'start': timed.start, 'seconds': timed.seconds, **timed.attrs})
+        else:
+            tracer.record(name, timed.seconds, timed.start, **timed.attrs)
+
+@contextmanager
+def collect():
+    """Gather this thread's spans into the yielded list instead of recording them (e.g. in a worker process)"""
+    previous = getattr(_local, 'collected', None)
+    _local.collected = spans = []
+    try:
+        yield spans
+    finally:
+        _local.collected = previous
+
+def replay(spans, **attrs):
+    """Record spans gathered by collect() under the current page"""
+    for entry in spans:
+        entry = dict(entry, **attrs)
+        tracer.record(entry.pop('span'), entry.pop('seconds'), entry.pop('start'), **entry)
+
+def record(name, seconds, start=None, context=None, **attrs):
+    """tracer.record: a span timed by the caller"""
+    tracer.record(name, seconds, start, context, **attrs)
+
+def configure(path):
+    tracer.configure(path)
+
+def print_summary():
+    tracer.print_summary()
+
+def close():
+    tracer.close()
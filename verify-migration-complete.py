@@ -5,10 +5,11 @@ Verify that all current Coda pages have been migrated to Notion.
 Note: Extra pages in Notion (not in current Coda) are expected and not
 reported as errors, since some pages may have been deleted from Coda.
 """
-import requests
 import os
 from dotenv import load_dotenv
 import unicodedata
+from migration_state import MigrationState, DEFAULT_STATE_PATH
+from api_clients import coda_client, notion_client
 
 load_dotenv()
 
@@ -17,19 +18,15 @@ CODA_DOC_ID = '0eJEEjA-GU'
 NOTION_API_TOKEN = os.getenv('NOTION_API_TOKEN')
 NOTION_PARENT_PAGE_ID = '2c3636dd-0ba5-807e-b374-c07a0134e636'
 
-coda_headers = {'Authorization': f'Bearer {CODA_API_TOKEN}'}
-notion_headers = {
-    'Authorization': f'Bearer {NOTION_API_TOKEN}',
-    'Notion-Version': '2022-06-28',
-    'Content-Type': 'application/json'
-}
+coda_api = coda_client(CODA_API_TOKEN)
+notion_api = notion_client(NOTION_API_TOKEN)
 
 def normalize(text):
     return unicodedata.normalize("NFKC", text.strip().lower())
 
 def get_all_coda_pages():
     """Fetch all pages from Coda"""
-    url = f'https://coda.io/apis/v1/docs/{CODA_DOC_ID}/pages'
+    url = f'/docs/{CODA_DOC_ID}/pages'
     all_pages = []
     next_token = None
     
@@ -38,7 +35,7 @@ def get_all_coda_pages():
         if next_token:
             params['pageToken'] = next_token
         
-        resp = requests.get(url, headers=coda_headers, params=params)
+        resp = coda_api.get(url, params=params)
         if resp.status_code != 200:
             print(f"[ERROR] Failed to fetch Coda pages: {resp.status_code}")
             break
@@ -55,16 +52,16 @@ def get_all_coda_pages():
 
 def get_all_notion_pages():
     """Fetch all child pages from Notion parent"""
-    url = f'https://api.notion.com/v1/blocks/{NOTION_PARENT_PAGE_ID}/children'
+    url = f'/blocks/{NOTION_PARENT_PAGE_ID}/children'
     all_pages = []
     next_cursor = None
     
     while True:
-        params = {}
+        params = {'page_size': 100}
         if next_cursor:
             params['start_cursor'] = next_cursor
         
-        resp = requests.get(url, headers=notion_headers, params=params)
+        resp = notion_api.get(url, params=params)
         if resp.status_code != 200:
             print(f"[ERROR] Failed to fetch Notion pages: {resp.status_code}")
             break
@@ -72,21 +69,15 @@ def get_all_notion_pages():
         data = resp.json()
         results = data.get('results', [])
         
-        # Get full page details for child_page blocks
+        # child_page blocks already carry the page title
         for result in results:
             if result.get('type') == 'child_page':
-                page_id = result.get('id')
-                page_url = f'https://api.notion.com/v1/pages/{page_id}'
-                page_resp = requests.get(page_url, headers=notion_headers)
-                if page_resp.ok:
-                    page_data = page_resp.json()
-                    page_title_prop = page_data.get('properties', {}).get('title', {})
-                    if page_title_prop.get('title'):
-                        page_title = page_title_prop['title'][0].get('plain_text', '')
-                        all_pages.append({
-                            'id': page_id,
-                            'title': page_title
-                        })
+                page_title = result.get('child_page', {}).get('title', '')
+                if page_title:
+                    all_pages.append({
+                        'id': result.get('id'),
+                        'title': page_title
+                    })
         
         next_cursor = data.get('next_cursor')
         if not next_cursor:
@@ -105,19 +96,30 @@ def main():
     print(f"[INFO] Found {len(coda_pages)} pages in Coda")
     print()
     
-    print("[INFO] Fetching all Notion pages...")
-    notion_pages = get_all_notion_pages()
-    print(f"[INFO] Found {len(notion_pages)} pages in Notion")
+    # Pages recorded in the local migration state count as migrated without any Notion reads
+    state = MigrationState(DEFAULT_STATE_PATH)
+    tracked = state.all()
+    state.close()
+    untracked_pages = [p for p in coda_pages if not (tracked.get(p.get('id')) or {}).get('notion_page_id')]
+    print(f"[INFO] {len(coda_pages) - len(untracked_pages)} pages recorded in migration state ({DEFAULT_STATE_PATH})")
     print()
     
+    notion_pages = None
+    if untracked_pages:
+        print("[INFO] Fetching all Notion pages...")
+        notion_pages = get_all_notion_pages()
+        print(f"[INFO] Found {len(notion_pages)} pages in Notion")
+        print()
+    
     # Create normalized title maps
     coda_titles = {normalize(p.get('name', '')): p.get('name', '') for p in coda_pages}
-    notion_titles = {normalize(p['title']): p['title'] for p in notion_pages}
+    notion_titles = {normalize(p['title']): p['title'] for p in notion_pages or []}
     
-    # Find missing pages
+    # Find missing pages (only untracked pages need a title match)
     missing_in_notion = []
-    for coda_title_norm, coda_title in coda_titles.items():
-        if coda_title_norm not in notion_titles:
+    for page in untracked_pages:
+        coda_title = page.get('name', '')
+        if normalize(coda_title) not in notion_titles and coda_title not in missing_in_notion:
             missing_in_notion.append(coda_title)
     
     # Find extra pages in Notion (not in Coda)
@@ -132,7 +134,10 @@ def main():
     print("=" * 60)
     print()
     print(f"📊 Current Coda pages: {len(coda_pages)}")
-    print(f"📊 Total Notion pages: {len(notion_pages)}")
+    if notion_pages is not None:
+        print(f"📊 Total Notion pages: {len(notion_pages)}")
+    else:
+        print("📊 Notion listing skipped: every Coda page is recorded in the migration state")
     print()
     print("ℹ️  Note: Extra pages in Notion (not in current Coda) are expected")
     print("   since some pages may have been deleted from Coda.")
@@ -0,0 +1,245 @@
+"""
+Lease-based work queue shared by several migration machines.
+
+A coordinator writes the pages to migrate into a SQLite file on shared
+storage; every worker (coda-download.py --work-queue on each machine)
+leases pages one at a time, migrates them and acks them. A lease lasts
+lease_seconds and is renewed by a heartbeat while the page is in the
+worker's pipeline, so a worker that crashes or loses the network stops
+renewing and its pages become leasable again once the lease expires.
+
+Leases are fenced: ack() and holds() only succeed for the worker that
+currently owns the lease, so a worker whose lease expired (and whose
+page another worker picked up) finds out before uploading and drops the
+page instead of creating a duplicate. Pages that fail are released for
+another attempt, up to max_attempts.
+
+The file uses SQLite's rollback journal rather than WAL, which needs
+shared memory and so does not work across machines; every lease, renewal
+and ack is one short write transaction.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+DEFAULT_LEASE_SECONDS = 600.0  # Long enough for a slow page to render, convert and upload
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_SECONDS = 5.0  # Wait between lease attempts while other workers hold the remaining pages
+BUSY_TIMEOUT = 60.0  # Seconds to wait for another machine's write transaction
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS work (
+    coda_page_id TEXT PRIMARY KEY,
+    position INTEGER,
+    page TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL
+)
+'''
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class WorkQueue:
+    """One worker's (or the coordinator's) connection to the shared queue file"""
+
+    def __init__(self, path, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._held = set()  # Pages this worker leased and has not acked or released yet
+        self._stop = threading.Event()
+        self._heartbeat = None
+        # Autocommit: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=DELETE')
+            self._conn.execute(SCHEMA)
+
+    def _write(self, sql, params=()):
+        """Run one statement in its own write transaction; returns the cursor"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = self._conn.execute(sql, params)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            return cursor
+
+    def enqueue(self, pages):
+        """Add pages (Coda page dicts) in order; pages already queued keep their status. Returns how many were new."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                start = self._conn.execute('SELECT COALESCE(MAX(position), -1) + 1 FROM work').fetchone()[0]
+                added = 0
+                for offset, page in enumerate(pages):
+                    added += self._conn.execute(
+                        'INSERT OR IGNORE INTO work (coda_page_id, position, page, updated_at) VALUES (?, ?, ?, ?)',
+                        (page['id'], start + offset, json.dumps(page), now)).rowcount
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return added
+
+    def requeue_failed(self):
+        """Give pages that used up their attempts another round; returns how many"""
+        return self._write("UPDATE work SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'failed'",
+                           (time.time(),)).rowcount
+
+    def lease(self):
+        """Lease the next pending page (or one whose lease expired); returns the page dict or None"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    row = self._conn.execute('''
+                        SELECT coda_page_id, page, status, lease_owner, attempts FROM work
+                        WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                        ORDER BY position LIMIT 1
+                    ''', (now,)).fetchone()
+                    if row is None or row['status'] == 'pending':
+                        break
+                    # An expired lease is a crashed attempt: a page that kills every worker must not loop forever
+                    if row['attempts'] + 1 < self.max_attempts:
+                        self._conn.execute('UPDATE work SET attempts = attempts + 1 WHERE coda_page_id = ?',
+                                           (row['coda_page_id'],))
+                        break
+                    self._conn.execute('''
+                        UPDATE work SET status = 'failed', attempts = attempts + 1, lease_owner = NULL,
+                            lease_expires = NULL, last_error = ?, updated_at = ?
+                        WHERE coda_page_id = ?
+                    ''', (f"lease held by {row['lease_owner']} expired", now, row['coda_page_id']))
+                if row is not None:
+                    self._conn.execute('''
+                        UPDATE work SET status = 'leased', lease_owner = ?, lease_expires = ?, updated_at = ?
+                        WHERE coda_page_id = ?
+                    ''', (self.worker_id, now + self.lease_seconds, now, row['coda_page_id']))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            if row is None:
+                return None
+            self._held.add(row['coda_page_id'])
+        if row['status'] == 'leased':
+            print(f"[INFO] Lease on {row['coda_page_id']} held by {row['lease_owner']} expired, taking it over")
+        return json.loads(row['page'])
+
+    def holds(self, coda_page_id):
+        """True while this worker's lease on the page is current (check before side effects)"""
+        with self._lock:
+            row = self._conn.execute('SELECT status, lease_owner, lease_expires FROM work WHERE coda_page_id = ?',
+                                     (coda_page_id,)).fetchone()
+        return (row is not None and row['status'] == 'leased' and row['lease_owner'] == self.worker_id
+                and row['lease_expires'] >= time.time())
+
+    def ack(self, coda_page_id):
+        """Mark a leased page done; False if the lease was lost to another worker"""
+        with self._lock:
+            self._held.discard(coda_page_id)
+        return self._write('''
+            UPDATE work SET status = 'done', lease_owner = NULL, lease_expires = NULL, last_error = NULL, updated_at = ?
+            WHERE coda_page_id = ? AND status = 'leased' AND lease_owner = ?
+        ''', (time.time(), coda_page_id, self.worker_id)).rowcount == 1
+
+    def release(self, coda_page_id, error=None):
+        """Give a leased page back after a failure: pending again, or failed after max_attempts"""
+        with self._lock:
+            self._held.discard(coda_page_id)
+        return self._write('''
+            UPDATE work SET attempts = attempts + 1, last_error = ?, lease_owner = NULL, lease_expires = NULL,
+                status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, updated_at = ?
+            WHERE coda_page_id = ? AND status = 'leased' AND lease_owner = ?
+        ''', (error, self.max_attempts, time.time(), coda_page_id, self.worker_id)).rowcount == 1
+
+    def return_held(self):
+        """Put pages this worker still holds back to pending without counting an attempt (shutting down)"""
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        if not held:
+            return 0
+        placeholders = ','.join('?' * len(held))
+        return self._write(f'''
+            UPDATE work SET status = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE status = 'leased' AND lease_owner = ? AND coda_page_id IN ({placeholders})
+        ''', (time.time(), self.worker_id, *held)).rowcount
+
+    def renew(self):
+        """Extend every lease this worker still holds; returns how many were renewed"""
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return 0
+        now = time.time()
+        placeholders = ','.join('?' * len(held))
+        return self._write(f'''
+            UPDATE work SET lease_expires = ?, updated_at = ?
+            WHERE status = 'leased' AND lease_owner = ? AND coda_page_id IN ({placeholders})
+        ''', (now + self.lease_seconds, now, self.worker_id, *held)).rowcount
+
+    def _renew_forever(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.renew()
+                with self._lock:
+                    held = len(self._held)
+                if renewed < held:
+                    print(f"[WARNING] Work queue: {held - renewed} lease(s) expired before renewal")
+            except sqlite3.Error as e:
+                print(f"[WARNING] Work queue: lease renewal failed: {e}")
+
+    def start_heartbeat(self):
+        """Renew held leases every lease_seconds / 3 on a background thread"""
+        self._heartbeat = threading.Thread(target=self._renew_forever, name='work-queue-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def counts(self):
+        """{status: pages}, with leases past their expiry counted as 'expired'"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT CASE WHEN status = 'leased' AND lease_expires < ? THEN 'expired' ELSE status END AS state,
+                       COUNT(*) AS pages
+                FROM work GROUP BY state
+            ''', (time.time(),)).fetchall()
+        return {row['state']: row['pages'] for row in rows}
+
+    def pages(self, poll_seconds=DEFAULT_POLL_SECONDS):
+        """Lease pages until none are left to do.
+
+        While any page is still leased (by this worker's pipeline or
+        another machine) this waits and polls: an expired lease is taken
+        over, and a page released after a failure is leased again.
+        """
+        while True:
+            page = self.lease()
+            if page is not None:
+                yield page
+                continue
+            counts = self.counts()
+            if not counts.get('pending') and not counts.get('expired') and not counts.get('leased'):
+                return
+            time.sleep(poll_seconds)
+
+    def close(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        with self._lock:
+            self._conn.close()